@@ -1,29 +1,49 @@
+import time
+_STARTED = time.perf_counter()  # Start of the cold-start timing reported by /health
+
+import logging
 import sys
 import uvicorn
 import httpx
 import os
 import asyncio
-from contextlib import asynccontextmanager
+import signal
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from typing import List, Dict, Any, Optional
 
-# LangChain & LangGraph Imports (The "Brain")
-from langchain_anthropic import ChatAnthropic
+# LangChain Tool Decorator (the model, LangGraph and the MCP client SDK are
+# imported on first use so the agent can answer /health and its card quickly)
+from langchain_core.callbacks import AsyncCallbackHandler
 from langchain_core.tools import tool
-from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.prebuilt import create_react_agent
-
-# Official MCP SDK Imports (Connects to your mcp_server.py)
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
 
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.middleware.gzip import GZipMiddleware
+
+from agent_registry import AgentRegistry
+import metrics
+import structured_logging
+from profiling import RequestProfiler, admin_endpoints
+import tracing
+import wire
+from metrics import REGISTRY
+
+log = logging.getLogger("a2a_agents")
+
+# Cold-start breakdown, in seconds since this module started loading
+STARTUP = {"imports_seconds": round(time.perf_counter() - _STARTED, 3)}
 
 # ==========================================
 # 1. Configuration & Initialization
 # ==========================================
 
-# Determine which agent to run based on command line argument (data, support, router)
+# Determine which agent to run based on command line argument (data, support, router).
+# "monolith" runs all three agents and the MCP server in this one process.
 AGENT_TYPE = sys.argv[1] if len(sys.argv) > 1 else "data"
+MONOLITH = AGENT_TYPE == "monolith" or os.getenv("AGENT_DEPLOYMENT") == "monolith"
+AGENT_TYPES = ("data", "support", "router")
+tracing.configure("monolith" if MONOLITH else f"{AGENT_TYPE}-agent")
 
 # Port configuration
 PORTS = {
@@ -32,24 +52,102 @@ PORTS = {
     "router": 5003
 }
 
-# A2A Communication URLs
+# Port of this process; replicas of one agent type each get their own
+PORT = int(os.getenv("AGENT_PORT", PORTS.get(AGENT_TYPE, 5001)))
+
+# A2A Communication URLs (default instances when no registry config is given)
 URLS = {
     "data": "http://localhost:5001",
     "support": "http://localhost:5002",
     "router": "http://localhost:5003"
 }
 
-# MCP Server URL (Must match where mcp_server.py is running)
-MCP_SERVER_SSE_URL = "http://localhost:8000/sse"
+# Specialist instances the router delegates to. AGENT_REGISTRY_PATH names a
+# JSON file of instances per type; AGENT_DISCOVERY_URLS (comma-separated base
+# URLs) are added by reading their agent cards at router startup.
+AGENT_REGISTRY_PATH = os.getenv("AGENT_REGISTRY_PATH")
+AGENT_DISCOVERY_URLS = [u for u in os.getenv("AGENT_DISCOVERY_URLS", "").split(",") if u]
+
+registry = AgentRegistry()
+if AGENT_REGISTRY_PATH:
+    registry.load_config(AGENT_REGISTRY_PATH)
+elif not AGENT_DISCOVERY_URLS:
+    for agent_type, url in URLS.items():
+        registry.add(agent_type, url)
+
+# MCP Server URL (Must match where mcp_server.py is running). A URL ending in
+# /mcp selects the Streamable HTTP transport (mcp_server.py --transport streamable-http).
+MCP_SERVER_SSE_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8000/sse")
+
+# LLM provider: "anthropic", or "fake" for the offline, deterministic model of
+# fake_llm.py (replayed transcripts / scripted tool calls, FAKE_LLM_* settings)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "anthropic")
+
+# Record every real model response as a fake_llm transcript line to this file
+LLM_RECORD_TRANSCRIPTS = os.getenv("LLM_RECORD_TRANSCRIPTS")
 
 # Check for API Key
-if not os.getenv("ANTHROPIC_API_KEY"):
-    print("⚠️ WARNING: ANTHROPIC_API_KEY not found. Agent logic will fail.")
+if LLM_PROVIDER != "fake" and not os.getenv("ANTHROPIC_API_KEY"):
+    log.warning("ANTHROPIC_API_KEY not found; agent logic will fail")
 
-# Initialize LLM (The "Brain")
+# LLM (The "Brain")
 # [FIXED FINAL] Switched to Claude 3 Haiku. This model is available to ALL API keys.
 # It is fast, cheap, and capable enough for this assignment.
-llm = ChatAnthropic(model="claude-3-haiku-20240307", temperature=0)
+LLM_MODEL = "fake" if LLM_PROVIDER == "fake" else "claude-3-haiku-20240307"
+_llm = None
+
+# Build the agent graph right after startup instead of on the first task
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "0") == "1"
+
+def get_llm():
+    """The shared chat model, created (and its provider imported) on first use."""
+    global _llm
+    if _llm is None:
+        if LLM_PROVIDER == "fake":
+            from fake_llm import FakeChatModel
+            _llm = FakeChatModel.from_env()
+        else:
+            from langchain_anthropic import ChatAnthropic
+            callbacks = None
+            if LLM_RECORD_TRANSCRIPTS:
+                from fake_llm import TranscriptRecorder
+                callbacks = [TranscriptRecorder(LLM_RECORD_TRANSCRIPTS)]
+            _llm = ChatAnthropic(model=LLM_MODEL, temperature=0, callbacks=callbacks)
+    return _llm
+
+# Chat model metrics by agent type (recorded by LLMCallHandler)
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "llm_request_duration_seconds", "Chat model call time by agent type.", ("agent",),
+)
+LLM_ERRORS = REGISTRY.counter(
+    "llm_errors_total", "Chat model calls that raised, by agent type.", ("agent",),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Chat model tokens by agent type and kind.", ("agent", "kind"),
+)
+# Anthropic usage field -> kind label
+LLM_TOKEN_KINDS = {
+    "input_tokens": "input",
+    "output_tokens": "output",
+    "cache_read_input_tokens": "cached",
+    "cache_creation_input_tokens": "cache_write",
+}
+
+# Token usage of the request being handled, summed over every chat model call
+# of the agent run and of the specialist runs it delegated to
+run_usage = ContextVar("run_usage", default=None)
+
+# Conversation session of the request being handled (None: stateless, see
+# sessions.py); delegation continues the same session with the specialist
+run_session = ContextVar("run_session", default=None)
+
+def add_usage(usage: dict):
+    """Add token counts (LLM_TOKEN_KINDS keys, llm_calls) to the current request's usage."""
+    totals = run_usage.get()
+    if totals is not None:
+        for key, value in usage.items():
+            if key in LLM_TOKEN_KINDS or key == "llm_calls":
+                totals[key] = totals.get(key, 0) + (value or 0)
 
 # ==========================================
 # 2. System Prompts (Moved to Global Dict)
@@ -76,6 +174,8 @@ You access the database via the MCP Server.
 INSTRUCTIONS:
 - Use 'get_customer' to find individual user details.
 - Use 'list_customers' to find groups of users.
+- Use 'find_customer' when you only know an email or phone number.
+- Use 'find_customers_by_name' when you only know (part of) a name.
 - Use 'update_customer_email' to modify records.
 - If a tool fails, report the error clearly.
 - Provide concise, data-driven answers.""",
@@ -87,6 +187,8 @@ INSTRUCTIONS:
 - Use 'create_ticket' for new issues. 
     * CRITICAL: Analyze the user's tone. If angry or urgent -> priority='high'.
 - Use 'get_customer_history' to see past issues.
+- Use 'list_tickets' to review the open / in-progress queue, e.g. all open high-priority tickets.
+- Use 'get_ticket_stats' for ticket counts (open/resolved, by priority) instead of reading full histories.
 - Always provide the Ticket ID when a new ticket is created."""
 }
 
@@ -94,35 +196,97 @@ INSTRUCTIONS:
 # 3. MCP Client Helper
 # ==========================================
 
+# In monolith mode: one MCP session over the SDK's in-memory transport,
+# shared by all agents (opened in serve_monolith)
+mcp_session = None
+
+# There is no session pool: with SSE / Streamable HTTP every tool call opens
+# (and closes) its own session; a monolith shares one in-memory session
+MCP_CLIENT_CALL_SECONDS = REGISTRY.histogram(
+    "mcp_client_call_duration_seconds", "MCP tool call time seen by the agent, by tool.", ("tool",),
+)
+MCP_CLIENT_ERRORS = REGISTRY.counter(
+    "mcp_client_errors_total", "MCP tool calls that failed or returned an error, by tool.", ("tool",),
+)
+MCP_CLIENT_HANDSHAKE_SECONDS = REGISTRY.histogram(
+    "mcp_client_handshake_duration_seconds", "Time to connect and initialize an MCP session.",
+)
+MCP_CLIENT_SESSIONS_OPENED = REGISTRY.counter(
+    "mcp_client_sessions_opened_total", "MCP client sessions opened.",
+)
+MCP_CLIENT_SESSIONS_OPEN = REGISTRY.gauge(
+    "mcp_client_sessions_open", "MCP client sessions currently open.",
+)
+
+def _tool_result_text(result) -> str:
+    """Parse an MCP tool result (a list of content objects) into text."""
+    if result.content:
+        text_content = result.content[0].text
+        # Check if the tool returned an error JSON string
+        if "error" in text_content.lower() and "{" in text_content:
+            return f"Tool Error: {text_content}"
+        return text_content
+
+    return "No output returned from MCP tool."
+
 async def call_mcp_tool(tool_name: str, arguments: dict) -> str:
     """
     Connects to the running MCP Server via SSE and executes a tool.
     This ensures we are using the official MCP protocol for data access.
     """
-    print(f"    [MCP Client] Connecting to {MCP_SERVER_SSE_URL} to call '{tool_name}'...")
+    started = time.perf_counter()
+    text = None
     try:
-        # Connect to MCP Server using SSE Transport
-        async with sse_client(MCP_SERVER_SSE_URL) as streams:
-            async with ClientSession(streams[0], streams[1]) as session:
-                await session.initialize()
+        text = await _call_mcp_tool(tool_name, arguments)
+        return text
+    finally:
+        MCP_CLIENT_CALL_SECONDS.labels(tool_name).observe(time.perf_counter() - started)
+        if text is None or text.startswith(("Tool Error:", "Failed to communicate")):
+            MCP_CLIENT_ERRORS.labels(tool_name).inc()
+
+async def _call_mcp_tool(tool_name: str, arguments: dict) -> str:
+    with tracing.span("mcp.call_tool", kind="client", tool=tool_name) as call_span:
+        # The MCP server continues this trace (and request ID) from the request metadata
+        meta = {}
+        if call_span:
+            meta["traceparent"] = call_span.traceparent
+        if structured_logging.request_id.get():
+            meta["request_id"] = structured_logging.request_id.get()
+        meta = meta or None
+
+        if mcp_session is not None:
+            # Same MCP protocol, but the messages never leave this process
+            return _tool_result_text(await mcp_session.call_tool(tool_name, arguments, meta=meta))
+
+        # Official MCP SDK Imports (Connects to your mcp_server.py)
+        from mcp import ClientSession
+        from mcp.client.sse import sse_client
+        from mcp.client.streamable_http import streamablehttp_client
+
+        log.debug("Connecting to MCP server", extra={"url": MCP_SERVER_SSE_URL, "tool": tool_name})
+        try:
+            # Connect to MCP Server using SSE (or Streamable HTTP) Transport
+            transport = streamablehttp_client if MCP_SERVER_SSE_URL.rstrip("/").endswith("/mcp") else sse_client
+            async with AsyncExitStack() as stack:
+                with tracing.span("mcp.handshake", kind="client", url=MCP_SERVER_SSE_URL), \
+                        MCP_CLIENT_HANDSHAKE_SECONDS.time():
+                    streams = await stack.enter_async_context(transport(MCP_SERVER_SSE_URL))
+                    session = await stack.enter_async_context(ClientSession(streams[0], streams[1]))
+                    await session.initialize()
+                MCP_CLIENT_SESSIONS_OPENED.inc()
+                MCP_CLIENT_SESSIONS_OPEN.inc()
+                stack.callback(MCP_CLIENT_SESSIONS_OPEN.dec)
                 
                 # Call the tool on the MCP server
-                result = await session.call_tool(tool_name, arguments)
-                
-                # Parse result (MCP returns a list of content objects)
-                if result.content:
-                    text_content = result.content[0].text
-                    # Check if the tool returned an error JSON string
-                    if "error" in text_content.lower() and "{" in text_content:
-                        return f"Tool Error: {text_content}"
-                    return text_content
-                
-                return "No output returned from MCP tool."
-                
-    except Exception as e:
-        error_msg = f"Failed to communicate with MCP Server: {str(e)}. Is mcp_server.py running on port 8000?"
-        print(f"    [MCP Client Error] {error_msg}")
-        return error_msg
+                result = await session.call_tool(tool_name, arguments, meta=meta)
+                return _tool_result_text(result)
+                    
+        except Exception as e:
+            if call_span:
+                call_span.record_error(e)
+            error_msg = f"Failed to communicate with MCP Server: {str(e)}. Is mcp_server.py running on port 8000?"
+            log.error("MCP call failed", extra={"tool": tool_name, "error": str(e)})
+            return error_msg
 
 
 # ==========================================
@@ -145,6 +309,25 @@ async def list_customers(status: str = "active"):
     """
     return await call_mcp_tool("list_customers", {"status": status, "limit": 5})
 
+@tool
+async def find_customer(email: str = "", phone: str = ""):
+    """
+    Find a single customer by exact email address or by phone number via MCP.
+    Provide either 'email' or 'phone'.
+    """
+    if email:
+        return await call_mcp_tool("find_customer_by_email", {"email": email})
+    if phone:
+        return await call_mcp_tool("find_customer_by_phone", {"phone": phone})
+    return "Tool Error: provide either an email or a phone number."
+
+@tool
+async def find_customers_by_name(name_prefix: str):
+    """
+    Find customers whose name starts with the given text (case-insensitive) via MCP.
+    """
+    return await call_mcp_tool("find_customers_by_name", {"name_prefix": name_prefix, "limit": 5})
+
 @tool
 async def update_customer_email(customer_id: int, new_email: str):
     """
@@ -166,11 +349,33 @@ async def create_ticket(customer_id: int, issue: str, priority: str = "medium"):
     return await call_mcp_tool("create_ticket", {"customer_id": customer_id, "issue": issue, "priority": priority})
 
 @tool
-async def get_customer_history(customer_id: int):
+async def get_customer_history(customer_id: int, include_archive: bool = False):
     """
     Get support ticket history for a customer via MCP.
+    Old resolved tickets are archived; set include_archive=True only when the
+    full history is really needed.
+    """
+    return await call_mcp_tool("get_customer_history", {"customer_id": customer_id, "include_archive": include_archive})
+
+@tool
+async def list_tickets(status: str = "open", priority: Optional[str] = None):
     """
-    return await call_mcp_tool("get_customer_history", {"customer_id": customer_id})
+    List tickets with a status ('open', 'in_progress', 'resolved'), optionally
+    only one priority ('low', 'medium', 'high'), oldest first, via MCP.
+    """
+    arguments = {"status": status, "limit": 10}
+    if priority:
+        arguments["priority"] = priority
+    return await call_mcp_tool("list_tickets", arguments)
+
+@tool
+async def get_ticket_stats(customer_id: Optional[int] = None):
+    """
+    Get ticket counts by status and priority via MCP, for one customer or
+    (when no customer_id is given) across all customers.
+    """
+    arguments = {} if customer_id is None else {"customer_id": customer_id}
+    return await call_mcp_tool("get_ticket_stats", arguments)
 
 
 # --- Tools for Router Agent (A2A Communication) ---
@@ -182,108 +387,203 @@ async def delegate_to_specialist(agent_name: str, task_description: str):
     - Use 'data' agent for: getting customer info, listing users, updating details.
     - Use 'support' agent for: creating tickets, checking history, solving technical issues.
     """
-    url = URLS.get(agent_name)
-    if not url:
+    if MONOLITH:
+        # Co-located specialist: a direct coroutine call instead of HTTP
+        if agent_name not in AGENT_TYPES:
+            return f"Error: Specialist agent '{agent_name}' is not configured."
+        log.info("Delegating task in-process", extra={"agent": agent_name, "task": task_description})
+        with tracing.span("a2a.delegate", agent=agent_name):
+            result = await run_agent(agent_name, task_description, run_session.get())
+        if result["success"]:
+            log.info("Delegation completed", extra={"agent": agent_name})
+            return f"Result from {agent_name}: {result['result']}"
+        return f"Error from {agent_name}: {result['error']}"
+
+    instance = registry.pick(agent_name)
+    if not instance:
         return f"Error: Specialist agent '{agent_name}' is not configured."
     
-    print(f"    [Router -> {agent_name}] Delegating task: {task_description}")
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            # Call the /execute endpoint of the other agent
-            response = await client.post(
-                f"{url}/execute", 
-                json={"query": task_description}, 
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                result = response.json().get("result")
-                print(f"    [Router <- {agent_name}] Task completed.")
-                return f"Result from {agent_name}: {result}"
-            else:
-                return f"Error from {agent_name}: {response.text}"
-                
-    except Exception as e:
-        return f"Failed to contact {agent_name} agent: {str(e)}"
+    tried = []
+    while instance:
+        tried.append(instance)
+        log.info("Delegating task", extra={"agent": agent_name, "url": instance.url, "task": task_description})
+        try:
+            with tracing.span("a2a.delegate", kind="client", agent=agent_name, url=instance.url):
+                async with registry.track(instance), httpx.AsyncClient() as client:
+                    # Call the /execute endpoint of the other agent (trace context in the headers)
+                    payload = {"query": task_description}
+                    if run_session.get() is not None:
+                        payload["session_id"] = run_session.get()
+                    # MessagePack and compression where the specialist supports them (see wire.py)
+                    response = await wire.post(
+                        client, f"{instance.url}/execute", payload,
+                        headers=structured_logging.inject(tracing.inject()),
+                        timeout=30.0
+                    )
+        except httpx.ConnectError as e:
+            # The task never reached this replica, so another one may take it
+            registry.record_failure(instance)
+            instance = registry.pick(agent_name, exclude=tried)
+            if not instance:
+                return f"Failed to contact {agent_name} agent: {str(e)}"
+            continue
+        except Exception as e:
+            registry.record_failure(instance)
+            return f"Failed to contact {agent_name} agent: {str(e)}"
+
+        if response.status_code == 200:
+            registry.record_success(instance)
+            body = wire.decode_response(response)
+            add_usage(body.get("usage") or {})
+            result = body.get("result")
+            log.info("Delegation completed", extra={"agent": agent_name, "url": instance.url})
+            return f"Result from {agent_name}: {result}"
+        if response.status_code >= 500:
+            registry.record_failure(instance)
+        return f"Error from {agent_name}: {response.text}"
 
 
 # ==========================================
 # 5. Agent Factory (LangGraph)
 # ==========================================
 
-def get_agent_tools() -> list:
-    """Helper function to get list of tools for current agent type."""
-    if AGENT_TYPE == "router":
+def get_agent_tools(agent_type: str = None) -> list:
+    """Helper function to get list of tools for an agent type (default: this process's)."""
+    agent_type = agent_type or AGENT_TYPE
+    if agent_type == "router":
         return [delegate_to_specialist]
-    elif AGENT_TYPE == "data":
-        return [get_customer, list_customers, update_customer_email]
-    elif AGENT_TYPE == "support":
-        return [create_ticket, get_customer_history]
+    elif agent_type == "data":
+        return [get_customer, list_customers, find_customer, find_customers_by_name, update_customer_email]
+    elif agent_type == "support":
+        return [create_ticket, get_customer_history, list_tickets, get_ticket_stats]
     else:
-        raise ValueError(f"Invalid Agent Type: {AGENT_TYPE}")
+        raise ValueError(f"Invalid Agent Type: {agent_type}")
 
-def build_agent_graph():
+def build_agent_graph(agent_type: str = None, checkpointer=None):
     """
-    Builds the ReAct agent graph with the appropriate tools based on AGENT_TYPE.
-    NOTE: System prompt is injected at runtime (in execute_task) to avoid version issues.
+    Builds the ReAct agent graph with the appropriate tools for an agent type.
+    NOTE: System prompt is injected at runtime (in run_agent) to avoid version issues.
+    With a checkpointer, the graph keeps session conversations and compacts
+    them to the token budget before every model call (see sessions.py).
     """
-    tools = get_agent_tools()
-    # Create the ReAct agent (LLM + Tools + Loop)
-    return create_react_agent(llm, tools=tools)
-
-
-# ==========================================
-# 6. FastAPI Application
-# ==========================================
-
-app = FastAPI(title=f"{AGENT_TYPE.capitalize()} Agent")
-agent_runnable = None
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifecycle manager: Initialize the AI agent on startup."""
-    global agent_runnable
-    # [FIX] Print model name in logs (for debugging)
-    print(f"[{AGENT_TYPE.upper()}] Initializing Agent (Model: {llm.model})...")
-    agent_runnable = build_agent_graph()
-    print(f"[{AGENT_TYPE.upper()}] Agent Ready. Listening on port {PORTS[AGENT_TYPE]}")
-    yield
+    from langgraph.prebuilt import create_react_agent
 
-app = FastAPI(lifespan=lifespan)
-
-@app.get("/a2a/{assistant_id}")
-async def get_agent_card():    
+    tools = get_agent_tools(agent_type)
+    if checkpointer is not None:
+        import sessions
+        return create_react_agent(get_llm(), tools=tools, checkpointer=checkpointer,
+                                  pre_model_hook=sessions.compaction_hook)
+    # Create the ReAct agent (LLM + Tools + Loop)
+    return create_react_agent(get_llm(), tools=tools)
+
+# Agent graphs served by this process, by agent type (built on first use);
+# session_agents are the variants with session memory
+agents = {}
+session_agents = {}
+_agent_builds = {}
+
+async def get_agent(agent_type: str, with_sessions: bool = False):
+    """The agent graph of a type, building it off the event loop on first use."""
+    graphs = session_agents if with_sessions else agents
+    key = (agent_type, with_sessions)
+    if agent_type not in graphs:
+        if key not in _agent_builds:
+            async def build():
+                started = time.perf_counter()
+                log.info("Initializing agent", extra={"agent": agent_type, "model": LLM_MODEL,
+                                                      "sessions": with_sessions})
+                checkpointer = None
+                if with_sessions:
+                    import sessions
+                    checkpointer = await sessions.get_checkpointer()
+                graph = await asyncio.to_thread(build_agent_graph, agent_type, checkpointer)
+                build_seconds = round(time.perf_counter() - started, 3)
+                if not with_sessions:
+                    STARTUP[f"{agent_type}_agent_build_seconds"] = build_seconds
+                log.info("Agent ready", extra={"agent": agent_type, "build_seconds": build_seconds})
+                return graph
+            _agent_builds[key] = asyncio.ensure_future(build())
+        try:
+            graphs[agent_type] = await _agent_builds[key]
+        except Exception:
+            _agent_builds.pop(key, None)  # Let the next task retry the build
+            raise
+    return graphs[agent_type]
+
+class LLMCallHandler(AsyncCallbackHandler):
+    """Records a trace span, latency and token counts for every chat model
+    call of an agent run."""
+
+    def __init__(self, agent_type: str):
+        self.agent_type = agent_type
+        self.calls = {}  # LangChain run_id -> (start time, open span or None)
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        # In-process delegation inherits the caller's handlers: leave the
+        # specialist's calls to the specialist's own handler
+        if (metadata or {}).get("agent", self.agent_type) != self.agent_type:
+            return
+        span = tracing.start_span("llm.chat", kind="client", model=LLM_MODEL, messages=len(messages[0]))
+        self.calls[run_id] = (time.perf_counter(), span)
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        if run_id not in self.calls:
+            return
+        started, span = self.calls.pop(run_id)
+        LLM_REQUEST_SECONDS.labels(self.agent_type).observe(time.perf_counter() - started)
+        usage = (response.llm_output or {}).get("usage") or {}
+        for key, kind in LLM_TOKEN_KINDS.items():
+            if usage.get(key):
+                LLM_TOKENS.labels(self.agent_type, kind).inc(usage[key])
+        add_usage({**usage, "llm_calls": 1})
+        if span:
+            for key in ("input_tokens", "output_tokens"):
+                if key in usage:
+                    span.set_attribute(key, usage[key])
+            span.end()
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        if run_id not in self.calls:
+            return
+        started, span = self.calls.pop(run_id)
+        LLM_ERRORS.labels(self.agent_type).inc()
+        if span:
+            span.record_error(error)
+            span.end()
+
+async def run_agent(agent_type: str, user_query: str, session_id: str = None) -> dict:
     """
-    A2A Protocol Discovery Endpoint.
-    Returns the agent's capabilities (tools) so other agents can understand it.
+    Processes a task with an agent's LLM (ReAct loop) and returns the result,
+    with the token usage of the run and of the specialist runs it delegated to.
+    With a session_id, the task continues that session's conversation.
     """
+    session_token = run_session.set(session_id)
+    try:
+        if run_usage.get() is not None:
+            # In-process delegation: the usage adds to the calling run's totals
+            return await _run_agent(agent_type, user_query, session_id)
+        usage_token = run_usage.set({})
+        try:
+            result = await _run_agent(agent_type, user_query, session_id)
+            return {**result, "usage": run_usage.get()}
+        finally:
+            run_usage.reset(usage_token)
+    finally:
+        run_session.reset(session_token)
+
+async def _run_agent(agent_type: str, user_query: str, session_id: str = None) -> dict:
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_core.runnables.config import var_child_runnable_config
 
-    tools_list = [t.name for t in get_agent_tools()]
-    
-    return {
-        "name": f"{AGENT_TYPE.capitalize()} Agent",
-        "description": f"AI Specialist for {AGENT_TYPE} operations",
-        "protocol": "A2A-JSON-RPC",
-        "capabilities": tools_list
-    }
-
-@app.post("/execute")
-async def execute_task(request: Request):
-    """
-    Main execution endpoint.
-    Receives a task, processes it with the LLM (ReAct loop), and returns the result.
-    """
-    data = await request.json()
-    user_query = data.get("query")
-    
-    if not agent_runnable:
-        return {"success": False, "error": "Agent not initialized"}
+    try:
+        agent_runnable = await get_agent(agent_type, with_sessions=session_id is not None)
+    except Exception as e:
+        return {"success": False, "error": f"Agent not initialized: {str(e)}"}
 
-    print(f"\n[{AGENT_TYPE.upper()}] Received Task: {user_query}")
+    log.info("Received task", extra={"agent": agent_type, "query": user_query})
     
     # [FIX] Inject System Prompt here as a message
-    system_msg = SYSTEM_PROMPTS.get(AGENT_TYPE, "You are a helpful assistant.")
+    system_msg = SYSTEM_PROMPTS.get(agent_type, "You are a helpful assistant.")
     
     try:
         # Invoke the LangGraph agent
@@ -294,29 +594,246 @@ async def execute_task(request: Request):
                 HumanMessage(content=user_query)    # User Request
             ]
         }
-        
-        result = await agent_runnable.ainvoke(inputs)
+        config = {"callbacks": [LLMCallHandler(agent_type)], "metadata": {"agent": agent_type}}
+        if session_id is not None:
+            import sessions
+            config.update(sessions.thread_config(agent_type, session_id))
+            state = await agent_runnable.aget_state(config)
+            if state.values.get("messages"):
+                # A continued session already starts with the system prompt
+                inputs["messages"] = inputs["messages"][1:]
+
+        # A specialist run in-process is its own graph run, not part of the
+        # calling agent's (whose callbacks and checkpoint it would inherit)
+        parent_config = var_child_runnable_config.set(None)
+        try:
+            with tracing.span("agent.run", agent=agent_type, session=session_id is not None):
+                result = await agent_runnable.ainvoke(inputs, config=config)
+        finally:
+            var_child_runnable_config.reset(parent_config)
+        if session_id is not None:
+            await sessions.prune_thread(config)
         
         # Extract the final response text
         final_response = result["messages"][-1].content
-        print(f"[{AGENT_TYPE.upper()}] Final Response: {final_response[:60]}...")
+        log.info("Task completed", extra={"agent": agent_type, "response": final_response[:60]})
         
-        return {
+        response = {
             "success": True,
             "result": final_response,
-            "agent": AGENT_TYPE
+            "agent": agent_type
         }
+        if session_id is not None:
+            response["session_id"] = session_id
+        return response
         
     except Exception as e:
         error_msg = f"Agent execution failed: {str(e)}"
-        print(f"[{AGENT_TYPE.upper()}] Error: {error_msg}")
-        # Print full traceback for debugging
-        import traceback
-        traceback.print_exc()
+        log.exception("Agent execution failed", extra={"agent": agent_type})
         return {"success": False, "error": error_msg}
 
 
+# ==========================================
+# 6. FastAPI Application
+# ==========================================
+
+async def close_sessions():
+    """Close the session store, if a session request opened it."""
+    if "sessions" in sys.modules:
+        await sys.modules["sessions"].close_checkpointer()
+
+def create_app(agent_type: str) -> FastAPI:
+    """
+    Create the A2A HTTP app of one agent type.
+
+    Args:
+        agent_type: 'data', 'support' or 'router'
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Lifecycle manager: start background work; the agent itself is built on first use."""
+        STARTUP["ready_seconds"] = round(time.perf_counter() - _STARTED, 3)
+        log.info("Listening", extra={"agent": agent_type, "port": PORT, "ready_seconds": STARTUP["ready_seconds"]})
+        if AGENT_WARMUP:
+            asyncio.ensure_future(get_agent(agent_type))
+        if agent_type == "router" and not MONOLITH:
+            if AGENT_DISCOVERY_URLS:
+                found = await registry.discover(AGENT_DISCOVERY_URLS)
+                log.info("Discovered agent instances", extra={"instances": len(found)})
+            registry.start_health_checks()
+        yield
+        if agent_type == "router" and not MONOLITH:
+            await registry.stop_health_checks()
+        await close_sessions()
+
+    app = FastAPI(title=f"{agent_type.capitalize()} Agent", lifespan=lifespan)
+    # Large responses gzip-compressed for callers that accept it (see wire.py)
+    app.add_middleware(GZipMiddleware, minimum_size=wire.A2A_COMPRESS_MIN_BYTES,
+                       compresslevel=wire.A2A_COMPRESS_LEVEL)
+    app.add_middleware(metrics.HTTPMetricsMiddleware, service=f"{agent_type}-agent")
+    # Admin-gated profiling of the next /execute requests (see profiling.py)
+    app.state.profiler = profiler = RequestProfiler()
+    for path, methods, endpoint in admin_endpoints(profiler):
+        app.add_route(path, endpoint, methods=methods)
+
+    @app.get("/health")
+    async def health():
+        """Readiness probe with the cold-start timing breakdown."""
+        return {
+            "status": "ok",
+            "agent": agent_type,
+            "agent_ready": agent_type in agents,
+            "startup": STARTUP,
+        }
+
+    @app.get("/metrics")
+    async def get_metrics():
+        """Prometheus scrape endpoint (in a monolith, every agent serves the same values)."""
+        return PlainTextResponse(REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+    @app.get("/a2a/{assistant_id}")
+    async def get_agent_card():    
+        """
+        A2A Protocol Discovery Endpoint.
+        Returns the agent's capabilities (tools) so other agents can understand it.
+        """
+
+        tools_list = [t.name for t in get_agent_tools(agent_type)]
+        
+        return {
+            "name": f"{agent_type.capitalize()} Agent",
+            "agent_type": agent_type,
+            "description": f"AI Specialist for {agent_type} operations",
+            "protocol": "A2A-JSON-RPC",
+            "capabilities": tools_list
+        }
+
+    if agent_type == "router":
+        @app.get("/registry")
+        async def get_registry():
+            """Specialist instances known to the router and their health/load."""
+            return registry.snapshot()
+
+    @app.post("/execute")
+    async def execute_task(request: Request):
+        """
+        Main execution endpoint.
+        Receives a task, processes it with the LLM (ReAct loop), and returns the result.
+        """
+        try:
+            data = wire.decode_request(await request.body(), request.headers)
+        except wire.UnsupportedMediaType as e:
+            return wire.unsupported(e)
+        except ValueError as e:
+            return wire.response({"success": False, "error": f"Malformed request body: {e}"}, request.headers, 400)
+        if not isinstance(data, dict):
+            return wire.response({"success": False, "error": "Malformed request body: expected an object"},
+                                 request.headers, 400)
+        # The caller's (router's) request ID and trace, or new ones at the entry point
+        request_token = structured_logging.request_id.set(
+            request.headers.get(structured_logging.REQUEST_ID_HEADER) or structured_logging.new_request_id()
+        )
+        try:
+            with tracing.start_trace("POST /execute", request.headers.get("traceparent"), agent=agent_type), \
+                    profiler.profile("POST /execute"):
+                result = await run_agent(agent_type, data.get("query"), data.get("session_id"))
+            return wire.response(result, request.headers)
+        finally:
+            structured_logging.request_id.reset(request_token)
+
+    return app
+
+app = None if MONOLITH else create_app(AGENT_TYPE)
+
+
+# ==========================================
+# 7. Monolith Mode
+# ==========================================
+
+class CoLocatedServer(uvicorn.Server):
+    """uvicorn server that leaves signal handling to serve_monolith."""
+
+    @contextmanager
+    def capture_signals(self):
+        # Each uvicorn.Server would install (and on exit re-raise) its own
+        # SIGINT/SIGTERM handlers; with several servers in one loop only the
+        # last one installed would see the signal.
+        yield
+
+
+@asynccontextmanager
+async def in_process_mcp():
+    """
+    Serve this process's MCP tool calls from an MCP server in the same process.
+
+    Prepares the databases and connects mcp_session to the server over the
+    SDK's in-memory transport for the duration of the block (monolith mode
+    and in-process batch runs). Yields the mcp_server module.
+    """
+    global mcp_session
+    import mcp_server
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    log.info("Preparing databases")
+    mcp_server.prepare_databases()
+    if mcp_server.CUSTOMER_REPLICA:
+        mcp_server.start_customer_replica()
+
+    async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+        mcp_session = session
+        MCP_CLIENT_SESSIONS_OPENED.inc()
+        MCP_CLIENT_SESSIONS_OPEN.inc()
+        try:
+            yield mcp_server
+        finally:
+            mcp_session = None
+            MCP_CLIENT_SESSIONS_OPEN.dec()
+
+
+async def serve_monolith():
+    """
+    Run the router, data and support agents and the MCP server in one process.
+
+    Every agent keeps its usual port and endpoints (and the MCP server keeps
+    its SSE endpoint for outside clients), but delegation is a coroutine call
+    and MCP tool calls travel over the SDK's in-memory transport.
+    """
+    async with in_process_mcp() as mcp_server:
+        if AGENT_WARMUP:
+            for agent_type in AGENT_TYPES:
+                await get_agent(agent_type)
+        STARTUP["ready_seconds"] = round(time.perf_counter() - _STARTED, 3)
+        log.info("Monolith ready", extra={"agents": list(AGENT_TYPES), "ready_seconds": STARTUP["ready_seconds"]})
+
+        servers = [
+            CoLocatedServer(uvicorn.Config(
+                create_app(agent_type),
+                host="0.0.0.0", port=PORTS[agent_type], lifespan="off", log_config=None,
+            ))
+            for agent_type in AGENT_TYPES
+        ]
+        # External MCP clients (e.g. test_system.py) still reach the SSE endpoint
+        servers.append(CoLocatedServer(uvicorn.Config(
+            mcp_server.mcp.sse_app(), host=mcp_server.mcp.settings.host,
+            port=mcp_server.mcp.settings.port, timeout_graceful_shutdown=5, log_config=None,
+        )))
+
+        def shutdown():
+            log.info("Shutting down")
+            for server in servers:
+                server.should_exit = True
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, shutdown)
+        await asyncio.gather(*(server.serve() for server in servers))
+        await close_sessions()
+
+
 if __name__ == "__main__":
-    # Run the server
-    port = PORTS.get(AGENT_TYPE, 5001)
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    structured_logging.configure("monolith" if MONOLITH else f"{AGENT_TYPE}-agent")
+    if MONOLITH:
+        asyncio.run(serve_monolith())
+    else:
+        # Run the server (log_config=None: uvicorn logs through structured_logging)
+        uvicorn.run(app, host="0.0.0.0", port=PORT, log_config=None)
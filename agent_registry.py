@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Agent Instance Registry
+Holds every known instance (base URL) of each specialist agent type, keeps
+them health-checked, and picks one per delegation by least outstanding
+requests. Instances come from a JSON config file and/or from agent cards
+served at /a2a/{assistant_id}.
+
+Config file format (see run_system.py --replicas, which writes one):
+    {"data": ["http://localhost:5001", "http://localhost:5011"],
+     "support": ["http://localhost:5002"]}
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+log = logging.getLogger("agent_registry")
+
+# Consecutive failed probes or requests before an instance is ejected
+FAILURE_THRESHOLD = 2
+# Delay between active health check rounds
+HEALTH_CHECK_INTERVAL_SECONDS = 5.0
+HEALTH_CHECK_TIMEOUT_SECONDS = 2.0
+
+
+class AgentInstance:
+    """One running agent process, with its balancing and health state."""
+
+    def __init__(self, agent_type: str, url: str):
+        self.agent_type = agent_type
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected = False
+        self.last_picked = 0.0
+
+    @property
+    def card_url(self) -> str:
+        return f"{self.url}/a2a/{self.agent_type}"
+
+    def as_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "failures": self.failures,
+            "ejected": self.ejected,
+        }
+
+
+class AgentRegistry:
+    """Instances per agent type with least-outstanding-requests selection.
+
+    An instance is ejected after FAILURE_THRESHOLD consecutive failures,
+    counted from both health probes and delegated requests, and re-admitted
+    by the next successful probe. If every instance of a type is ejected the
+    registry still picks among them rather than failing outright.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD):
+        self.failure_threshold = failure_threshold
+        self.instances = {}  # agent_type -> list of AgentInstance
+        self._health_task = None
+
+    # ==========================================
+    # Membership
+    # ==========================================
+
+    def add(self, agent_type: str, url: str) -> AgentInstance:
+        """Register an instance (no-op if the URL is already known)."""
+        instances = self.instances.setdefault(agent_type, [])
+        url = url.rstrip("/")
+        for instance in instances:
+            if instance.url == url:
+                return instance
+        instance = AgentInstance(agent_type, url)
+        instances.append(instance)
+        return instance
+
+    def load_config(self, path: str):
+        """Register the instances listed in a JSON config file."""
+        with open(path) as f:
+            config = json.load(f)
+        for agent_type, urls in config.items():
+            for url in urls:
+                self.add(agent_type, url)
+
+    async def discover(self, urls: list, client: httpx.AsyncClient = None) -> list:
+        """Register agents by fetching the agent card at each base URL.
+
+        The card's agent_type decides where an instance goes; URLs that do not
+        answer are skipped. Returns the instances found.
+        """
+        async def fetch(client, url):
+            try:
+                # The assistant id in the path is informational; any agent answers
+                response = await client.get(f"{url.rstrip('/')}/a2a/discover",
+                                            timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+                response.raise_for_status()
+                card = response.json()
+            except (httpx.HTTPError, ValueError):
+                return None
+            agent_type = card.get("agent_type") or card.get("name", "").split()[0].lower()
+            return self.add(agent_type, url) if agent_type else None
+
+        if client is None:
+            async with httpx.AsyncClient() as client:
+                found = await asyncio.gather(*(fetch(client, url) for url in urls))
+        else:
+            found = await asyncio.gather(*(fetch(client, url) for url in urls))
+        return [instance for instance in found if instance]
+
+    def snapshot(self) -> dict:
+        """Instances and their state by agent type (for status/debugging)."""
+        return {
+            agent_type: [instance.as_dict() for instance in instances]
+            for agent_type, instances in self.instances.items()
+        }
+
+    # ==========================================
+    # Selection
+    # ==========================================
+
+    def pick(self, agent_type: str, exclude: tuple = ()) -> AgentInstance:
+        """The instance with the fewest requests in flight, or None.
+
+        Ties go to the least recently picked instance, so idle replicas are
+        used in turn.
+        """
+        candidates = [i for i in self.instances.get(agent_type, ()) if i not in exclude]
+        healthy = [i for i in candidates if not i.ejected]
+        candidates = healthy or candidates
+        if not candidates:
+            return None
+        instance = min(candidates, key=lambda i: (i.outstanding, i.last_picked))
+        instance.last_picked = time.monotonic()
+        return instance
+
+    @asynccontextmanager
+    async def track(self, instance: AgentInstance):
+        """Count a request as outstanding on an instance while it runs."""
+        instance.outstanding += 1
+        try:
+            yield instance
+        finally:
+            instance.outstanding -= 1
+
+    def record_success(self, instance: AgentInstance):
+        instance.failures = 0
+        if instance.ejected:
+            log.info("Re-admitted instance", extra={"agent": instance.agent_type, "url": instance.url})
+            instance.ejected = False
+
+    def record_failure(self, instance: AgentInstance):
+        instance.failures += 1
+        if not instance.ejected and instance.failures >= self.failure_threshold:
+            log.warning("Ejected instance", extra={
+                "agent": instance.agent_type, "url": instance.url, "failures": instance.failures,
+            })
+            instance.ejected = True
+
+    # ==========================================
+    # Active Health Checks
+    # ==========================================
+
+    async def check_health(self, client: httpx.AsyncClient):
+        """Probe every instance's agent card once."""
+        async def probe(instance):
+            try:
+                response = await client.get(instance.card_url, timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                self.record_success(instance)
+            else:
+                self.record_failure(instance)
+
+        await asyncio.gather(*(
+            probe(instance) for instances in self.instances.values() for instance in instances
+        ))
+
+    def start_health_checks(self, interval_seconds: float = HEALTH_CHECK_INTERVAL_SECONDS):
+        """Probe all instances every interval_seconds in the running event loop."""
+        async def run():
+            async with httpx.AsyncClient() as client:
+                while True:
+                    await self.check_health(client)
+                    await asyncio.sleep(interval_seconds)
+
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(run())
+
+    async def stop_health_checks(self):
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
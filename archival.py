@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Ticket Archival (hot/cold partitioning)
+Moves resolved tickets older than a configurable age out of the hot tickets
+table into an ATTACHed archive database file, in small batches so writers
+are never blocked for long.
+
+Archived tickets leave the hot views: the ticket_stats triggers count them
+out (get_ticket_stats covers hot tickets only), ticket analytics drop them
+on their next refresh, and get_customer_history shows them only with
+include_archive=True. The change_log records each move as a 'delete' of
+the hot row, since the customer's default history (and the ETag of its
+customer://{id}/tickets resource) did change; the row itself lives on in
+the archive file.
+
+Usage:
+    python archival.py --db support.db --older-than-days 90
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+log = logging.getLogger("archival")
+
+ARCHIVE_SCHEMA = "archive"
+ARCHIVED_COLUMNS = "id, customer_id, issue, status, priority, created_at, resolved_at"
+
+
+def archive_path_for(db_path: str) -> str:
+    """Default archive file next to the hot database: support.db -> support_archive.db."""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def attach_archive(conn: sqlite3.Connection, archive_path: str):
+    """ATTACH the archive database as 'archive', creating its schema if needed."""
+    attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+    if ARCHIVE_SCHEMA not in attached:
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.tickets_archive (
+            id INTEGER PRIMARY KEY,
+            customer_id INTEGER NOT NULL,
+            issue TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            created_at DATETIME,
+            resolved_at DATETIME,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_tickets_archive_customer_created
+        ON tickets_archive(customer_id, created_at DESC)
+    """)
+    conn.commit()
+
+
+def attach_archive_readonly(conn: sqlite3.Connection, archive_path: str) -> bool:
+    """ATTACH an existing archive database read-only as 'archive', for readers.
+
+    Nothing is created or written: returns False, attaching nothing, when the
+    archive file does not exist yet. The connection must accept URI filenames
+    (sqlite3.connect(..., uri=True)).
+    """
+    if not os.path.exists(archive_path):
+        return False
+    attached = [row[1] for row in conn.execute("PRAGMA database_list")]
+    if ARCHIVE_SCHEMA not in attached:
+        uri = f"file:{pathname2url(os.path.abspath(archive_path))}?mode=ro"
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (uri,))
+    return True
+
+
+class TicketArchiver:
+    """Moves old resolved tickets from the hot table into the archive file."""
+
+    def __init__(self, db_path: str, archive_path: str = None, older_than_days: float = 90,
+                 batch_size: int = 500, pause_seconds: float = 0.05):
+        """Configure the archiver.
+
+        Args:
+            db_path: Path to the hot SQLite database
+            archive_path: Path to the archive database. Defaults to archive_path_for(db_path).
+            older_than_days: Only tickets resolved longer ago than this are moved
+            batch_size: Tickets moved per transaction
+            pause_seconds: Pause between batches, leaving the write lock to other writers
+        """
+        self.db_path = db_path
+        self.archive_path = archive_path or archive_path_for(db_path)
+        self.older_than_days = older_than_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        attach_archive(conn, self.archive_path)
+        return conn
+
+    def archive_batch(self, conn: sqlite3.Connection) -> int:
+        """Move one batch in one short write transaction. Returns tickets moved."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Served by idx_tickets_resolved_at: oldest resolutions first
+            ids = [row[0] for row in conn.execute("""
+                SELECT id FROM tickets
+                WHERE resolved_at < datetime('now', ?) AND status = 'resolved'
+                ORDER BY resolved_at
+                LIMIT ?
+            """, (f"-{self.older_than_days} days", self.batch_size))]
+
+            if ids:
+                placeholders = ", ".join("?" * len(ids))
+                # OR REPLACE keeps a batch retry idempotent if a previous attempt
+                # committed the archive file but not the hot database.
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.tickets_archive ({ARCHIVED_COLUMNS})
+                    SELECT {ARCHIVED_COLUMNS} FROM tickets WHERE id IN ({placeholders})
+                """, ids)
+                conn.execute(f"DELETE FROM tickets WHERE id IN ({placeholders})", ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(ids)
+
+    def run(self, max_batches: int = None) -> dict:
+        """Archive batches until nothing is left, max_batches is hit or stop() is called.
+
+        Returns:
+            Dictionary with the number of tickets and batches moved
+        """
+        conn = self._connect()
+        conn.isolation_level = None  # Transactions are managed explicitly per batch
+        moved = batches = 0
+        started = time.perf_counter()
+        try:
+            while not self._stop.is_set() and (max_batches is None or batches < max_batches):
+                count = self.archive_batch(conn)
+                if not count:
+                    break
+                moved += count
+                batches += 1
+                self._stop.wait(self.pause_seconds)
+        finally:
+            conn.close()
+
+        return {
+            "archived": moved,
+            "batches": batches,
+            "seconds": round(time.perf_counter() - started, 3),
+            "archive_path": self.archive_path,
+        }
+
+    def start_background(self, interval_seconds: float = 300.0):
+        """Run the archiver periodically in a daemon thread."""
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    result = self.run()
+                    if result["archived"]:
+                        log.info("Archived resolved tickets", extra={
+                            "archived": result["archived"], "batches": result["batches"],
+                            "archive_path": self.archive_path,
+                        })
+                except sqlite3.Error:
+                    log.error("Archiving failed", exc_info=True, extra={"db": self.db_path})
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=loop, name="ticket-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after its current batch."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Archive old resolved tickets.")
+    parser.add_argument("--db", default="support.db", help="Hot SQLite database")
+    parser.add_argument("--archive", default=None, help="Archive database (default: <db>_archive.db)")
+    parser.add_argument("--older-than-days", type=float, default=90)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds between batches")
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    archiver = TicketArchiver(
+        args.db, archive_path=args.archive, older_than_days=args.older_than_days,
+        batch_size=args.batch_size, pause_seconds=args.pause,
+    )
+    result = archiver.run(max_batches=args.max_batches)
+    print(f"Archived {result['archived']} tickets in {result['batches']} batches "
+          f"({result['seconds']}s) into {result['archive_path']}")
+
+
+if __name__ == "__main__":
+    main()
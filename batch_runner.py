@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+Streams a JSONL file of customer requests (e.g. an email import) through the
+router or a specialist agent with bounded concurrency, appending one result
+line per request to an output JSONL as soon as it completes.
+
+The output file is the checkpoint. On start, requests whose ID already has a
+successful result line are skipped, so an interrupted or crashed run resumes
+where it stopped (--retry-failed re-runs the failed ones too). A torn last
+line left by a crash is cut off before appending. Lines are flushed and
+fsynced one by one.
+
+Input lines are JSON objects with an ID ("id" or "request_id"; the line
+number if neither) and the request text ("query", "text" or "body"); see
+--id-field / --query-field. Requests go to the running agents over HTTP, or,
+with --in-process, to agents and an MCP server in this process (combine with
+LLM_PROVIDER=fake to run offline).
+
+Usage:
+    python batch_runner.py imports.jsonl --output results.jsonl --concurrency 8
+    python batch_runner.py imports.jsonl --target support --retry-failed
+    LLM_PROVIDER=fake python batch_runner.py imports.jsonl --in-process
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+AGENT_URLS = {
+    "router": "http://localhost:5003",
+    "data": "http://localhost:5001",
+    "support": "http://localhost:5002",
+}
+
+ID_FIELDS = ("id", "request_id")
+QUERY_FIELDS = ("query", "text", "body")
+
+# USD per million tokens by model, for the cost estimate (usage keys as in
+# a2a_agents.LLM_TOKEN_KINDS)
+MODEL_PRICES = {
+    "claude-3-haiku-20240307": {
+        "input_tokens": 0.25,
+        "output_tokens": 1.25,
+        "cache_read_input_tokens": 0.03,
+        "cache_creation_input_tokens": 0.30,
+    },
+    "fake": {},
+}
+
+REQUEST_TIMEOUT_SECONDS = 300.0
+# Attempts of a request that failed to reach the agent or got a 5xx
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 1.0
+
+
+# ==========================================
+# Input and Checkpoint
+# ==========================================
+
+def read_requests(path: str, id_field: str = None, query_field: str = None):
+    """Yield {"id", "query"} per input line, reading the file lazily.
+
+    A line that is not a JSON object yields {"id": "line-N", "query": None,
+    "error"}, so it is recorded as failed instead of stopping the batch.
+    """
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = None
+            if not isinstance(entry, dict):
+                yield {"id": f"line-{number}", "query": None, "error": "invalid JSON"}
+                continue
+            ids = [id_field] if id_field else ID_FIELDS
+            queries = [query_field] if query_field else QUERY_FIELDS
+            request_id = next((entry[k] for k in ids if entry.get(k) is not None), f"line-{number}")
+            query = next((entry[k] for k in queries if entry.get(k)), None)
+            yield {"id": str(request_id), "query": query}
+
+
+def load_checkpoint(output_path: str, retry_failed: bool = False) -> set:
+    """IDs already completed in the output file (successfully, or at all).
+
+    Cuts off a torn last line so that appended results stay valid JSONL.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        valid_bytes = 0
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                break
+            valid_bytes += len(line)
+            if result.get("success") or not retry_failed:
+                done.add(result["id"])
+        f.truncate(valid_bytes)
+    return done
+
+
+class ResultWriter:
+    """Appends result lines, each flushed and fsynced before the next."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+
+    def write(self, result: dict):
+        self.file.write(json.dumps(result) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+# ==========================================
+# Statistics
+# ==========================================
+
+class BatchStats:
+    """Counts, latencies and token usage of the requests run so far."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.skipped = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.latencies = []
+        self.usage = {}
+
+    def record(self, result: dict):
+        if result["success"]:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.latencies.append(result["latency_ms"])
+        for key, value in (result.get("usage") or {}).items():
+            self.usage[key] = self.usage.get(key, 0) + value
+
+    def summary(self, prices: dict = None) -> dict:
+        elapsed = time.perf_counter() - self.started
+        completed = self.succeeded + self.failed
+        ms = np.array(self.latencies)
+        cost = None
+        if prices is not None:
+            cost = sum(self.usage.get(key, 0) * price for key, price in prices.items()) / 1e6
+        return {
+            "completed": completed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(elapsed, 1),
+            "throughput_rps": round(completed / elapsed, 3) if elapsed else 0.0,
+            "p50_ms": round(float(np.percentile(ms, 50)), 1) if len(ms) else None,
+            "p95_ms": round(float(np.percentile(ms, 95)), 1) if len(ms) else None,
+            "usage": dict(self.usage),
+            "cost_usd": round(cost, 6) if cost is not None else None,
+            "cost_per_request_usd": round(cost / completed, 6) if cost is not None and completed else None,
+        }
+
+
+# ==========================================
+# Runner
+# ==========================================
+
+async def run_batch(requests, execute, output_path: str, concurrency: int = 4,
+                    retry_failed: bool = False, prices: dict = None, progress_seconds: float = 10.0) -> dict:
+    """
+    Run requests through execute() with bounded concurrency, resuming from output_path.
+
+    Args:
+        requests: Iterable of {"id", "query"} (consumed lazily)
+        execute: Coroutine function(request) -> {"success", "result" or "error", "usage"}
+        output_path: Result JSONL, appended to and used as the checkpoint
+        concurrency: Requests in flight at once
+        retry_failed: Also re-run requests whose earlier result failed
+        prices: USD per million tokens by usage key, for the cost estimate
+        progress_seconds: Interval of progress lines (0 = none)
+
+    Returns:
+        Summary dictionary (see BatchStats.summary)
+    """
+    done = load_checkpoint(output_path, retry_failed)
+    stats = BatchStats()
+    writer = ResultWriter(output_path)
+    queue = asyncio.Queue(concurrency * 2)
+
+    async def produce():
+        for request in requests:
+            if request["id"] in done:
+                stats.skipped += 1
+                continue
+            done.add(request["id"])  # Duplicate IDs later in the file are skipped too
+            await queue.put(request)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while (request := await queue.get()) is not None:
+            started = time.perf_counter()
+            if request.get("error"):
+                outcome = {"success": False, "error": request["error"]}
+            elif not request["query"]:
+                outcome = {"success": False, "error": "No query in the input line"}
+            else:
+                try:
+                    outcome = await execute(request)
+                except Exception as e:
+                    outcome = {"success": False, "error": f"{type(e).__name__}: {e}"}
+            result = {
+                "id": request["id"],
+                "success": bool(outcome.get("success")),
+                "completed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                "usage": outcome.get("usage") or {},
+            }
+            if result["success"]:
+                result["result"] = outcome.get("result")
+            else:
+                result["error"] = outcome.get("error")
+            writer.write(result)
+            stats.record(result)
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(progress_seconds)
+            s = stats.summary(prices)
+            print(f"  {s['completed']} done ({s['failed']} failed, {s['skipped']} skipped) | "
+                  f"{s['throughput_rps']} req/s | cost ${s['cost_usd']}", flush=True)
+
+    progress = asyncio.ensure_future(report_progress()) if progress_seconds else None
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        if progress:
+            progress.cancel()
+        writer.close()
+    return stats.summary(prices)
+
+
+def http_executor(client: httpx.AsyncClient, url: str):
+    """execute() posting to an agent's /execute, retrying unreachable agents and 5xx."""
+    import structured_logging
+    import wire
+
+    async def execute(request: dict) -> dict:
+        headers = {structured_logging.REQUEST_ID_HEADER: f"batch-{request['id']}"}
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = await wire.post(client, url, {"query": request["query"]}, headers=headers)
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code < 500:
+                    if response.status_code != 200:
+                        return {"success": False, "error": f"HTTP {response.status_code}: {response.text[:200]}"}
+                    return wire.decode_response(response)
+                error = f"HTTP {response.status_code}"
+            if attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        return {"success": False, "error": error}
+
+    return execute
+
+
+def in_process_executor(agent_type: str):
+    """execute() running the agent in this process (a2a_agents monolith mode)."""
+    import a2a_agents
+    import structured_logging
+
+    async def execute(request: dict) -> dict:
+        token = structured_logging.request_id.set(f"batch-{request['id']}")
+        try:
+            return await a2a_agents.run_agent(agent_type, request["query"])
+        finally:
+            structured_logging.request_id.reset(token)
+
+    return execute
+
+
+def print_summary(summary: dict):
+    print(f"  Completed:   {summary['completed']} ({summary['succeeded']} ok, {summary['failed']} failed), "
+          f"{summary['skipped']} skipped as already done")
+    print(f"  Throughput:  {summary['throughput_rps']} req/s over {summary['elapsed_seconds']} s "
+          f"(p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms)")
+    tokens = ", ".join(f"{key} {value}" for key, value in summary["usage"].items()) or "none reported"
+    print(f"  Tokens:      {tokens}")
+    if summary["cost_usd"] is not None:
+        print(f"  Cost:        ${summary['cost_usd']:.4f} (${summary['cost_per_request_usd'] or 0:.6f} per request)")
+
+
+async def _main(args, prices: dict) -> dict:
+    requests = read_requests(args.input, args.id_field, args.query_field)
+    run = dict(output_path=args.output, concurrency=args.concurrency, retry_failed=args.retry_failed,
+               prices=prices, progress_seconds=args.progress_seconds)
+    if args.in_process:
+        import a2a_agents
+        async with a2a_agents.in_process_mcp():
+            return await run_batch(requests, in_process_executor(args.target), **run)
+    url = AGENT_URLS.get(args.target, args.target).rstrip("/") + "/execute"
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        return await run_batch(requests, http_executor(client, url), **run)
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run a JSONL file of requests through the agents.")
+    parser.add_argument("input", help="JSONL file of requests")
+    parser.add_argument("--output", help="Result JSONL and checkpoint (default: <input>.results.jsonl)")
+    parser.add_argument("--target", default="router", help="Agent type (router, data, support) or base URL")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run requests that failed before")
+    parser.add_argument("--id-field", help="Field holding the request ID")
+    parser.add_argument("--query-field", help="Field holding the request text")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run the agents and MCP server in this process instead of over HTTP")
+    default_model = "fake" if os.getenv("LLM_PROVIDER") == "fake" else "claude-3-haiku-20240307"
+    parser.add_argument("--model", default=default_model, help="Model whose prices the cost estimate uses")
+    parser.add_argument("--progress-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    args.output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    if args.in_process:
+        if args.target not in AGENT_URLS:
+            parser.error("--in-process needs an agent type as --target")
+        # Co-located agents: delegation is a coroutine call (set before a2a_agents is imported)
+        os.environ["AGENT_DEPLOYMENT"] = "monolith"
+        import structured_logging
+        structured_logging.configure("batch-runner")
+
+    print(f"Running {args.input} through {args.target} ({args.concurrency} at a time) -> {args.output}")
+    try:
+        summary = asyncio.run(_main(args, MODEL_PRICES.get(args.model)))
+    except KeyboardInterrupt:
+        print("Interrupted; completed results are in the output file. Rerun to resume.")
+        sys.exit(130)
+    print_summary(summary)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
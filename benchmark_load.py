@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+End-to-End Load Benchmark
+Replays a weighted mix of the test_system.py scenarios (and/or queries from
+files) against the router or individual agents, and reports latency
+percentiles, throughput and error rate per scenario.
+
+Closed loop (--concurrency N): N clients each send their next request as
+soon as the previous one returns. Open loop (--rate R): requests arrive as a
+Poisson process at R per second however slowly the system answers, and
+latency is measured from each request's scheduled arrival, so queueing
+delay is included rather than hidden.
+
+Query files: .jsonl lines of {"name", "query", "target", "weight"} (only
+"query" is required), or plain text with one query per line.
+
+Usage:
+    python benchmark_load.py --concurrency 8 --duration 60
+    python benchmark_load.py --rate 2 --duration 120 --output run.json
+    python benchmark_load.py --scenarios simple_query=3,ticket_history=1 --target data
+    python benchmark_load.py --queries my_queries.jsonl --compare baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+AGENT_URLS = {
+    "router": "http://localhost:5003",
+    "data": "http://localhost:5001",
+    "support": "http://localhost:5002",
+}
+
+# The test_system.py scenarios: (query, agent it is sent to, default weight)
+SCENARIOS = {
+    "simple_query": ("Get customer information for ID 5", "router", 3),
+    "coordinated_query": ("I'm customer ID 3 and need help upgrading my account", "router", 2),
+    "ticket_history": ("Get ticket history for customer ID 1", "router", 2),
+    "escalation": ("Customer ID 7 - I've been charged twice, need refund immediately!", "router", 1),
+    "list_customers": ("List all active customers", "router", 1),
+    "direct_data": ("Get customer info for ID 2", "data", 1),
+}
+
+REQUEST_TIMEOUT_SECONDS = 120.0
+# p95 latency growth (fraction) that --compare reports as a regression
+REGRESSION_THRESHOLD = 0.20
+
+
+# ==========================================
+# Workload
+# ==========================================
+
+def parse_weights(value: str) -> dict:
+    """Scenario weights from 'simple_query=3,escalation=1' (all defaults if empty)."""
+    if not value:
+        return {name: weight for name, (_, _, weight) in SCENARIOS.items()}
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def load_queries(path: str) -> list:
+    """Workload items from a query file (see module docstring)."""
+    base = os.path.splitext(os.path.basename(path))[0]
+    items = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line) if path.endswith(".jsonl") else {"query": line}
+            items.append({
+                "name": entry.get("name") or f"{base}:{number}",
+                "query": entry["query"],
+                "target": entry.get("target"),
+                "weight": float(entry.get("weight", 1)),
+            })
+    return items
+
+
+def build_workload(weights: dict, query_files: list, target: str = None) -> list:
+    """Weighted workload items: {name, query, url, weight}.
+
+    target overrides where every item is sent: an agent type or a base URL.
+    """
+    items = [
+        {"name": name, "query": SCENARIOS[name][0], "target": SCENARIOS[name][1], "weight": weight}
+        for name, weight in weights.items() if weight > 0
+    ]
+    for path in query_files:
+        items.extend(load_queries(path))
+    for item in items:
+        destination = target or item.pop("target", None) or "router"
+        item.pop("target", None)
+        item["url"] = AGENT_URLS.get(destination, destination).rstrip("/") + "/execute"
+    return items
+
+
+# ==========================================
+# Load Generation
+# ==========================================
+
+async def send(client: httpx.AsyncClient, item: dict) -> str:
+    """Run one query. Returns None on success, else a short error description."""
+    try:
+        response = await client.post(item["url"], json={"query": item["query"]})
+    except httpx.HTTPError as e:
+        return type(e).__name__
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return "invalid JSON"
+    return None if body.get("success", True) else "agent error"
+
+
+class Recorder:
+    """Latencies and errors per scenario."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, error: str):
+        if error is None:
+            self.latencies.setdefault(name, []).append(seconds)
+        else:
+            kinds = self.errors.setdefault(name, {})
+            kinds[error] = kinds.get(error, 0) + 1
+
+
+async def closed_loop(items: list, concurrency: int, duration: float, seed: int) -> tuple:
+    recorder = Recorder()
+    weights = [item["weight"] for item in items]
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client, rng):
+        while time.perf_counter() < deadline:
+            item = rng.choices(items, weights)[0]
+            started = time.perf_counter()
+            error = await send(client, item)
+            recorder.record(item["name"], time.perf_counter() - started, error)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, random.Random(seed + i)) for i in range(concurrency)))
+        return recorder, time.perf_counter() - started
+
+
+async def open_loop(items: list, rate: float, duration: float, seed: int) -> tuple:
+    recorder = Recorder()
+    rng = random.Random(seed)
+    weights = [item["weight"] for item in items]
+
+    async def request(client, item, scheduled):
+        error = await send(client, item)
+        # From the scheduled arrival: time spent waiting behind a slow system counts
+        recorder.record(item["name"], time.perf_counter() - scheduled, error)
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=None),
+                                 timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        started = time.perf_counter()
+        scheduled, tasks = started, []
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - started >= duration:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.create_task(request(client, rng.choices(items, weights)[0], scheduled)))
+        await asyncio.gather(*tasks)
+        return recorder, time.perf_counter() - started
+
+
+# ==========================================
+# Reporting
+# ==========================================
+
+def _stats(latencies: list, errors: dict, elapsed: float) -> dict:
+    ms = np.array(latencies) * 1000
+    failed = sum(errors.values())
+    total = len(latencies) + failed
+
+    def percentile(q):
+        return round(float(np.percentile(ms, q)), 1) if len(ms) else None
+
+    return {
+        "requests": total,
+        "errors": failed,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(float(ms.max()), 1) if len(ms) else None,
+        "error_kinds": errors,
+    }
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    """Per-scenario and overall statistics."""
+    names = sorted(set(recorder.latencies) | set(recorder.errors))
+    scenarios = {
+        name: _stats(recorder.latencies.get(name, []), recorder.errors.get(name, {}), elapsed)
+        for name in names
+    }
+    all_errors = {}
+    for kinds in recorder.errors.values():
+        for kind, count in kinds.items():
+            all_errors[kind] = all_errors.get(kind, 0) + count
+    overall = _stats([s for values in recorder.latencies.values() for s in values], all_errors, elapsed)
+    return {"overall": overall, "scenarios": scenarios}
+
+
+def print_report(summary: dict):
+    print(f"  {'scenario':<24} {'reqs':>6} {'err%':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = [*summary["scenarios"].items(), ("overall", summary["overall"])]
+    for name, s in rows:
+        print(f"  {name[:24]:<24} {s['requests']:>6} {s['error_rate'] * 100:>5.1f}% {s['throughput_rps']:>8} "
+              f"{s['p50_ms'] or '-':>9} {s['p95_ms'] or '-':>9} {s['p99_ms'] or '-':>9}")
+
+
+def compare(summary: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Regressions against a baseline run: p95 latency up by more than threshold,
+    throughput down by more than threshold, or a higher error rate."""
+    regressions = []
+    current = {"overall": summary["overall"], **summary["scenarios"]}
+    previous = {"overall": baseline["overall"], **baseline["scenarios"]}
+    for name, now in current.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] and before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if name == "overall" and now["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {now['throughput_rps']} req/s")
+        if now["error_rate"] > before["error_rate"]:
+            regressions.append(f"{name}: error rate {before['error_rate']:.2%} -> {now['error_rate']:.2%}")
+    return regressions
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Replay a weighted scenario mix against the agents.")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=4, help="Closed loop: concurrent clients")
+    load.add_argument("--rate", type=float, help="Open loop: mean arrivals per second (Poisson)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of load")
+    parser.add_argument("--scenarios", type=parse_weights, default=parse_weights(""),
+                        help="Weights, e.g. simple_query=3,escalation=1 (default: all built-in)")
+    parser.add_argument("--queries", nargs="*", default=[], help="Query files (.jsonl or text) to add")
+    parser.add_argument("--no-builtin", action="store_true", help="Only replay --queries")
+    parser.add_argument("--target", help="Send everything to this agent type or base URL")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the scenario mix and arrivals")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative p95/throughput change that counts as a regression")
+    args = parser.parse_args()
+
+    items = build_workload({} if args.no_builtin else args.scenarios, args.queries, args.target)
+    if not items:
+        parser.error("empty workload")
+
+    mode = f"open loop, {args.rate}/s" if args.rate else f"closed loop, {args.concurrency} clients"
+    print(f"Replaying {len(items)} scenario(s) for {args.duration:.0f}s ({mode})...")
+    if args.rate:
+        recorder, elapsed = asyncio.run(open_loop(items, args.rate, args.duration, args.seed))
+    else:
+        recorder, elapsed = asyncio.run(closed_loop(items, args.concurrency, args.duration, args.seed))
+    summary = summarize(recorder, elapsed)
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "config": {
+                    "mode": "open" if args.rate else "closed",
+                    "rate": args.rate,
+                    "concurrency": None if args.rate else args.concurrency,
+                    "duration": args.duration,
+                    "seed": args.seed,
+                    "workload": [{k: item[k] for k in ("name", "url", "weight")} for item in items],
+                },
+                "elapsed_seconds": round(elapsed, 2),
+                **summary,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(summary, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("  No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+MCP HTTP Throughput Benchmark
+Starts the MCP server in stateless Streamable-HTTP mode with 1, 2, 4, ...
+workers against a generated database and drives it with concurrent
+JSON-RPC tool calls, reporting requests per second and latency.
+
+Usage:
+    python benchmark_mcp_http.py --workers 1 2 4 --concurrency 32 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from data_generator import generate_database
+from sharding import reshard
+
+MCP_SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+HEADERS = {"Content-Type": "application/json", "Accept": "application/json, text/event-stream"}
+
+
+def _request(request_id: int, tool: str, arguments: dict) -> dict:
+    return {
+        "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+        "params": {"name": tool, "arguments": arguments},
+    }
+
+
+def _workload(rng: random.Random, customers: int, write_ratio: float) -> tuple:
+    """One tool call of the mix: mostly customer/history reads, some ticket writes."""
+    customer_id = rng.randint(1, customers)
+    if rng.random() < write_ratio:
+        return "create_ticket", {"customer_id": customer_id, "issue": "Benchmark ticket"}
+    if rng.random() < 0.5:
+        return "get_customer", {"customer_id": customer_id}
+    return "get_customer_history", {"customer_id": customer_id}
+
+
+async def _wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.post(url, headers=HEADERS, json={
+                    "jsonrpc": "2.0", "id": 0, "method": "tools/list", "params": {},
+                })
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"MCP server at {url} did not become ready")
+
+
+async def _drive(url: str, concurrency: int, seconds: float, customers: int, write_ratio: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+
+    async def client_loop(client: httpx.AsyncClient, seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        request_id = 0
+        while time.monotonic() < deadline:
+            request_id += 1
+            tool, arguments = _workload(rng, customers, write_ratio)
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, headers=HEADERS, json=_request(request_id, tool, arguments))
+                if response.status_code != 200 or "error" in response.json():
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, seed) for seed in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 2) if len(ms) else None,
+    }
+
+
+def run(workers: int, db_path: str, port: int, args) -> dict:
+    """Start a server with `workers` processes, load it, and stop it."""
+    env = dict(os.environ, MCP_DB_PATH=db_path, MCP_SHARDS=str(args.shards))
+    server = subprocess.Popen(
+        [sys.executable, MCP_SERVER_SCRIPT, "--transport", "streamable-http",
+         "--workers", str(workers), "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/mcp"
+    try:
+        asyncio.run(_wait_ready(url))
+        result = asyncio.run(_drive(url, args.concurrency, args.seconds, args.customers, args.write_ratio))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {"workers": workers, **result}
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark MCP throughput by worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent client requests")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Load duration per run")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--tickets", type=int, default=100_000)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--write-ratio", type=float, default=0.05, help="Fraction of create_ticket calls")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true", help="Print only the JSON results")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        generate_database(db_path, customers=args.customers, tickets=args.tickets, verbose=False)
+        if args.shards > 1:
+            reshard([db_path], db_path, args.shards)
+
+        for workers in args.workers:
+            results.append(run(workers, db_path, args.port, args))
+            if not args.json:
+                r = results[-1]
+                print(f" {r['workers']:>2} workers | {r['requests']:>7} requests | {r['errors']} errors "
+                      f"| {r['requests_per_sec']:>8} req/s | p50 {r['p50_ms']} ms | p99 {r['p99_ms']} ms")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+MCP Tool Microbenchmarks
+Builds databases of several sizes with data_generator.py and drives each
+tool of mcp_server.py (and a mixed read/write workload) at several
+concurrency levels, both as direct function calls and over an in-memory MCP
+session (protocol, validation and request instrumentation included). Reports
+ops/sec, latency percentiles, SQLite lock-wait time and peak RSS per run.
+
+Each database size runs in a fresh process, so peak RSS covers one size
+only; it is the high-water mark of that process up to the end of each run.
+
+SQLite waits for locks inside its busy handler, where Python cannot see
+it. The server's connections are therefore opened with timeout=0 here and
+retried on "database is locked" with SQLite's own back-off schedule, so the
+time spent waiting for another writer is measured instead of hidden in the
+latency.
+
+With --db-dir, generated databases are kept and reused (same seed, same
+data); tickets created by a run are deleted again at the end of each size.
+--output writes JSON stamped with the git commit; --compare checks a run
+against such a file and exits non-zero on regressions.
+
+Usage:
+    python benchmark_mcp_tools.py --tickets 10000 100000 --concurrency 1 8
+    python benchmark_mcp_tools.py --tickets 10000000 --db-dir bench_dbs --workloads mixed get_customer_history
+    python benchmark_mcp_tools.py --output base.json
+    python benchmark_mcp_tools.py --compare base.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+
+from data_generator import generate_database
+from sharding import reshard
+from tracing import TracedConnection, TracedCursor
+
+MODES = ("direct", "mcp")
+
+# Sleeps (seconds) between retries of a locked statement: SQLite's default
+# busy handler schedule, repeating the last step
+BUSY_DELAYS = (0.001, 0.002, 0.005, 0.01, 0.015, 0.02, 0.025, 0.025, 0.025, 0.05, 0.05, 0.1)
+# Give up after this long, like the server's sqlite3.connect(timeout=30)
+LOCK_TIMEOUT_SECONDS = 30.0
+
+# Relative ops/sec drop or p95 growth that --compare reports as a regression
+REGRESSION_THRESHOLD = 0.20
+
+# Customers sampled per size for lookup arguments
+SAMPLE_CUSTOMERS = 1000
+
+
+# ==========================================
+# Lock-Wait Measurement
+# ==========================================
+
+class LockWaits:
+    """Total time statements spent waiting for a SQLite lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = 0.0
+        self.count = 0
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.seconds += seconds
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            self.seconds, self.count = 0.0, 0
+
+
+lock_waits = LockWaits()
+
+
+def _until_unlocked(operation):
+    """Run operation(), retrying while the database is locked; waits go to lock_waits."""
+    waiting_since = None
+    attempt = 0
+    while True:
+        try:
+            result = operation()
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            now = time.perf_counter()
+            waiting_since = waiting_since or now
+            if now - waiting_since > LOCK_TIMEOUT_SECONDS:
+                raise
+            time.sleep(BUSY_DELAYS[min(attempt, len(BUSY_DELAYS) - 1)])
+            attempt += 1
+            continue
+        if waiting_since is not None:
+            lock_waits.add(time.perf_counter() - waiting_since)
+        return result
+
+
+class LockTimedCursor(TracedCursor):
+    def execute(self, sql, parameters=()):
+        return _until_unlocked(lambda: super(LockTimedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        return _until_unlocked(lambda: super(LockTimedCursor, self).executemany(sql, seq_of_parameters))
+
+
+class LockTimedConnection(TracedConnection):
+    """TracedConnection that fails fast on locks and retries in Python (see module docstring)."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs["timeout"] = 0
+        super().__init__(*args, **kwargs)
+
+    def cursor(self, factory=LockTimedCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        return _until_unlocked(super().commit)
+
+
+# ==========================================
+# Workloads
+# ==========================================
+
+def _sample(mcp_server, customers: int, seed: int) -> list:
+    """Rows (id, name, email, phone) of up to SAMPLE_CUSTOMERS random customers."""
+    ids = random.Random(seed).sample(range(1, customers + 1), min(SAMPLE_CUSTOMERS, customers))
+    placeholders = ",".join("?" * len(ids))
+    rows = mcp_server.scatter(lambda conn: conn.execute(
+        f"SELECT id, name, email, phone FROM customers WHERE id IN ({placeholders}) "
+        "AND email IS NOT NULL AND phone IS NOT NULL", ids
+    ).fetchall())
+    return sorted((tuple(row) for shard in rows for row in shard), key=lambda row: row[0])
+
+
+def make_workloads(sample: list, customers: int, write_ratio: float) -> dict:
+    """Workload name -> function(rng) giving the next (tool, arguments)."""
+    def customer(rng):
+        return rng.choice(sample)
+
+    workloads = {
+        "get_customer": lambda rng: ("get_customer", {"customer_id": rng.randint(1, customers)}),
+        "find_customer_by_email": lambda rng: ("find_customer_by_email", {"email": customer(rng)[2]}),
+        "find_customer_by_phone": lambda rng: ("find_customer_by_phone", {"phone": customer(rng)[3]}),
+        "find_customers_by_name": lambda rng: ("find_customers_by_name", {"name_prefix": customer(rng)[1][:3]}),
+        "list_customers": lambda rng: ("list_customers", {"status": rng.choice(["active", "disabled"])}),
+        "get_customer_history": lambda rng: ("get_customer_history", {"customer_id": rng.randint(1, customers)}),
+        "list_tickets": lambda rng: ("list_tickets", {"status": "open", **rng.choice(
+            [{}, {"priority": "low"}, {"priority": "medium"}, {"priority": "high"}])}),
+        "get_ticket_stats": lambda rng: ("get_ticket_stats", {"customer_id": rng.randint(1, customers)}
+                                         if rng.random() < 0.9 else {}),
+        "get_ticket_analytics": lambda rng: ("get_ticket_analytics", {}),
+        "create_ticket": lambda rng: ("create_ticket", {"customer_id": rng.randint(1, customers),
+                                                        "issue": "Benchmark ticket",
+                                                        "priority": rng.choice(["low", "medium", "high"])}),
+        # Rewrites the current email: takes the write lock and fires the triggers without changing data
+        "update_customer": lambda rng: (lambda row: ("update_customer", {"customer_id": row[0],
+                                                                         "email": row[2]}))(customer(rng)),
+    }
+    reads = ["get_customer", "get_customer_history", "find_customer_by_email", "list_tickets", "get_ticket_stats"]
+    writes = ["create_ticket", "update_customer"]
+
+    def mixed(rng):
+        return workloads[rng.choice(writes if rng.random() < write_ratio else reads)](rng)
+
+    workloads["mixed"] = mixed
+    return workloads
+
+
+def _failed(text: str) -> bool:
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return True
+    return isinstance(body, dict) and "error" in body
+
+
+# ==========================================
+# Drivers
+# ==========================================
+
+def drive_direct(mcp_server, next_call, concurrency: int, seconds: float, seed: int) -> tuple:
+    """Call the tool functions from `concurrency` threads; returns (latencies, errors)."""
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            tool, arguments = next_call(rng)
+            started = time.perf_counter()
+            try:
+                failed = _failed(getattr(mcp_server, tool)(**arguments))
+            except Exception:
+                failed = True
+            if failed:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        per_thread = list(pool.map(worker, range(concurrency)))
+    return [s for latencies, _ in per_thread for s in latencies], sum(errors for _, errors in per_thread)
+
+
+async def drive_mcp(mcp_server, next_call, concurrency: int, seconds: float, seed: int) -> tuple:
+    """Call the tools over one in-memory MCP session with `concurrency` requests in flight."""
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    latencies, errors = [], 0
+    async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+        deadline = time.perf_counter() + seconds
+
+        async def worker(index):
+            nonlocal errors
+            rng = random.Random(seed + index)
+            while time.perf_counter() < deadline:
+                tool, arguments = next_call(rng)
+                started = time.perf_counter()
+                try:
+                    result = await session.call_tool(tool, arguments)
+                    failed = result.isError or _failed(result.content[0].text if result.content else "")
+                except Exception:
+                    failed = True
+                if failed:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+def _stats(latencies: list, errors: int, elapsed: float) -> dict:
+    ms = np.array(latencies) * 1000
+
+    def percentile(q):
+        return round(float(np.percentile(ms, q)), 3) if len(ms) else None
+
+    return {
+        "ops": len(latencies),
+        "errors": errors,
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(float(ms.max()), 3) if len(ms) else None,
+        "lock_wait_ms": round(lock_waits.seconds * 1000, 1),
+        "lock_waits": lock_waits.count,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_size(db_path: str, tickets: int, customers: int, args: dict) -> list:
+    """Run every mode x workload x concurrency against one database (in a child process)."""
+    os.environ.update(MCP_DB_PATH=db_path, MCP_SHARDS=str(args["shards"]),
+                      MCP_CUSTOMER_REPLICA="1" if args["replica"] else "0")
+    import mcp_server
+    import structured_logging
+    structured_logging.configure("benchmark", level="ERROR")
+
+    # Only the server's own connections (get_db_connection) measure lock waits
+    mcp_server.TracedConnection = LockTimedConnection
+    mcp_server.prepare_databases()
+    if args["replica"]:
+        mcp_server.start_customer_replica()
+
+    marks = mcp_server.scatter(lambda conn: (
+        conn.execute("SELECT COALESCE(MAX(id), 0) FROM tickets").fetchone()[0],
+        conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0],
+    ))
+    workloads = make_workloads(_sample(mcp_server, customers, args["seed"]), customers, args["write_ratio"])
+
+    results = []
+    try:
+        for mode in args["modes"]:
+            for name in args["workloads"]:
+                for concurrency in args["concurrency"]:
+                    lock_waits.reset()
+                    started = time.perf_counter()
+                    if mode == "direct":
+                        latencies, errors = drive_direct(mcp_server, workloads[name], concurrency,
+                                                         args["seconds"], args["seed"])
+                    else:
+                        latencies, errors = asyncio.run(drive_mcp(mcp_server, workloads[name], concurrency,
+                                                                  args["seconds"], args["seed"]))
+                    result = {"tickets": tickets, "mode": mode, "workload": name, "concurrency": concurrency,
+                              **_stats(latencies, errors, time.perf_counter() - started)}
+                    results.append(result)
+                    _print_row(result)
+    finally:
+        # Leave a reusable database: drop this run's tickets and their change_log rows
+        def restore(shard, conn):
+            max_ticket, max_seq = marks[shard]
+            conn.execute("DELETE FROM tickets WHERE id > ?", (max_ticket,))
+            conn.execute("DELETE FROM change_log WHERE seq > ?", (max_seq,))
+            conn.commit()
+        mcp_server.scatter(restore, with_shard=True)
+    return results
+
+
+# ==========================================
+# Reporting
+# ==========================================
+
+def _print_row(r: dict):
+    print(f"  {r['tickets']:>9} {r['mode']:<6} {r['workload']:<23} c={r['concurrency']:<3} "
+          f"{r['ops_per_sec']:>9} ops/s | p50 {r['p50_ms']} p95 {r['p95_ms']} p99 {r['p99_ms']} ms "
+          f"| lock wait {r['lock_wait_ms']} ms | errors {r['errors']} | rss {r['peak_rss_mb']} MB", flush=True)
+
+
+def _key(result: dict) -> tuple:
+    return result["tickets"], result["mode"], result["workload"], result["concurrency"]
+
+
+def compare(results: list, baseline: list, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Runs whose ops/sec fell or p95 grew by more than threshold, or that gained errors."""
+    previous = {_key(r): r for r in baseline}
+    regressions = []
+    for now in results:
+        before = previous.get(_key(now))
+        if before is None:
+            continue
+        name = "/".join(str(part) for part in _key(now))
+        if now["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: {before['ops_per_sec']} -> {now['ops_per_sec']} ops/s")
+        if now["p95_ms"] and before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if now["errors"] and not before["errors"]:
+            regressions.append(f"{name}: {now['errors']} errors")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark each MCP tool by database size and concurrency.")
+    parser.add_argument("--tickets", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Database sizes in tickets (e.g. 10000 100000 1000000 10000000)")
+    parser.add_argument("--tickets-per-customer", type=int, default=10)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workloads", nargs="+", help="Tools and/or 'mixed' (default: all)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--seconds", type=float, default=2.0, help="Load duration per run")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="Fraction of writes in 'mixed'")
+    parser.add_argument("--no-replica", action="store_true", help="Serve customer reads from SQLite")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the data and of the call mix")
+    parser.add_argument("--db-dir", help="Keep generated databases here and reuse them")
+    parser.add_argument("--output", help="Write the results as JSON here")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    workloads = args.workloads or list(make_workloads([], 1, 0))
+    unknown = set(workloads) - set(make_workloads([], 1, 0))
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    config = {
+        "shards": args.shards, "modes": args.modes, "workloads": workloads, "concurrency": args.concurrency,
+        "seconds": args.seconds, "write_ratio": args.write_ratio, "replica": not args.no_replica,
+        "seed": args.seed,
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        db_dir = args.db_dir or workdir
+        os.makedirs(db_dir, exist_ok=True)
+        for tickets in args.tickets:
+            customers = max(1, tickets // args.tickets_per_customer)
+            name = f"tickets_{tickets}_customers_{customers}_seed_{args.seed}"
+            db_path = os.path.join(db_dir, f"{name}.db" if args.shards == 1 else f"{name}_x{args.shards}.db")
+            if not os.path.exists(db_path):
+                print(f"Generating {tickets} tickets / {customers} customers...", flush=True)
+                generate_database(db_path, customers=customers, tickets=tickets, seed=args.seed, verbose=False)
+                if args.shards > 1:
+                    reshard([db_path], db_path, args.shards)
+            # A fresh process per size: peak RSS and caches do not carry over
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                results.extend(pool.submit(run_size, db_path, tickets, customers, config).result())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "config": {**config, "tickets": args.tickets, "tickets_per_customer": args.tickets_per_customer},
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("  No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
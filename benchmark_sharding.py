@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Sharding Write Benchmark
+Measures create_ticket throughput with concurrent writer processes as the
+number of shards grows. Every commit takes its shard's write lock, so with
+one shard all writers queue behind each other.
+
+Usage:
+    python benchmark_sharding.py --shards 1 2 4 8 --writers 8 --tickets 2000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from data_generator import generate_database
+from sharding import reshard
+
+
+def _writer(db_path: str, shards: int, customers: int, tickets: int, seed: int, start):
+    """Create tickets for random customers through the MCP tool itself."""
+    import mcp_server
+    mcp_server.DB_PATH = db_path
+    mcp_server.SHARD_COUNT = shards
+
+    rng = random.Random(seed)
+    start.wait()
+    for _ in range(tickets):
+        mcp_server.create_ticket(
+            customer_id=rng.randint(1, customers),
+            issue="Benchmark ticket",
+            priority=rng.choice(["low", "medium", "high"]),
+        )
+
+
+def run(shards: int, writers: int, tickets: int, customers: int, workdir: str) -> dict:
+    """Build a fresh database with the given shard count and time concurrent writers."""
+    db_path = os.path.join(workdir, f"bench_{shards}.db")
+    generate_database(db_path, customers=customers, tickets=customers * 2, verbose=False)
+    if shards > 1:
+        reshard([db_path], db_path, shards)
+
+    start = multiprocessing.Event()
+    per_writer = tickets // writers
+    processes = [
+        multiprocessing.Process(target=_writer, args=(db_path, shards, customers, per_writer, i, start))
+        for i in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)  # Let every writer finish importing before the clock starts
+
+    started = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    written = per_writer * writers
+    return {
+        "shards": shards,
+        "writers": writers,
+        "tickets": written,
+        "seconds": round(elapsed, 3),
+        "tickets_per_sec": round(written / elapsed),
+    }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark write throughput by shard count.")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--writers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--tickets", type=int, default=2000, help="Tickets created per run")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--json", action="store_true", help="Print only the JSON results")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for shards in args.shards:
+            results.append(run(shards, args.writers, args.tickets, args.customers, workdir))
+            if not args.json:
+                r = results[-1]
+                speedup = r["tickets_per_sec"] / results[0]["tickets_per_sec"]
+                print(f" {r['shards']:>2} shards | {r['writers']} writers | {r['tickets']} tickets "
+                      f"| {r['seconds']:>7.3f}s | {r['tickets_per_sec']:>7} tickets/s | x{speedup:.2f}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+A2A Wire Format Benchmark
+Measures encode and decode time and payload size of typical /execute
+payloads in each wire format (JSON, MessagePack), uncompressed and gzipped
+at several levels (see wire.py).
+
+Payloads are built from real tool output of a generated database:
+  request          A delegation request {"query", "session_id"}
+  customer         A response carrying get_customer output
+  history          A response carrying get_customer_history of the busiest customer
+  customer_list    A response carrying list_customers output
+  session_history  A request carrying a multi-turn history with structured tool results
+
+Times are per payload, best of --repeat runs; encode includes compression
+and decode includes decompression.
+
+Usage:
+    python benchmark_wire.py
+    python benchmark_wire.py --customers 10000 --tickets 200000 --levels 1 5 9
+    python benchmark_wire.py --output wire.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import subprocess
+import tempfile
+import timeit
+from datetime import datetime
+
+from data_generator import generate_database
+import wire
+
+FORMATS = {"json": wire.JSON, "msgpack": wire.MSGPACK}
+
+
+# ==========================================
+# Payloads
+# ==========================================
+
+def _response(text: str) -> dict:
+    return {
+        "success": True,
+        "result": f"Here is what I found:\n{text}",
+        "agent": "data",
+        "usage": {"input_tokens": 1850, "output_tokens": 240, "llm_calls": 2},
+    }
+
+
+def build_payloads(db_path: str) -> dict:
+    """Payload name -> payload, from the tools of mcp_server.py on db_path."""
+    os.environ.update(MCP_DB_PATH=db_path, MCP_CUSTOMER_REPLICA="0")
+    import mcp_server
+    import structured_logging
+    structured_logging.configure("benchmark", level="ERROR")
+    mcp_server.prepare_databases()
+
+    with sqlite3.connect(db_path) as conn:
+        busiest, = conn.execute(
+            "SELECT customer_id FROM tickets GROUP BY customer_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+    customer = mcp_server.get_customer(customer_id=busiest)
+    history = mcp_server.get_customer_history(customer_id=busiest)
+
+    messages = []
+    for turn in range(4):
+        messages += [
+            {"type": "human", "content": f"What changed for customer {busiest}? ({turn})"},
+            {"type": "ai", "content": "", "tool_calls": [
+                {"name": "get_customer_history", "args": {"customer_id": busiest}, "id": f"call_{turn}"}]},
+            {"type": "tool", "tool_call_id": f"call_{turn}", "content": json.loads(history)},
+            {"type": "ai", "content": f"Customer {busiest} has these tickets open."},
+        ]
+    return {
+        "request": {"query": f"Get customer information for ID {busiest}", "session_id": "chat-42"},
+        "customer": _response(customer),
+        "history": _response(history),
+        "customer_list": _response(mcp_server.list_customers(status="active")),
+        "session_history": {"query": "And the newest ticket?", "session_id": "chat-42", "messages": messages},
+    }
+
+
+# ==========================================
+# Measurement
+# ==========================================
+
+def _best_microseconds(function, repeat: int) -> float:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return round(min(timer.repeat(repeat=repeat, number=number)) / number * 1e6, 1)
+
+
+def measure(name: str, payload, fmt: str, level: int, repeat: int) -> dict:
+    """Size and encode/decode time of one payload in one format and gzip level (None: uncompressed)."""
+    media_type = FORMATS[fmt]
+    if level is None:
+        encode = lambda: wire.dumps(payload, media_type)  # noqa: E731
+        decode = lambda body: wire.loads(body, media_type)  # noqa: E731
+    else:
+        encode = lambda: gzip.compress(wire.dumps(payload, media_type), compresslevel=level, mtime=0)  # noqa: E731
+        decode = lambda body: wire.loads(gzip.decompress(body), media_type)  # noqa: E731
+    body = encode()
+    assert decode(body) == payload
+    return {
+        "payload": name, "format": fmt, "gzip_level": level, "bytes": len(body),
+        "encode_us": _best_microseconds(encode, repeat),
+        "decode_us": _best_microseconds(lambda: decode(body), repeat),
+    }
+
+
+def _print_row(r: dict, baseline_bytes: int):
+    level = "-" if r["gzip_level"] is None else r["gzip_level"]
+    print(f"  {r['payload']:<16} {r['format']:<8} gzip {level!s:<2} {r['bytes']:>9} B "
+          f"({r['bytes'] / baseline_bytes:>5.0%}) | encode {r['encode_us']:>9} us | decode {r['decode_us']:>9} us",
+          flush=True)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark A2A payload encodings: size and encode/decode time.")
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--tickets", type=int, default=50_000)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 5, 9], help="gzip levels to measure")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per measurement (best is kept)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "wire.db")
+        print(f"Generating {args.tickets} tickets / {args.customers} customers...", flush=True)
+        generate_database(db_path, customers=args.customers, tickets=args.tickets, seed=args.seed, verbose=False)
+        payloads = build_payloads(db_path)
+
+    results = []
+    for name, payload in payloads.items():
+        rows = [measure(name, payload, fmt, level, args.repeat)
+                for fmt in FORMATS for level in [None, *args.levels]]
+        for row in rows:
+            _print_row(row, rows[0]["bytes"])
+        results.extend(rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "config": {"customers": args.customers, "tickets": args.tickets, "levels": args.levels,
+                           "repeat": args.repeat, "seed": args.seed},
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Change Feed for customers and tickets
+Reads the trigger-fed change_log table (see migrations.py) and turns new
+entries into long-poll wake-ups and MCP resource-updated notifications.
+One poller per server reads the log, however many clients are waiting.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+
+from mcp import types
+
+log = logging.getLogger("change_feed")
+
+# Entries kept per database file; older ones are pruned by ChangeLogPruner
+CHANGE_LOG_KEEP = 100_000
+# Seconds between change log prunes
+CHANGE_LOG_PRUNE_INTERVAL_SECONDS = 60.0
+
+CHANGE_COLUMNS = "seq, table_name, op, row_id, customer_id, changed_at"
+
+
+def read_changes(conn: sqlite3.Connection, since_seq: int, limit: int) -> list:
+    """Change entries after since_seq, oldest first (a rowid range seek)."""
+    rows = conn.execute(
+        f"SELECT {CHANGE_COLUMNS} FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+        (since_seq, limit)
+    ).fetchall()
+    return [
+        {"seq": seq, "table": table, "op": op, "row_id": row_id,
+         "customer_id": customer_id, "changed_at": changed_at}
+        for seq, table, op, row_id, customer_id, changed_at in rows
+    ]
+
+
+def change_bounds(conn: sqlite3.Connection) -> tuple:
+    """(first retained seq, last seq) of a database's change log, 0 when empty."""
+    # Separate queries: SQLite only answers a lone MIN() or MAX() from the rowid b-tree
+    first = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    last = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()[0]
+    return first or 0, last or 0
+
+
+def prune_changes(conn: sqlite3.Connection, keep: int = CHANGE_LOG_KEEP) -> int:
+    """Delete all but the newest `keep` entries. Returns entries deleted."""
+    cursor = conn.execute(
+        "DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (keep,)
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+class ChangeLogPruner:
+    """Keeps a database's change log at CHANGE_LOG_KEEP entries from a daemon thread.
+
+    Runs whether or not anyone reads the feed: the triggers log every write.
+    """
+
+    def __init__(self, db_path: str, keep: int = CHANGE_LOG_KEEP):
+        self.db_path = db_path
+        self.keep = keep
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self) -> int:
+        """Prune once. Returns entries deleted."""
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            return prune_changes(conn, self.keep)
+        finally:
+            conn.close()
+
+    def start_background(self, interval_seconds: float = CHANGE_LOG_PRUNE_INTERVAL_SECONDS):
+        """Prune periodically in a daemon thread."""
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    deleted = self.run()
+                    if deleted:
+                        log.info("Pruned change log", extra={"deleted": deleted, "db": self.db_path})
+                except sqlite3.Error:
+                    log.error("Change log prune failed", exc_info=True, extra={"db": self.db_path})
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=loop, name="change-log-pruner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+def changed_resources(changes: list) -> set:
+    """Resource URIs whose content is affected by a list of change entries."""
+    uris = set()
+    for change in changes:
+        if change["customer_id"] is None:
+            continue
+        if change["table"] == "customers":
+            uris.add(f"customer://{change['customer_id']}")
+        else:
+            uris.add(f"customer://{change['customer_id']}/tickets")
+    return uris
+
+
+def parse_cursor(cursor: str, shards: int) -> list:
+    """Per-shard positions from a cursor ("12" or "12.7.9" with three shards)."""
+    positions = [int(part) for part in cursor.split(".")] if cursor else []
+    if len(positions) != shards:
+        raise ValueError(f"cursor must have {shards} dot-separated sequence numbers")
+    return positions
+
+
+def format_cursor(positions: list) -> str:
+    return ".".join(str(position) for position in positions)
+
+
+def advertise_resource_subscriptions(server):
+    """Make a low-level MCP server advertise resources.subscribe.
+
+    Written against mcp 1.22.0, whose Server.get_capabilities() always reports
+    subscribe=False, even with subscribe_resource() handlers registered; its
+    NotificationOptions only cover the list_changed flags. The wrapper turns
+    the flag on only when a subscribe handler is registered, and leaves a
+    server without get_capabilities alone (a newer SDK, which should then
+    advertise subscriptions itself).
+
+    Args:
+        server: The low-level mcp.server.lowlevel.Server (FastMCP._mcp_server)
+    """
+    get_capabilities = getattr(server, "get_capabilities", None)
+    if get_capabilities is None:
+        log.warning("MCP server has no get_capabilities(); resources.subscribe is not advertised")
+        return
+
+    def get_capabilities_with_subscribe(*args, **kwargs):
+        capabilities = get_capabilities(*args, **kwargs)
+        if capabilities.resources is not None and types.SubscribeRequest in server.request_handlers:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+    server.get_capabilities = get_capabilities_with_subscribe
+
+
+class ChangeFeed:
+    """Polls the change log of every shard and fans changes out to waiters.
+
+    Long-poll requests wait on a condition that the poller notifies, and
+    sessions subscribed to customer resources get resource-updated
+    notifications for the URIs the new entries touch.
+    """
+
+    def __init__(self, scatter, interval_seconds: float = 0.25):
+        """Configure the feed; the poller starts on first use.
+
+        Args:
+            scatter: mcp_server.scatter -- runs fn(conn), or fn(shard, conn) with
+                     with_shard=True, on every shard and returns results in shard order
+            interval_seconds: Delay between change log polls
+        """
+        self.scatter = scatter
+        self.interval_seconds = interval_seconds
+        self.heads = None
+        self.subscriptions = {}  # uri -> set of ServerSession
+        self._condition = None
+        self._task = None
+        self._loop = None
+
+    # ==========================================
+    # Subscriptions
+    # ==========================================
+
+    def subscribe(self, session, uri: str):
+        self.subscriptions.setdefault(uri, set()).add(session)
+        self.ensure_started()
+
+    def unsubscribe(self, session, uri: str):
+        sessions = self.subscriptions.get(uri)
+        if sessions:
+            sessions.discard(session)
+            if not sessions:
+                del self.subscriptions[uri]
+
+    async def _notify_subscribers(self, uris: set):
+        for uri in uris:
+            for session in list(self.subscriptions.get(uri, ())):
+                try:
+                    await session.send_resource_updated(uri)
+                except Exception:
+                    # Closed session: forget it rather than retrying every change
+                    self.unsubscribe(session, uri)
+
+    # ==========================================
+    # Polling
+    # ==========================================
+
+    def ensure_started(self):
+        """Start the poller in the running event loop (once per loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.heads = None
+            self._task = loop.create_task(self._poll_forever())
+
+    async def _poll_forever(self):
+        while True:
+            try:
+                await self.poll()
+            except sqlite3.Error:
+                log.error("Change feed poll failed", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def poll(self):
+        """Read new change log entries, notify subscribers and wake long-polls."""
+        heads = [last for _, last in await asyncio.to_thread(self.scatter, change_bounds)]
+        previous, self.heads = self.heads, heads
+        if previous is None or len(previous) != len(heads) or heads == previous:
+            return
+
+        if self.subscriptions:
+            def read_new(shard, conn):
+                return read_changes(conn, previous[shard], CHANGE_LOG_KEEP)
+            per_shard = await asyncio.to_thread(self.scatter, read_new, True)
+            await self._notify_subscribers(
+                changed_resources([change for changes in per_shard for change in changes])
+            )
+
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def wait(self, positions: list, timeout_seconds: float) -> bool:
+        """Wait until some shard's log moves past positions. Returns False on timeout."""
+        self.ensure_started()
+        if self.heads is None:
+            await self.poll()
+
+        def moved():
+            return any(head > position for head, position in zip(self.heads, positions))
+
+        async with self._condition:
+            try:
+                await asyncio.wait_for(self._condition.wait_for(moved), timeout_seconds)
+            except asyncio.TimeoutError:
+                return False
+        return True
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Shared pytest fixtures and helpers: the sample database most test files run
+against, a per-test span file so no test appends to the working directory's
+traces.jsonl, and helpers several test files use.
+"""
+
+import sqlite3
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import a2a_agents
+import mcp_server
+import tracing
+from archival import archive_path_for, attach_archive
+from database_setup import DatabaseSetup
+
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    """Export spans (if tracing is on) to a file in the test's tmp_path."""
+    path = str(tmp_path / "traces.jsonl")
+    exporter = tracing._exporter
+    monkeypatch.setattr(tracing, "TRACE_FILE", path)
+    monkeypatch.setattr(tracing, "OTLP_ENDPOINT", None)
+    yield path
+    # Write what is still queued here, not to ./traces.jsonl once the path is restored
+    exporter.flush()
+
+
+@pytest.fixture
+def sample_db(tmp_path, monkeypatch):
+    """Create a sample database and point the MCP server and in-process agents at it."""
+    db_path = str(tmp_path / "support.db")
+    db = DatabaseSetup(db_path)
+    db.connect()
+    db.create_tables()
+    db.create_triggers()
+    db.migrate()
+    db.insert_sample_data()
+    db.close()
+
+    monkeypatch.setattr(mcp_server, "DB_PATH", db_path)
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", 1)
+    monkeypatch.setattr(mcp_server, "_customer_replica", None)
+    monkeypatch.setattr(a2a_agents, "MONOLITH", True)
+    monkeypatch.setattr(a2a_agents, "agents", {})
+    return db_path
+
+
+# ==========================================
+# Helpers
+# ==========================================
+
+def query_plan(db_path: str, sql: str) -> list:
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if "archive." in sql:
+            attach_archive(conn, archive_path_for(db_path))
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    finally:
+        conn.close()
+
+
+class EchoAgent:
+    """Stands in for a compiled agent graph: answers with the last message."""
+
+    def __init__(self):
+        self.queries = []
+
+    async def ainvoke(self, inputs, config=None):
+        query = inputs["messages"][-1].content
+        self.queries.append(query)
+        return {"messages": inputs["messages"] + [AIMessage(content=f"handled: {query}")]}
+
+
+class CollectingExporter:
+    """Stands in for tracing's span exporter: keeps finished spans in a list."""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
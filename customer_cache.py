@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+In-Memory Customer Replica
+Keeps a copy of the customers table in process memory, indexed by id,
+status, email and normalized phone, so the hot customer reads of the MCP
+server never touch SQLite. The server refreshes single rows on its own
+writes; a background catch-up re-reads rows whose updated_at moved, for
+writers outside the server.
+"""
+
+import logging
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+
+from migrations import normalize_phone
+
+log = logging.getLogger("customer_cache")
+
+# Column order of the customers table, kept in the dicts the tools return
+CUSTOMER_COLUMNS = ("id", "name", "email", "phone", "status", "created_at", "updated_at")
+
+# Catch-up re-reads this much history before the watermark, so a write that
+# committed late with an earlier CURRENT_TIMESTAMP is not missed.
+CATCH_UP_OVERLAP_SECONDS = 5
+
+
+class CustomerRecord:
+    """One customer row; __slots__ keeps a million of them compact."""
+
+    __slots__ = CUSTOMER_COLUMNS
+
+    def __init__(self, row):
+        for name, value in zip(CUSTOMER_COLUMNS, row):
+            setattr(self, name, value)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in CUSTOMER_COLUMNS}
+
+
+def _add_id(index: dict, key, customer_id: int):
+    ids = index.setdefault(key, [])
+    position = bisect_left(ids, customer_id)
+    if position == len(ids) or ids[position] != customer_id:
+        ids.insert(position, customer_id)
+
+
+def _remove_id(index: dict, key, customer_id: int):
+    ids = index.get(key)
+    if ids:
+        position = bisect_left(ids, customer_id)
+        if position < len(ids) and ids[position] == customer_id:
+            del ids[position]
+        if not ids:
+            del index[key]
+
+
+class CustomerReplica:
+    """Read-only, indexed in-memory copy of the customers table of one or more shards."""
+
+    def __init__(self, db_paths: list):
+        """Initialize an empty replica; call load() to fill it.
+
+        Args:
+            db_paths: SQLite files holding customers (all shards of the layout)
+        """
+        self.db_paths = list(db_paths)
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._clear()
+
+    def _clear(self):
+        self.by_id = {}
+        self.ids = []          # Sorted ids, for ORDER BY id listings
+        self.by_status = {}    # status -> sorted ids
+        self.by_email = {}     # email -> sorted ids
+        self.by_phone = {}     # normalized phone -> sorted ids
+        self.watermarks = {path: "" for path in self.db_paths}
+        self.row_counts = {path: 0 for path in self.db_paths}
+
+    # ==========================================
+    # Index maintenance
+    # ==========================================
+
+    def _index(self, record: CustomerRecord):
+        _add_id(self.by_status, record.status, record.id)
+        if record.email:
+            _add_id(self.by_email, record.email, record.id)
+        if record.phone:
+            _add_id(self.by_phone, normalize_phone(record.phone), record.id)
+
+    def _unindex(self, record: CustomerRecord):
+        _remove_id(self.by_status, record.status, record.id)
+        if record.email:
+            _remove_id(self.by_email, record.email, record.id)
+        if record.phone:
+            _remove_id(self.by_phone, normalize_phone(record.phone), record.id)
+
+    def upsert(self, row) -> CustomerRecord:
+        """Insert or replace one customer from a customers row."""
+        record = CustomerRecord(row)
+        with self._lock:
+            previous = self.by_id.get(record.id)
+            if previous is not None:
+                self._unindex(previous)
+            else:
+                insort(self.ids, record.id)
+            self.by_id[record.id] = record
+            self._index(record)
+        return record
+
+    def remove(self, customer_id: int):
+        """Drop a customer that no longer exists in the database."""
+        with self._lock:
+            record = self.by_id.pop(customer_id, None)
+            if record is not None:
+                self._unindex(record)
+                del self.ids[bisect_left(self.ids, customer_id)]
+
+    # ==========================================
+    # Loading and catch-up
+    # ==========================================
+
+    def load(self) -> int:
+        """(Re)load every customer from every shard. Returns the number loaded."""
+        with self._lock:
+            self._clear()
+            for path in self.db_paths:
+                self._read(path, full=True)
+            return len(self.by_id)
+
+    def _read(self, path: str, full: bool) -> int:
+        """Read new and changed rows of one shard since its watermark."""
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            # One read transaction, so the watermark and count match the rows read
+            conn.execute("BEGIN")
+            if full:
+                cursor = conn.execute(f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers")
+            else:
+                # Served by idx_customers_updated_at
+                cursor = conn.execute(
+                    f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers "
+                    f"WHERE updated_at >= datetime(?, ?)",
+                    (self.watermarks[path], f"-{CATCH_UP_OVERLAP_SECONDS} seconds")
+                )
+            rows = cursor.fetchall()
+            watermark = conn.execute("SELECT MAX(updated_at) FROM customers").fetchone()[0]
+            count = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        finally:
+            conn.close()
+
+        with self._lock:
+            for row in rows:
+                self.upsert(row)
+            self.watermarks[path] = watermark or self.watermarks[path]
+            self.row_counts[path] = count
+        return len(rows)
+
+    def catch_up(self) -> dict:
+        """Apply writes made outside this process.
+
+        Updates and inserts are found through updated_at. Deletes leave no
+        trace there, so a shard whose row count no longer matches is reloaded.
+
+        Returns:
+            Dictionary with the number of rows re-read and whether a full reload ran
+        """
+        if not any(self.watermarks.values()):
+            return {"rows": self.load(), "reloaded": True}
+
+        rows = 0
+        for path in self.db_paths:
+            rows += self._read(path, full=not self.watermarks[path])
+        with self._lock:
+            known = len(self.by_id)
+            expected = sum(self.row_counts.values())
+        if known != expected:
+            return {"rows": self.load(), "reloaded": True}
+        return {"rows": rows, "reloaded": False}
+
+    def refresh_row(self, conn: sqlite3.Connection, customer_id: int):
+        """Re-read one customer after a write on conn (the write path hook)."""
+        row = conn.execute(
+            f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers WHERE id = ?", (customer_id,)
+        ).fetchone()
+        if row is None:
+            self.remove(customer_id)
+        else:
+            self.upsert(tuple(row))
+
+    def start_background(self, interval_seconds: float = 5.0):
+        """Run catch_up() periodically in a daemon thread."""
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.catch_up()
+                except sqlite3.Error:
+                    log.error("Customer replica catch-up failed", exc_info=True)
+
+        self._thread = threading.Thread(target=loop, name="customer-replica", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background catch-up thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    # ==========================================
+    # Queries (mirror the SQL of the MCP tools)
+    # ==========================================
+
+    def get(self, customer_id: int):
+        """Customer dict by id, or None."""
+        record = self.by_id.get(customer_id)
+        return record.as_dict() if record else None
+
+    def list(self, status: str = None, limit: int = 10) -> list:
+        """Customers ordered by id, optionally with one status."""
+        with self._lock:
+            ids = self.by_status.get(status, []) if status else self.ids
+            if limit >= 0:  # SQLite treats a negative LIMIT as no limit
+                ids = ids[:limit]
+            return [self.by_id[customer_id].as_dict() for customer_id in ids]
+
+    def find_by_email(self, email: str):
+        """Lowest-id customer with exactly this email, or None."""
+        with self._lock:
+            ids = self.by_email.get(email)
+            return self.by_id[ids[0]].as_dict() if ids else None
+
+    def find_by_phone(self, normalized_phone: str):
+        """Lowest-id customer with this normalized phone number, or None."""
+        with self._lock:
+            ids = self.by_phone.get(normalized_phone)
+            return self.by_id[ids[0]].as_dict() if ids else None
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator for scale testing.
+Builds a support database with millions of customers and tickets (Zipfian
+tickets per customer, realistic priority/status mix, timestamps spread over
+time) without any prompts, loading as fast as SQLite allows.
+
+Usage:
+    python data_generator.py --db scale.db --customers 1000000 --tickets 10000000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import time
+from itertools import chain
+
+import numpy as np
+
+from database_setup import DatabaseSetup
+from migrations import rebuild_ticket_stats
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+    "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Wei", "Yuki", "Min-jun", "Priya",
+    "Carlos", "Sofia", "Ahmed", "Fatima", "Ivan", "Olga", "Kofi", "Amara",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas", "Taylor",
+    "Moore", "Jackson", "Martin", "Lee", "Kim", "Park", "Chen", "Wang",
+    "Patel", "Singh", "Nguyen", "Silva", "Ivanov", "Mensah", "Okafor", "Sato",
+]
+DOMAINS = ["example.com", "techcorp.com", "email.com", "company.org", "startup.io", "business.net"]
+ISSUES = [
+    "Cannot login to account", "Password reset not working", "Payment processing failing",
+    "Charged twice for subscription", "Dashboard loading very slowly", "Export to CSV broken",
+    "Mobile app crashes on startup", "Email notifications not received", "API rate limit too low",
+    "Feature request: dark mode", "Question about pricing plans", "Need help upgrading account",
+    "Refund request", "Search returns wrong results", "Documentation outdated",
+]
+
+PRIORITIES = ["low", "medium", "high"]
+PRIORITY_WEIGHTS = [0.50, 0.35, 0.15]
+# Mean time-to-resolution per priority, in hours (exponentially distributed)
+MEAN_RESOLUTION_HOURS = [72.0, 24.0, 4.0]
+DISABLED_CUSTOMER_RATE = 0.08
+IN_PROGRESS_SHARE = 0.4  # Of unresolved tickets
+
+# Rows per multi-row INSERT statement (7 columns x 500 stays far below SQLite's
+# 32766 bound-parameter limit)
+ROWS_PER_STATEMENT = 500
+
+
+def _load_pragmas(conn: sqlite3.Connection):
+    """Trade durability for speed while the database is private to the loader."""
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MiB
+    conn.execute("PRAGMA foreign_keys = OFF")
+
+
+def _restore_pragmas(conn: sqlite3.Connection):
+    conn.execute("PRAGMA locking_mode = NORMAL")
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("PRAGMA synchronous = FULL")
+
+
+def _drop_secondary_objects(conn: sqlite3.Connection) -> list:
+    """Drop indexes and triggers on the bulk-loaded tables, returning their SQL."""
+    objects = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger')
+          AND tbl_name IN ('customers', 'tickets')
+          AND sql IS NOT NULL
+    """).fetchall()
+    for kind, name, _ in objects:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    return objects
+
+
+def _bulk_insert(conn: sqlite3.Connection, insert_sql: str, row_sql: str, rows: list):
+    """executemany() over multi-row VALUES statements.
+
+    Per-statement work (AUTOINCREMENT bookkeeping, CHECK setup, statement
+    reset) dominates single-row inserts, so rows are sent ROWS_PER_STATEMENT
+    at a time, with one shorter statement for the remainder.
+    """
+    n = ROWS_PER_STATEMENT
+    full = len(rows) - len(rows) % n
+    if full:
+        sql = insert_sql + ", ".join([row_sql] * n)
+        conn.executemany(sql, (tuple(chain.from_iterable(rows[k:k + n])) for k in range(0, full, n)))
+    if full < len(rows):
+        rest = rows[full:]
+        conn.execute(insert_sql + ", ".join([row_sql] * len(rest)), tuple(chain.from_iterable(rest)))
+
+
+def _customer_chunks(rng: np.random.Generator, count: int, chunk_size: int,
+                     start_epoch: int, span_seconds: int):
+    """Yield lists of customer rows
+    (id, name, email, phone, status, created_at, updated_at)."""
+    for first_id in range(1, count + 1, chunk_size):
+        n = min(chunk_size, count - first_id + 1)
+        ids = np.arange(first_id, first_id + n)
+        first = rng.integers(0, len(FIRST_NAMES), n)
+        last = rng.integers(0, len(LAST_NAMES), n)
+        domain = rng.integers(0, len(DOMAINS), n)
+        disabled = rng.random(n) < DISABLED_CUSTOMER_RATE
+        # Sign-up time grows with the customer id, with jitter inside its slot
+        created = start_epoch + ((ids - 1 + rng.random(n)) * span_seconds / count).astype(np.int64)
+
+        yield [
+            (
+                cid,
+                f"{FIRST_NAMES[f]} {LAST_NAMES[l]}",
+                f"{FIRST_NAMES[f].lower()}.{LAST_NAMES[l].lower()}{cid}@{DOMAINS[d]}",
+                f"+1-{200 + cid // 10_000_000 % 800:03d}-{cid % 10_000_000:07d}",
+                "disabled" if off else "active",
+                ts,
+                ts,
+            )
+            for cid, f, l, d, off, ts in zip(
+                ids.tolist(), first.tolist(), last.tolist(), domain.tolist(),
+                disabled.tolist(), created.tolist()
+            )
+        ]
+
+
+def _ticket_chunks(rng: np.random.Generator, count: int, customers: int, chunk_size: int,
+                   zipf_exponent: float, start_epoch: int, now_epoch: int):
+    """Yield lists of ticket rows
+    (id, customer_id, issue, status, priority, created_at, resolved_at)."""
+    # Bounded Zipf over customer ranks, with ranks shuffled onto customer ids so
+    # the heaviest customers are not simply the lowest ids.
+    weights = 1.0 / np.arange(1, customers + 1, dtype=np.float64) ** zipf_exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    rank_to_customer = rng.permutation(customers) + 1
+
+    span = now_epoch - start_epoch
+    mean_resolution = np.array(MEAN_RESOLUTION_HOURS) * 3600
+
+    for first_id in range(1, count + 1, chunk_size):
+        n = min(chunk_size, count - first_id + 1)
+        ids = np.arange(first_id, first_id + n)
+
+        customer_ids = rank_to_customer[np.searchsorted(cdf, rng.random(n))]
+        priority = rng.choice(len(PRIORITIES), size=n, p=PRIORITY_WEIGHTS)
+        issue = rng.integers(0, len(ISSUES), n)
+
+        # Creation time grows with the ticket id, with jitter inside its slot
+        created = start_epoch + ((ids - 1 + rng.random(n)) * span / count).astype(np.int64)
+
+        # Resolution times by priority; anything that would resolve in the future
+        # is still open or in progress today.
+        resolved = created + rng.exponential(mean_resolution[priority]).astype(np.int64)
+        unresolved = resolved >= now_epoch
+        in_progress = unresolved & (rng.random(n) < IN_PROGRESS_SHARE)
+        status = np.where(unresolved, np.where(in_progress, 1, 0), 2)
+
+        statuses = ("open", "in_progress", "resolved")
+        yield [
+            (tid, cid, ISSUES[i], statuses[s], PRIORITIES[p], c, None if s != 2 else r)
+            for tid, cid, i, s, p, c, r in zip(
+                ids.tolist(), customer_ids.tolist(), issue.tolist(), status.tolist(),
+                priority.tolist(), created.tolist(), resolved.tolist()
+            )
+        ]
+
+
+def generate_database(db_path: str, customers: int = 100_000, tickets: int = 1_000_000,
+                      seed: int = 42, chunk_size: int = 50_000, days: int = 365,
+                      zipf_exponent: float = 0.8, verbose: bool = True) -> dict:
+    """Create (or overwrite) a database filled with synthetic data.
+
+    Args:
+        db_path: Path of the SQLite file to create. An existing file is replaced.
+        customers: Number of customers to generate
+        tickets: Number of tickets to generate
+        seed: Random seed, so a given configuration always yields the same data
+        chunk_size: Rows per executemany() batch
+        days: How far back ticket and customer timestamps are spread
+        zipf_exponent: Skew of tickets per customer (higher is more skewed)
+        verbose: Print progress and the final report
+
+    Returns:
+        Dictionary with row counts, phase timings and rows per second
+    """
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    log = print if verbose else (lambda *args: None)
+    started = time.perf_counter()
+
+    # Schema (tables, triggers, migrations) exactly as DatabaseSetup builds it
+    setup = DatabaseSetup(db_path)
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        setup.connect()
+        setup.create_tables()
+        setup.create_triggers()
+        setup.migrate()
+    conn = setup.conn
+
+    _load_pragmas(conn)
+    deferred = _drop_secondary_objects(conn)
+    conn.commit()
+
+    rng = np.random.default_rng(seed)
+    now_epoch = int(time.time())
+    start_epoch = now_epoch - days * 86400
+    report = {"db_path": db_path, "customers": customers, "tickets": tickets, "seed": seed}
+
+    phase = time.perf_counter()
+    conn.execute("BEGIN")
+    for rows in _customer_chunks(rng, customers, chunk_size, start_epoch, days * 86400):
+        _bulk_insert(
+            conn,
+            "INSERT INTO customers (id, name, email, phone, status, created_at, updated_at) VALUES ",
+            "(?, ?, ?, ?, ?, datetime(?, 'unixepoch'), datetime(?, 'unixepoch'))",
+            rows,
+        )
+    conn.commit()
+    elapsed = time.perf_counter() - phase
+    report["customers_seconds"] = round(elapsed, 3)
+    report["customers_per_second"] = round(customers / elapsed) if elapsed else None
+    log(f"  customers: {customers:,} in {elapsed:.1f}s ({report['customers_per_second']:,} rows/s)")
+
+    phase = time.perf_counter()
+    conn.execute("BEGIN")
+    for rows in _ticket_chunks(rng, tickets, max(customers, 1), chunk_size,
+                               zipf_exponent, start_epoch, now_epoch):
+        _bulk_insert(
+            conn,
+            "INSERT INTO tickets (id, customer_id, issue, status, priority, created_at, resolved_at) VALUES ",
+            "(?, ?, ?, ?, ?, datetime(?, 'unixepoch'), datetime(?, 'unixepoch'))",
+            rows,
+        )
+    conn.commit()
+    elapsed = time.perf_counter() - phase
+    report["tickets_seconds"] = round(elapsed, 3)
+    report["tickets_per_second"] = round(tickets / elapsed) if elapsed else None
+    log(f"  tickets: {tickets:,} in {elapsed:.1f}s ({report['tickets_per_second']:,} rows/s)")
+
+    # Indexes are built once over sorted data instead of maintained per row,
+    # and ticket_stats is rebuilt with one GROUP BY instead of per-row triggers.
+    phase = time.perf_counter()
+    conn.execute("BEGIN")
+    for _, _, sql in deferred:
+        conn.execute(sql)
+    rebuild_ticket_stats(conn)
+    conn.commit()
+    conn.execute("ANALYZE")
+    report["index_seconds"] = round(time.perf_counter() - phase, 3)
+    log(f"  indexes, triggers and statistics rebuilt in {report['index_seconds']:.1f}s")
+
+    _restore_pragmas(conn)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.close()
+
+    total = time.perf_counter() - started
+    report["total_seconds"] = round(total, 3)
+    report["rows_per_second"] = round((customers + tickets) / total) if total else None
+    report["file_size_mb"] = round(os.path.getsize(db_path) / 1_048_576, 1)
+    return report
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic support database for scale testing.")
+    parser.add_argument("--db", default="scale.db", help="Output SQLite file (overwritten)")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=365, help="Time span of generated timestamps")
+    parser.add_argument("--zipf", type=float, default=0.8, help="Zipf exponent of tickets per customer")
+    parser.add_argument("--json", action="store_true", help="Print only the JSON report")
+    args = parser.parse_args()
+
+    report = generate_database(
+        args.db, customers=args.customers, tickets=args.tickets, seed=args.seed,
+        chunk_size=args.chunk_size, days=args.days, zipf_exponent=args.zipf,
+        verbose=not args.json,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
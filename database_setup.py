@@ -16,6 +16,8 @@ import sqlite3
 from datetime import datetime
 from pathlib import Path
 
+from migrations import migrate
+
 class DatabaseSetup:
     """SQLite database setup for customer support system."""
 
@@ -68,12 +70,8 @@ class DatabaseSetup:
         self.cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_customers_email ON customers(email)
         """)
-        self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tickets_customer_id ON tickets(customer_id)
-        """)
-        self.cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status)
-        """)
+        # Ticket indexes match the tools' query patterns and are managed
+        # by the schema migrations (see migrations.py)
 
         self.conn.commit()
         print("Tables created successfully!")
@@ -93,6 +91,14 @@ class DatabaseSetup:
         self.conn.commit()
         print("Triggers created successfully!")
 
+    def migrate(self):
+        """Apply pending schema migrations (see migrations.py)."""
+        applied = migrate(self.conn)
+        for version, description in applied:
+            print(f" - Migration {version}: {description}")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        print(f"Schema is at version {version}.")
+
     def insert_sample_data(self):
         """Insert sample data for testing."""
         # Sample customers (15 customers with diverse data)
@@ -372,6 +378,9 @@ def main():
         # Create triggers
         db.create_triggers()
 
+        # Bring the schema up to date (indexes, statistics, ...)
+        db.migrate()
+
         # Display schema
         db.display_schema()
 
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Deterministic Fake Chat Model
+A LangChain chat model that needs no network, so the whole router ->
+specialist -> MCP pipeline can be tested and benchmarked offline and
+reproducibly. Selected with LLM_PROVIDER=fake (see a2a_agents.get_llm).
+
+Each turn is answered, in order of preference, by:
+  1. Replay: the recorded response for the same system prompt, query and
+     turn, from transcripts written by TranscriptRecorder against the real
+     model (LLM_RECORD_TRANSCRIPTS).
+  2. Script: tool calls derived from the query with simple patterns
+     (customer ID -> get_customer / get_customer_history / create_ticket,
+     router -> delegate_to_specialist), one call per turn, then a final
+     answer built from the tool results.
+An optional latency distribution is slept before every response, standing
+in for the provider's response time.
+
+Environment:
+    FAKE_LLM_TRANSCRIPTS  Transcript files (.jsonl) to replay, comma-separated
+    FAKE_LLM_LATENCY      e.g. "fixed:0.4", "uniform:0.2,0.8", "normal:0.5,0.1",
+                          "lognormal:0.4,0.5" (median, sigma); default none
+    FAKE_LLM_SEED         Seed of the latency samples (default 0)
+
+Transcript lines: {"prompt", "query", "turn", "content", "tool_calls"}, where
+prompt identifies the system prompt (prompt_key) and tool_calls is a list of
+{"name", "args"}.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Characters per token when estimating usage for the token metrics
+CHARS_PER_TOKEN = 4
+
+# Tool results quoted in the scripted final answer are cut to this length
+ANSWER_RESULT_CHARS = 500
+
+_CUSTOMER_ID = re.compile(r"\b(?:customer\s*(?:id)?|id)\s*[#:]?\s*(\d+)", re.IGNORECASE)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{6,}\d")
+_NAME = re.compile(r"\bnamed?\s+([A-Z][\w'-]*)")
+_URGENT = re.compile(r"urgent|immediately|asap|charged twice|refund|angry|!", re.IGNORECASE)
+_SUPPORT_WORDS = re.compile(r"ticket|history|help|issue|problem|charged|refund|broken|error|urgent|stats",
+                            re.IGNORECASE)
+_DATA_WORDS = re.compile(r"info|details|list|email|phone|look ?up|find|account|customers", re.IGNORECASE)
+
+
+def prompt_key(system_prompt: str) -> str:
+    """Short stable ID of a system prompt, so transcripts tell the agents apart."""
+    return hashlib.sha1(system_prompt.encode()).hexdigest()[:12]
+
+
+def _conversation(messages: list) -> tuple:
+    """(system prompt, query, turn, tool results) of an agent conversation.
+
+    The query is the last human message; turn counts the model responses
+    since then (0 for the first call of an agent run).
+    """
+    system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+    start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    query = messages[start].content if start >= 0 else ""
+    later = messages[start + 1:]
+    turn = sum(isinstance(m, AIMessage) for m in later)
+    results = [m.content for m in later if isinstance(m, ToolMessage)]
+    return system, query, turn, results
+
+
+# ==========================================
+# Latency
+# ==========================================
+
+def parse_latency(spec: str):
+    """Sampler (rng -> seconds) for a latency spec such as "uniform:0.2,0.8".
+
+    A bare number is a fixed latency; empty, "0" or "none" means no delay.
+    """
+    spec = (spec or "").strip().lower()
+    if spec in ("", "0", "none"):
+        return lambda rng: 0.0
+    kind, _, values = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+    try:
+        params = [float(v) for v in values.split(",") if v.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid latency spec '{spec}'") from None
+    samplers = {
+        ("fixed", 1): lambda rng: params[0],
+        ("uniform", 2): lambda rng: rng.uniform(params[0], params[1]),
+        ("normal", 2): lambda rng: max(0.0, rng.gauss(params[0], params[1])),
+        # Median and sigma of log(latency): a long right tail like real providers
+        ("lognormal", 2): lambda rng: params[0] * rng.lognormvariate(0.0, params[1]),
+    }
+    sampler = samplers.get((kind, len(params)))
+    if sampler is None:
+        raise ValueError(f"Invalid latency spec '{spec}'")
+    return sampler
+
+
+# ==========================================
+# Record / Replay
+# ==========================================
+
+def load_transcripts(paths: list) -> dict:
+    """Recorded responses by (prompt key, query, turn); later files win."""
+    transcripts = {}
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    transcripts[(entry.get("prompt"), entry["query"], entry["turn"])] = entry
+    return transcripts
+
+
+class TranscriptRecorder(AsyncCallbackHandler):
+    """Appends every response of the chat model it is attached to as a
+    transcript line (attach via the model's callbacks)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.calls = {}  # LangChain run_id -> (prompt key, query, turn)
+        self._lock = threading.Lock()
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        system, query, turn, _ = _conversation(messages[0])
+        self.calls[run_id] = (prompt_key(system), query, turn)
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        key = self.calls.pop(run_id, None)
+        if key is None:
+            return
+        message = response.generations[0][0].message
+        content = message.content if isinstance(message.content, str) else message.text
+        entry = {
+            "prompt": key[0],
+            "query": key[1],
+            "turn": key[2],
+            "content": content,
+            "tool_calls": [{"name": c["name"], "args": c["args"]} for c in message.tool_calls],
+        }
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        self.calls.pop(run_id, None)
+
+
+# ==========================================
+# Scripted Responses
+# ==========================================
+
+def _router_plan(query: str) -> list:
+    agents = []
+    if _DATA_WORDS.search(query) or not _SUPPORT_WORDS.search(query):
+        agents.append("data")
+    if _SUPPORT_WORDS.search(query):
+        agents.append("support")
+    return [("delegate_to_specialist", {"agent_name": agent, "task_description": query}) for agent in agents]
+
+
+def _data_plan(query: str) -> list:
+    customer = _CUSTOMER_ID.search(query)
+    email = _EMAIL.search(query)
+    if customer and email and re.search(r"update|change", query, re.IGNORECASE):
+        return [("update_customer_email", {"customer_id": int(customer.group(1)), "new_email": email.group(0)})]
+    if re.search(r"\b(list|all)\b", query, re.IGNORECASE):
+        status = "disabled" if re.search(r"disabled|inactive", query, re.IGNORECASE) else "active"
+        return [("list_customers", {"status": status})]
+    if customer:
+        return [("get_customer", {"customer_id": int(customer.group(1))})]
+    if email:
+        return [("find_customer", {"email": email.group(0)})]
+    phone = _PHONE.search(query)
+    if phone:
+        return [("find_customer", {"phone": phone.group(0)})]
+    name = _NAME.search(query)
+    if name:
+        return [("find_customers_by_name", {"name_prefix": name.group(1)})]
+    return []
+
+
+def _support_plan(query: str) -> list:
+    customer = _CUSTOMER_ID.search(query)
+    customer_id = int(customer.group(1)) if customer else None
+    if re.search(r"\b(stats|statistics|how many|count)\b", query, re.IGNORECASE):
+        return [("get_ticket_stats", {} if customer_id is None else {"customer_id": customer_id})]
+    if customer_id is not None and re.search(r"history|past", query, re.IGNORECASE):
+        return [("get_customer_history", {"customer_id": customer_id})]
+    if re.search(r"open tickets|list tickets|queue", query, re.IGNORECASE):
+        priority = "high" if re.search(r"high", query, re.IGNORECASE) else None
+        return [("list_tickets", {"status": "open", "priority": priority})]
+    if customer_id is not None:
+        priority = "high" if _URGENT.search(query) else "medium"
+        return [("create_ticket", {"customer_id": customer_id, "issue": query, "priority": priority})]
+    return []
+
+
+def scripted_plan(query: str, tool_names: set) -> list:
+    """(tool, args) calls for a query, given the tools the agent has bound."""
+    if "delegate_to_specialist" in tool_names:
+        plan = _router_plan(query)
+    elif "create_ticket" in tool_names or "get_customer_history" in tool_names:
+        plan = _support_plan(query)
+    else:
+        plan = _data_plan(query)
+    return [(name, args) for name, args in plan if name in tool_names]
+
+
+def _final_answer(results: list) -> str:
+    if not results:
+        return "I could not find a tool for this request."
+    return "Here is what I found:\n" + "\n".join(str(r)[:ANSWER_RESULT_CHARS] for r in results)
+
+
+# ==========================================
+# Chat Model
+# ==========================================
+
+class FakeChatModel(BaseChatModel):
+    """Chat model answering from transcripts or scripts, with simulated latency."""
+
+    transcripts: dict = {}
+    latency: str = ""
+    seed: int = 0
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._sample_latency = parse_latency(self.latency)
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls) -> "FakeChatModel":
+        """A model configured from the FAKE_LLM_* environment variables."""
+        paths = [p for p in os.getenv("FAKE_LLM_TRANSCRIPTS", "").split(",") if p.strip()]
+        return cls(
+            transcripts=load_transcripts(paths),
+            latency=os.getenv("FAKE_LLM_LATENCY", ""),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _respond(self, messages: list, tools: list) -> ChatResult:
+        system, query, turn, results = _conversation(messages)
+        recorded = (self.transcripts.get((prompt_key(system), query, turn))
+                    or self.transcripts.get((None, query, turn)))
+        if recorded:
+            content, calls = recorded.get("content", ""), [(c["name"], c["args"]) for c in recorded["tool_calls"]]
+        else:
+            tool_names = {t["function"]["name"] for t in tools or []}
+            plan = scripted_plan(query, tool_names)
+            calls = plan[turn:turn + 1]
+            content = "" if calls else _final_answer(results)
+
+        message = AIMessage(
+            content=content,
+            tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}
+                        for name, args in calls],
+        )
+        usage = {
+            "input_tokens": sum(len(str(m.content)) for m in messages) // CHARS_PER_TOKEN,
+            "output_tokens": (len(content) + len(json.dumps([args for _, args in calls]))) // CHARS_PER_TOKEN,
+        }
+        message.usage_metadata = {**usage, "total_tokens": usage["input_tokens"] + usage["output_tokens"]}
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"usage": usage})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._sample_latency(self._rng))
+        return self._respond(messages, kwargs.get("tools"))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._sample_latency(self._rng))
+        return self._respond(messages, kwargs.get("tools"))
+
+    def _combine_llm_outputs(self, llm_outputs: list) -> dict:
+        usage = {}
+        for output in llm_outputs:
+            for key, value in ((output or {}).get("usage") or {}).items():
+                usage[key] = usage.get(key, 0) + value
+        return {"usage": usage}
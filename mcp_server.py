@@ -4,22 +4,144 @@ MCP Server Implementation using Official MCP Python SDK
 Provides customer service tools via Model Context Protocol.
 """
 
+import time
+_STARTED = time.perf_counter()  # Start of the cold-start timing reported by /health
+
+import argparse
+import asyncio
+import hashlib
+import logging
 import sqlite3
 import json
+import os
 from datetime import datetime
+from heapq import merge
+from itertools import islice
+import uvicorn
+from mcp import types
 from mcp.server.fastmcp import FastMCP
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from archival import TicketArchiver, archive_path_for, attach_archive_readonly
+from change_feed import (
+    ChangeFeed, ChangeLogPruner, advertise_resource_subscriptions, change_bounds, format_cursor, parse_cursor,
+    read_changes,
+)
+from customer_cache import CustomerReplica
+from migrations import (
+    GLOBAL_STATS_ID, PHONE_NORMALIZED_SQL, TICKET_STATS_COUNTERS, migrate_database, normalize_phone,
+)
+from sharding import ShardMap, next_ticket_id
+from ticket_analytics import TicketAnalytics, combined_report
+import metrics
+import structured_logging
+import tracing
+from profiling import RequestProfiler, admin_endpoints, slow_queries
+from metrics import REGISTRY, SQLITE_QUERY_SECONDS
+from tracing import TracedConnection
+
+# Cold-start breakdown, in seconds (see /health)
+STARTUP = {"imports_seconds": round(time.perf_counter() - _STARTED, 3)}
 
 # Initialize FastMCP server
 mcp = FastMCP("Customer Service MCP Server")
+tracing.configure("mcp-server")
+log = logging.getLogger("mcp_server")
+
+# Metrics served at /metrics (see metrics.py); cache sizes are read at scrape time
+MCP_REQUEST_SECONDS = REGISTRY.histogram(
+    "mcp_request_duration_seconds", "MCP tool call and resource read time by name.",
+    ("method", "name"),
+)
+MCP_REQUEST_ERRORS = REGISTRY.counter(
+    "mcp_request_errors_total", "MCP tool calls and resource reads that returned an error.",
+    ("method", "name"),
+)
+MCP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "mcp_requests_in_flight", "MCP requests being handled.", ("method",),
+)
+REPLICA_LOOKUPS = REGISTRY.counter(
+    "customer_replica_lookups_total", "Customer lookups served by the in-memory replica.",
+    ("result",),
+)
+_REPLICA_HIT, _REPLICA_MISS = REPLICA_LOOKUPS.labels("hit"), REPLICA_LOOKUPS.labels("miss")
+
+DB_PATH = os.getenv("MCP_DB_PATH", "support.db")
+
+# Archive of old resolved tickets (see archival.py). Defaults to <db>_archive.db.
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH")
+# Archive resolved tickets older than this many days in the background (unset = off)
+ARCHIVE_AFTER_DAYS = os.getenv("TICKET_ARCHIVE_AFTER_DAYS")
+# Number of SQLite files customers and their tickets are partitioned across by
+# customer_id (see sharding.py). With 1, everything lives in DB_PATH.
+SHARD_COUNT = int(os.getenv("MCP_SHARDS", "1"))
+# Serve customer reads from an in-memory replica (see customer_cache.py)
+CUSTOMER_REPLICA = os.getenv("MCP_CUSTOMER_REPLICA", "1") == "1"
+# Seconds between replica catch-ups for writes made outside this server
+CUSTOMER_REPLICA_CATCH_UP = float(os.getenv("MCP_CUSTOMER_REPLICA_CATCH_UP", "5"))
 
-DB_PATH = "support.db"
+_shard_map = None
 
-def get_db_connection():
-    """Get SQLite database connection."""
-    conn = sqlite3.connect(DB_PATH)
+def get_shard_map() -> ShardMap:
+    """Get the shard layout for the current database."""
+    global _shard_map
+    if _shard_map is None or (_shard_map.db_path, _shard_map.count) != (DB_PATH, SHARD_COUNT):
+        _shard_map = ShardMap(DB_PATH, SHARD_COUNT)
+    return _shard_map
+
+def get_db_connection(customer_id: int = None, shard: int = None):
+    """Get SQLite database connection.
+
+    Args:
+        customer_id: Connect to the shard holding this customer
+        shard: Connect to this shard number. Defaults to the first shard.
+    """
+    shards = get_shard_map()
+    if customer_id is not None:
+        shard = shards.index_for(customer_id)
+    # Statements become spans of the calling request's trace (see tracing.py)
+    # uri=True lets readers ATTACH the archive read-only (file:...?mode=ro)
+    conn = sqlite3.connect(shards.paths[shard or 0], timeout=30.0, factory=TracedConnection, uri=True)
     conn.row_factory = sqlite3.Row
     return conn
 
+def scatter(query, with_shard: bool = False) -> list:
+    """Run query(conn) on every shard and return the per-shard results in shard order.
+
+    With with_shard=True the query is called as query(shard, conn).
+    """
+    def run(shard):
+        conn = get_db_connection(shard=shard)
+        try:
+            return query(shard, conn) if with_shard else query(conn)
+        finally:
+            conn.close()
+    return get_shard_map().map(run)
+
+# In-memory customer replica, started with the server when CUSTOMER_REPLICA is set
+_customer_replica = None
+
+def start_customer_replica() -> CustomerReplica:
+    """Load the customer replica for the current shards and keep it caught up."""
+    global _customer_replica
+    replica = CustomerReplica(get_shard_map().paths)
+    replica.load()
+    replica.start_background(CUSTOMER_REPLICA_CATCH_UP)
+    _customer_replica = replica
+    return replica
+
+# Ticket analytics arrays (one engine per shard), loaded on first use and
+# refreshed incrementally
+_analytics = []
+
+def get_analytics() -> list:
+    """Get the analytics engines for the current database shards."""
+    global _analytics
+    paths = get_shard_map().paths
+    if [engine.db_path for engine in _analytics] != paths:
+        _analytics = [TicketAnalytics(path) for path in paths]
+    return _analytics
+
 @mcp.tool()
 def get_customer(customer_id: int) -> str:
     """
@@ -31,12 +153,16 @@ def get_customer(customer_id: int) -> str:
     Returns:
         JSON string with customer data or error message
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM customers WHERE id = ?', (customer_id,))
-    row = cursor.fetchone()
-    conn.close()
+    if _customer_replica is not None:
+        row = _customer_replica.get(customer_id)
+        (_REPLICA_HIT if row else _REPLICA_MISS).inc()
+    else:
+        conn = get_db_connection(customer_id)
+        cursor = conn.cursor()
+
+        cursor.execute('SELECT * FROM customers WHERE id = ?', (customer_id,))
+        row = cursor.fetchone()
+        conn.close()
     
     if row:
         customer = dict(row)
@@ -56,20 +182,110 @@ def list_customers(status: str = None, limit: int = 10) -> str:
     Returns:
         JSON string with list of customers
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    if _customer_replica is not None:
+        return json.dumps(_customer_replica.list(status, limit), indent=2)
+
     if status:
-        cursor.execute(
-            'SELECT * FROM customers WHERE status = ? LIMIT ?',
-            (status, limit)
-        )
+        query = ('SELECT * FROM customers WHERE status = ? ORDER BY id LIMIT ?', (status, limit))
     else:
-        cursor.execute('SELECT * FROM customers LIMIT ?', (limit,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
+        query = ('SELECT * FROM customers ORDER BY id LIMIT ?', (limit,))
+
+    # Each shard returns its first `limit` rows by id; merging keeps the global order
+    per_shard = scatter(lambda conn: conn.execute(*query).fetchall())
+    rows = islice(merge(*per_shard, key=lambda row: row["id"]), limit)
+
+    customers = [dict(row) for row in rows]
+    return json.dumps(customers, indent=2)
+
+def _first_by_id(rows: list):
+    """Pick the lowest-id match among per-shard lookup results (None = no match)."""
+    return min((row for row in rows if row is not None), key=lambda row: row["id"], default=None)
+
+@mcp.tool()
+def find_customer_by_email(email: str) -> str:
+    """
+    Find a customer by exact email address.
+
+    Args:
+        email: The customer's email address
+
+    Returns:
+        JSON string with customer data or error message
+    """
+    if _customer_replica is not None:
+        row = _customer_replica.find_by_email(email.strip())
+        (_REPLICA_HIT if row else _REPLICA_MISS).inc()
+    else:
+        # Served by idx_customers_email; the rowid tiebreak needs no extra sort.
+        row = _first_by_id(scatter(lambda conn: conn.execute(
+            'SELECT * FROM customers WHERE email = ? ORDER BY id LIMIT 1',
+            (email.strip(),)
+        ).fetchone()))
+
+    if row:
+        return json.dumps(dict(row), indent=2)
+    else:
+        return json.dumps({"error": f"Customer with email {email} not found"})
+
+@mcp.tool()
+def find_customer_by_phone(phone: str) -> str:
+    """
+    Find a customer by phone number, ignoring formatting such as
+    '+', '-', spaces, dots and parentheses.
+
+    Args:
+        phone: The customer's phone number in any common format
+
+    Returns:
+        JSON string with customer data or error message
+    """
+    normalized = normalize_phone(phone)
+    if not normalized:
+        return json.dumps({"error": "Phone number is empty"})
+
+    if _customer_replica is not None:
+        row = _customer_replica.find_by_phone(normalized)
+        (_REPLICA_HIT if row else _REPLICA_MISS).inc()
+    else:
+        # Served by the idx_customers_phone_normalized expression index.
+        row = _first_by_id(scatter(lambda conn: conn.execute(
+            f'SELECT * FROM customers WHERE {PHONE_NORMALIZED_SQL} = ? ORDER BY id LIMIT 1',
+            (normalized,)
+        ).fetchone()))
+
+    if row:
+        return json.dumps(dict(row), indent=2)
+    else:
+        return json.dumps({"error": f"Customer with phone {phone} not found"})
+
+@mcp.tool()
+def find_customers_by_name(name_prefix: str, limit: int = 10) -> str:
+    """
+    Find customers whose name starts with the given prefix (case-insensitive).
+
+    Args:
+        name_prefix: Beginning of the customer's name, e.g. 'jo' matches 'John Doe'
+        limit: Maximum number of customers to return. Default is 10.
+
+    Returns:
+        JSON string with list of customers ordered by name
+    """
+    prefix = name_prefix.strip().lower()
+    if not prefix:
+        return json.dumps({"error": "Name prefix is empty"})
+
+    # A prefix match is the half-open range [prefix, next prefix), which
+    # idx_customers_name_nocase answers as a single range seek.
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    per_shard = scatter(lambda conn: conn.execute('''
+        SELECT * FROM customers
+        WHERE name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE
+        ORDER BY name COLLATE NOCASE
+        LIMIT ?
+    ''', (prefix, upper_bound, limit)).fetchall())
+    rows = islice(merge(*per_shard, key=lambda row: (row["name"].lower(), row["id"])), limit)
+
     customers = [dict(row) for row in rows]
     return json.dumps(customers, indent=2)
 
@@ -89,7 +305,7 @@ def update_customer(customer_id: int, name: str = None, email: str = None,
     Returns:
         Success or error message
     """
-    conn = get_db_connection()
+    conn = get_db_connection(customer_id)
     cursor = conn.cursor()
     
     # Build update query dynamically
@@ -122,6 +338,8 @@ def update_customer(customer_id: int, name: str = None, email: str = None,
     conn.commit()
     
     updated = cursor.rowcount > 0
+    if updated and _customer_replica is not None:
+        _customer_replica.refresh_row(conn, customer_id)
     conn.close()
     
     if updated:
@@ -142,15 +360,25 @@ def create_ticket(customer_id: int, issue: str, priority: str = "medium") -> str
     Returns:
         Success message with ticket ID or error
     """
-    conn = get_db_connection()
+    shards = get_shard_map()
+    conn = get_db_connection(customer_id)
     cursor = conn.cursor()
     
-    cursor.execute('''
-        INSERT INTO tickets (customer_id, issue, priority, status)
-        VALUES (?, ?, ?, 'open')
-    ''', (customer_id, issue, priority))
-    
-    ticket_id = cursor.lastrowid
+    if shards.count > 1:
+        # Ticket ids must stay unique across shards: allocate one from this
+        # shard's residue class while holding its write lock.
+        cursor.execute("BEGIN IMMEDIATE")
+        ticket_id = next_ticket_id(conn, shards.index_for(customer_id), shards.count)
+        cursor.execute('''
+            INSERT INTO tickets (id, customer_id, issue, priority, status)
+            VALUES (?, ?, ?, ?, 'open')
+        ''', (ticket_id, customer_id, issue, priority))
+    else:
+        cursor.execute('''
+            INSERT INTO tickets (customer_id, issue, priority, status)
+            VALUES (?, ?, ?, 'open')
+        ''', (customer_id, issue, priority))
+        ticket_id = cursor.lastrowid
     conn.commit()
     conn.close()
     
@@ -161,17 +389,19 @@ def create_ticket(customer_id: int, issue: str, priority: str = "medium") -> str
     })
 
 @mcp.tool()
-def get_customer_history(customer_id: int) -> str:
+def get_customer_history(customer_id: int, include_archive: bool = False) -> str:
     """
-    Get all tickets for a specific customer.
+    Get all tickets for a specific customer, newest first.
     
     Args:
         customer_id: The unique customer ID
+        include_archive: Also include old resolved tickets that were moved to
+                         the archive. Default is False (recent tickets only).
         
     Returns:
         JSON string with list of tickets
     """
-    conn = get_db_connection()
+    conn = get_db_connection(customer_id)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -180,16 +410,481 @@ def get_customer_history(customer_id: int) -> str:
         ORDER BY created_at DESC
     ''', (customer_id,))
     
-    rows = cursor.fetchall()
+    tickets = [dict(row) for row in cursor.fetchall()]
+
+    # No archive file yet means nothing was archived
+    archive_path = ARCHIVE_DB_PATH or archive_path_for(get_shard_map().path_for(customer_id))
+    if include_archive and attach_archive_readonly(conn, archive_path):
+        cursor.execute('''
+            SELECT * FROM archive.tickets_archive
+            WHERE customer_id = ?
+            ORDER BY created_at DESC
+        ''', (customer_id,))
+        # A ticket can briefly exist in both places while a batch is retried
+        hot_ids = {ticket["id"] for ticket in tickets}
+        archived = [dict(row) for row in cursor.fetchall() if row["id"] not in hot_ids]
+        tickets = list(merge(tickets, archived, key=lambda t: t["created_at"] or "", reverse=True))
+
     conn.close()
-    
+    return json.dumps(tickets, indent=2)
+
+@mcp.tool()
+def list_tickets(status: str = "open", priority: str = None, limit: int = 20) -> str:
+    """
+    List tickets with a given status, optionally of one priority, oldest first.
+
+    Args:
+        status: Ticket status - 'open', 'in_progress' or 'resolved'. Default is 'open'.
+        priority: Filter by priority - 'low', 'medium' or 'high'. Optional.
+        limit: Maximum number of tickets to return. Default is 20.
+
+    Returns:
+        JSON string with list of tickets
+    """
+    if priority:
+        query = ('''
+            SELECT * FROM tickets
+            WHERE status = ? AND priority = ?
+            ORDER BY created_at
+            LIMIT ?
+        ''', (status, priority, limit))
+    else:
+        query = ('''
+            SELECT * FROM tickets
+            WHERE status = ?
+            ORDER BY created_at
+            LIMIT ?
+        ''', (status, limit))
+
+    per_shard = scatter(lambda conn: conn.execute(*query).fetchall())
+    # Equal timestamps come out of the index in rowid order, so ids break ties
+    rows = islice(merge(*per_shard, key=lambda row: (row["created_at"] or "", row["id"])), limit)
+
     tickets = [dict(row) for row in rows]
     return json.dumps(tickets, indent=2)
 
+@mcp.tool()
+def get_ticket_stats(customer_id: int = None, top: int = 5) -> str:
+    """
+    Get ticket counts by status and priority, for one customer or overall.
+    Served from the trigger-maintained ticket_stats table, so the cost does
+    not grow with the number of tickets. Archived tickets are not counted.
+
+    Args:
+        customer_id: Customer to report on. Optional; omit for global statistics.
+        top: For global statistics, how many customers with the most tickets
+             to include. Default is 5.
+
+    Returns:
+        JSON string with ticket statistics
+    """
+    if customer_id is not None:
+        conn = get_db_connection(customer_id)
+        row = conn.execute(
+            'SELECT * FROM ticket_stats WHERE customer_id = ?', (customer_id,)
+        ).fetchone()
+        conn.close()
+        counts = dict(row) if row else {}
+    else:
+        def shard_stats(conn):
+            totals = conn.execute(
+                'SELECT * FROM ticket_stats WHERE customer_id = ?', (GLOBAL_STATS_ID,)
+            ).fetchone()
+            # Served by the partial idx_ticket_stats_total index: reads `top` rows.
+            leaders = conn.execute(f'''
+                SELECT customer_id, total FROM ticket_stats
+                WHERE customer_id != {GLOBAL_STATS_ID}
+                ORDER BY total DESC
+                LIMIT ?
+            ''', (top,)).fetchall()
+            return totals, leaders
+
+        # Every shard keeps its own global row; the overall counts are their sum
+        per_shard = scatter(shard_stats)
+        counts = {
+            name: sum(totals[name] for totals, _ in per_shard if totals)
+            for name, _ in TICKET_STATS_COUNTERS
+        }
+
+    stats = {
+        "scope": "global" if customer_id is None else f"customer {customer_id}",
+        "total": counts.get("total", 0),
+        "by_status": {
+            status: counts.get(status, 0)
+            for status in ("open", "in_progress", "resolved")
+        },
+        "by_priority": {
+            priority: counts.get(priority, 0)
+            for priority in ("high", "medium", "low")
+        },
+    }
+
+    if customer_id is None:
+        # A customer lives in exactly one shard, so the global top is the top of the shard tops
+        leaders = merge(*(rows for _, rows in per_shard), key=lambda r: (-r["total"], r["customer_id"]))
+        stats["top_customers"] = [dict(r) for r in islice(leaders, top)]
+
+    return json.dumps(stats, indent=2)
+
+@mcp.tool()
+def get_ticket_analytics(window_hours: int = 24, rolling_hours: int = 3) -> str:
+    """
+    Get backlog and SLA analytics: open-ticket aging, ticket arrivals per hour
+    and time-to-resolution percentiles by priority.
+
+    Args:
+        window_hours: How many recent hours of arrivals to report. Default is 24.
+        rolling_hours: Width of the rolling average over arrivals. Default is 3.
+
+    Returns:
+        JSON string with analytics report
+    """
+    if window_hours < 1:
+        return json.dumps({"error": "window_hours must be at least 1"})
+
+    report = combined_report(get_analytics(), window_hours=window_hours, rolling_hours=rolling_hours)
+    return json.dumps(report, indent=2)
+
+# ==========================================
+# Resources with ETags
+# ==========================================
+# customer://{id} and customer://{id}/tickets carry an ETag. Reading
+# .../if-none-match/{etag} with the current ETag returns {"not_modified": true}
+# after two index lookups, without reading or serializing the body.
+
+def _etag(*parts) -> str:
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:16]
+
+def _last_change(conn, customer_id: int, table: str) -> int:
+    # Served by idx_change_log_customer
+    row = conn.execute(
+        'SELECT MAX(seq) FROM change_log WHERE customer_id = ? AND table_name = ?',
+        (customer_id, table)
+    ).fetchone()
+    return row[0] or 0
+
+def _customer_etag(conn, customer_id: int):
+    row = conn.execute('SELECT updated_at FROM customers WHERE id = ?', (customer_id,)).fetchone()
+    if row is None:
+        return None
+    return _etag(row[0], _last_change(conn, customer_id, "customers"))
+
+def _tickets_etag(conn, customer_id: int) -> str:
+    row = conn.execute('SELECT total FROM ticket_stats WHERE customer_id = ?', (customer_id,)).fetchone()
+    return _etag(row[0] if row else 0, _last_change(conn, customer_id, "tickets"))
+
+def _read_versioned(customer_id: int, etag_of, read_body, if_none_match: str = None) -> str:
+    """Read a resource body with its ETag in one snapshot, or report it unchanged."""
+    conn = get_db_connection(customer_id)
+    try:
+        conn.execute("BEGIN")  # One read transaction: the ETag matches the body
+        etag = etag_of(conn, customer_id)
+        if etag is None:
+            return json.dumps({"error": f"Customer with ID {customer_id} not found"})
+        if if_none_match == etag:
+            return json.dumps({"not_modified": True, "etag": etag})
+        return json.dumps({"etag": etag, **read_body(conn)}, indent=2)
+    finally:
+        conn.close()
+
+def _customer_body(customer_id: int):
+    def read(conn):
+        row = conn.execute('SELECT * FROM customers WHERE id = ?', (customer_id,)).fetchone()
+        return {"customer": dict(row)}
+    return read
+
+def _tickets_body(customer_id: int):
+    def read(conn):
+        rows = conn.execute('''
+            SELECT * FROM tickets
+            WHERE customer_id = ?
+            ORDER BY created_at DESC
+        ''', (customer_id,)).fetchall()
+        return {"tickets": [dict(row) for row in rows]}
+    return read
+
+@mcp.resource("customer://{customer_id}", mime_type="application/json")
+def customer_resource(customer_id: int) -> str:
+    """Customer record with its ETag."""
+    return _read_versioned(customer_id, _customer_etag, _customer_body(customer_id))
+
+@mcp.resource("customer://{customer_id}/if-none-match/{etag}", mime_type="application/json")
+def customer_resource_if_changed(customer_id: int, etag: str) -> str:
+    """Customer record, or {"not_modified": true} if its ETag still equals etag."""
+    return _read_versioned(customer_id, _customer_etag, _customer_body(customer_id), etag)
+
+@mcp.resource("customer://{customer_id}/tickets", mime_type="application/json")
+def customer_tickets_resource(customer_id: int) -> str:
+    """Customer's tickets, newest first, with their ETag."""
+    return _read_versioned(customer_id, _tickets_etag, _tickets_body(customer_id))
+
+@mcp.resource("customer://{customer_id}/tickets/if-none-match/{etag}", mime_type="application/json")
+def customer_tickets_resource_if_changed(customer_id: int, etag: str) -> str:
+    """Customer's tickets, or {"not_modified": true} if their ETag still equals etag."""
+    return _read_versioned(customer_id, _tickets_etag, _tickets_body(customer_id), etag)
+
+# Change feed over change_log: wakes long-polls and notifies resource subscribers
+_change_feed = ChangeFeed(scatter)
+
+# Longest a get_changes call may wait for new changes
+MAX_CHANGES_WAIT_SECONDS = 30
+
+@mcp.tool()
+async def get_changes(since_seq: int = 0, cursor: str = None, limit: int = 100,
+                      timeout_seconds: float = 0) -> str:
+    """
+    Get customer and ticket changes (inserts, updates, deletes) after a
+    position in the change feed, optionally waiting for new ones (long poll).
+
+    Args:
+        since_seq: Sequence number of the last change already seen. 0 reads from the start.
+        cursor: Position returned by a previous call. Required instead of since_seq
+                when the database is sharded. Optional.
+        limit: Maximum number of changes to return. Default is 100.
+        timeout_seconds: If there are no new changes, wait up to this long for one
+                         (at most 30). Default is 0 (return immediately).
+
+    Returns:
+        JSON string with the changes and the cursor to pass next time. "reset" is
+        true when changes after the position were pruned (or the feed restarted);
+        the caller must then re-read what it caches.
+    """
+    shards = get_shard_map().count
+    try:
+        if cursor:
+            positions = parse_cursor(cursor, shards)
+        elif shards == 1 or since_seq == 0:
+            positions = [since_seq] * shards
+        else:
+            return json.dumps({"error": "Database is sharded: pass the cursor from a previous call"})
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+
+    def read(shard, conn):
+        first, last = change_bounds(conn)
+        return first, last, read_changes(conn, positions[shard], limit)
+
+    per_shard = await asyncio.to_thread(scatter, read, True)
+    if not any(changes for _, _, changes in per_shard) and timeout_seconds > 0:
+        if await _change_feed.wait(positions, min(timeout_seconds, MAX_CHANGES_WAIT_SECONDS)):
+            per_shard = await asyncio.to_thread(scatter, read, True)
+
+    # Entries before the first retained one are gone, and a position past the
+    # last one means the log was rebuilt (e.g. by a reshard)
+    if any(
+        position > last or (first and position < first - 1)
+        for position, (first, last, _) in zip(positions, per_shard)
+    ):
+        return json.dumps({
+            "changes": [],
+            "cursor": format_cursor([last for _, last, _ in per_shard]),
+            "reset": True,
+        }, indent=2)
+
+    streams = [
+        [dict(change, shard=shard) for change in changes] if shards > 1 else changes
+        for shard, (_, _, changes) in enumerate(per_shard)
+    ]
+    changes = list(islice(merge(*streams, key=lambda c: (c["changed_at"] or "", c["seq"])), limit))
+    next_positions = list(positions)
+    for change in changes:
+        next_positions[change.get("shard", 0)] = change["seq"]
+
+    result = {"changes": changes, "cursor": format_cursor(next_positions), "reset": False}
+    if shards == 1:
+        result["next_seq"] = next_positions[0]
+    return json.dumps(result, indent=2)
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri) -> None:
+    """Send resource-updated notifications for customer://{id}[/tickets] to this session."""
+    _change_feed.subscribe(mcp.get_context().session, str(uri))
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri) -> None:
+    _change_feed.unsubscribe(mcp.get_context().session, str(uri))
+
+def _instrument_requests(request_type, method: str, name_of):
+    """Time an MCP request handler and run it inside a span continuing the caller's trace.
+
+    Callers pass their traceparent in the request's _meta; requests without
+    one are not traced, but are always measured. SQL run by the handler is
+    timed into sqlite_query_duration_seconds under the request's name.
+    """
+    handler = mcp._mcp_server.request_handlers[request_type]
+    in_flight = MCP_REQUESTS_IN_FLIGHT.labels(method)
+
+    async def instrumented_handler(request):
+        name = name_of(request.params)
+        meta = request.params.meta if request.params else None
+        in_flight.inc()
+        sql_timer = metrics.sql_timer.set(SQLITE_QUERY_SECONDS.labels(name))
+        request_id = structured_logging.request_id.set(getattr(meta, "request_id", None))
+        started = time.perf_counter()
+        result = None
+        try:
+            with tracing.traced_from(getattr(meta, "traceparent", None), f"mcp.{method} {name}"), \
+                    profiler.profile(name):
+                result = await handler(request)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.sql_timer.reset(sql_timer)
+            in_flight.dec()
+            MCP_REQUEST_SECONDS.labels(method, name).observe(elapsed)
+            failed = result is None or _is_error(result)
+            if failed:
+                MCP_REQUEST_ERRORS.labels(method, name).inc()
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Handled MCP request", extra={
+                    "method": method, "target": name, "duration_ms": round(elapsed * 1000, 2), "failed": failed,
+                })
+            structured_logging.request_id.reset(request_id)
+
+    mcp._mcp_server.request_handlers[request_type] = instrumented_handler
+
+def _is_error(result: types.ServerResult) -> bool:
+    """Whether a tool or resource result failed or carries this server's {"error": ...} JSON."""
+    result = result.root
+    if getattr(result, "isError", False):
+        return True
+    content = getattr(result, "content", None) or getattr(result, "contents", None)
+    text = getattr(content[0], "text", None) if content else None
+    return bool(text) and text.lstrip("{ \n").startswith('"error"')
+
+def _resource_name(uri) -> str:
+    """Resource URI template (ids and ETags replaced) to keep metric label sets bounded."""
+    scheme, _, path = str(uri).partition("://")
+    parts = path.split("/")
+    return scheme + "://" + "/".join(
+        "{id}" if part.isdigit() else part for part in parts[:2]
+    )
+
+# Armed through POST /admin/profile to profile the next tool calls (see profiling.py)
+profiler = RequestProfiler()
+
+_instrument_requests(types.CallToolRequest, "tool", lambda params: params.name)
+_instrument_requests(types.ReadResourceRequest, "resource", lambda params: _resource_name(params.uri))
+
+REGISTRY.gauge_func(
+    "customer_replica_rows", "Customers held by the in-memory replica.",
+    lambda: len(_customer_replica.by_id) if _customer_replica is not None else None,
+)
+REGISTRY.gauge_func(
+    "change_feed_subscriptions", "Resource URIs with at least one subscribed session.",
+    lambda: len(_change_feed.subscriptions),
+)
+
+# Advertise the subscribe handlers registered above (see change_feed.py)
+advertise_resource_subscriptions(mcp._mcp_server)
+
+# ==========================================
+# Startup
+# ==========================================
+
+def prepare_databases():
+    """Switch every shard to WAL mode and apply pending migrations.
+
+    WAL lets readers in any worker process run alongside the single writer
+    of each file; the setting is persistent, so it only costs once.
+    """
+    for path in get_shard_map().paths:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+        for version, description in migrate_database(path):
+            log.info("Applied schema migration", extra={"version": version, "path": path,
+                                                        "description": description})
+
+def _startup_step(name: str, started: float):
+    STARTUP[f"{name}_seconds"] = round(time.perf_counter() - started, 3)
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request):
+    """Readiness probe with the cold-start timing breakdown (used by run_system.py)."""
+    return JSONResponse({"status": "ok", "startup": STARTUP})
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def get_metrics(request):
+    """Prometheus scrape endpoint (values of the worker process that answers)."""
+    return PlainTextResponse(REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+for path, methods, endpoint in admin_endpoints(profiler, slow_queries):
+    mcp.custom_route(path, methods=methods)(endpoint)
+
+def create_http_app():
+    """Stateless Streamable-HTTP app. uvicorn calls this once per worker process.
+
+    Every request is self-contained (no MCP session to pin to a worker), so
+    any worker can serve any request. Resource subscriptions need a session
+    and are only available over SSE; get_changes long-polls work everywhere.
+    """
+    structured_logging.configure("mcp-server")  # Again in every worker process
+    mcp.settings.stateless_http = True
+    mcp.settings.json_response = True
+    if CUSTOMER_REPLICA:
+        started = time.perf_counter()
+        start_customer_replica()
+        _startup_step("replica", started)
+    STARTUP["ready_seconds"] = round(time.perf_counter() - _STARTED, 3)
+    return mcp.streamable_http_app()
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Customer Service MCP Server")
+    parser.add_argument("--transport", choices=["sse", "streamable-http"],
+                        default=os.getenv("MCP_TRANSPORT", "sse"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("MCP_WORKERS", "1")),
+                        help="Worker processes (streamable-http only)")
+    parser.add_argument("--host", default=mcp.settings.host)
+    parser.add_argument("--port", type=int, default=mcp.settings.port)
+    args = parser.parse_args()
+
+    if args.transport == "sse" and args.workers > 1:
+        parser.error("SSE sessions are stateful and pinned to one process; "
+                     "use --transport streamable-http for multiple workers")
+
+    structured_logging.configure("mcp-server")
+    log.info("Starting MCP server (FastMCP)", extra={"transport": args.transport, "workers": args.workers})
+    shard_paths = get_shard_map().paths
+    if len(shard_paths) > 1:
+        log.info("Sharded", extra={"shards": shard_paths})
+    started = time.perf_counter()
+    prepare_databases()
+    _startup_step("databases", started)
+    if ARCHIVE_AFTER_DAYS:
+        for path in shard_paths:
+            archiver = TicketArchiver(path, ARCHIVE_DB_PATH, older_than_days=float(ARCHIVE_AFTER_DAYS))
+            archiver.start_background()
+            log.info("Archiving resolved tickets", extra={"older_than_days": ARCHIVE_AFTER_DAYS,
+                                                           "archive_path": archiver.archive_path})
+    # The change log grows on every write, whether or not anyone reads the feed
+    for path in shard_paths:
+        ChangeLogPruner(path).start_background()
+
+    if args.transport == "sse":
+        if CUSTOMER_REPLICA:
+            started = time.perf_counter()
+            replica = start_customer_replica()
+            _startup_step("replica", started)
+            log.info("Customer replica loaded", extra={"customers": len(replica.by_id)})
+        STARTUP["ready_seconds"] = round(time.perf_counter() - _STARTED, 3)
+        # sse_app() serves the /sse and /messages routes (as mcp.run would), and
+        # log_config=None keeps uvicorn's logging in structured_logging
+        uvicorn.run(mcp.sse_app(), host=args.host, port=args.port,
+                    log_level=mcp.settings.log_level.lower(), log_config=None)
+        return
+
+    if args.workers > 1 and "MCP_CUSTOMER_REPLICA" not in os.environ:
+        # Each worker would see the others' writes only after a catch-up
+        os.environ["MCP_CUSTOMER_REPLICA"] = "0"
+        log.info("Customer replica disabled with multiple workers (set MCP_CUSTOMER_REPLICA=1 to keep it)")
+    log.info("Streamable HTTP endpoint",
+             extra={"url": f"http://{args.host}:{args.port}{mcp.settings.streamable_http_path}"})
+    uvicorn.run(
+        "mcp_server:create_http_app", factory=True, host=args.host, port=args.port,
+        workers=args.workers, log_level=mcp.settings.log_level.lower(), log_config=None,
+    )
+
 if __name__ == "__main__":
-    print("=" * 80)
-    print("  MCP SERVER - Customer Service")
-    print("  Using Official FastMCP (Auto-managed transport)")
-    print("=" * 80)
-    # [FIX] Use mcp.run() to automatically handle /sse and /messages routes correctly
-    mcp.run(transport="sse")
\ No newline at end of file
+    main()
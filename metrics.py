@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style Metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format at /metrics by every agent and the MCP server.
+
+Updates take no locks: each thread writes its own cells (a list registered
+once per thread and label set), and a scrape sums the cells of all threads.
+Values are per process; with several uvicorn workers each scrape sees the
+worker that served it.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+# Latency buckets in seconds (tool calls and HTTP requests; LLM calls reach the top ones)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# SQLite statements are much faster
+QUERY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram child that SQL statements of the current request are timed into
+# (set per MCP tool call; see tracing.TracedConnection)
+sql_timer = ContextVar("sql_timer", default=None)
+
+
+class _ThreadCells:
+    """Per-thread value lists: a thread only ever writes its own list."""
+
+    __slots__ = ("size", "_local", "_all", "_lock")
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> list:
+        try:
+            return self._local.cells
+        except AttributeError:
+            cells = [0] * self.size
+            with self._lock:  # Once per thread
+                self._all.append(cells)
+            self._local.cells = cells
+            return cells
+
+    def totals(self) -> list:
+        with self._lock:
+            rows = list(self._all)
+        return [sum(column) for column in zip(*rows)] if rows else [0] * self.size
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        """The child for one label set (create once, then reuse on hot paths)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("cells",)
+
+    def __init__(self):
+        self.cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1):
+        self.cells.mine()[0] += amount
+
+    def value(self) -> float:
+        return self.cells.totals()[0]
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. tokens or errors."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {_number(child.value())}"]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self.cells.mine()[0] -= amount
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight.
+
+    inc() and dec() may run on different threads; the per-thread cells
+    still sum to the right value.
+    """
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+
+class GaugeFunc(_Metric):
+    """Gauge read from a callback at scrape time (sizes of caches and pools)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, fn):
+        self.fn = fn
+        super().__init__(name, documentation)
+
+    def _new_child(self):
+        return None
+
+    def render(self) -> list:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "cells")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One cell per bucket, then +Inf, then the sum
+        self.cells = _ThreadCells(len(buckets) + 2)
+
+    def observe(self, value: float):
+        cells = self.cells.mine()
+        cells[bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    """with histogram_child.time(): ... observes the elapsed seconds."""
+
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_child(self, key, child):
+        totals = child.cells.totals()
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), totals):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            labels = self._label_text(key, 'le="' + le + '"')
+            lines.append(f"{self.name}_bucket{labels} {_number(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(totals[-1])}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {_number(cumulative)}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+class Registry:
+    """The metrics of one process."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric, or return the one already registered under its name."""
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def gauge_func(self, name, documentation, fn) -> GaugeFunc:
+        return self.register(GaugeFunc(name, documentation, fn))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Shared by every process that runs MCP tools against SQLite
+SQLITE_QUERY_SECONDS = REGISTRY.histogram(
+    "sqlite_query_duration_seconds", "SQLite statement execution time by MCP tool.",
+    ("tool",), QUERY_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request handling time by endpoint.",
+    ("service", "method", "endpoint", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests being handled.", ("service",),
+)
+
+
+# ==========================================
+# HTTP Middleware
+# ==========================================
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template.
+
+    Plain ASGI rather than BaseHTTPMiddleware: it adds no task or stream per
+    request. The endpoint label is the matched route path (/a2a/{assistant_id},
+    not the raw URL), so label sets stay bounded.
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+        self.in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(service)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(self.service, scope["method"], endpoint, status).observe(
+                time.perf_counter() - started)
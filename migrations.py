@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations for the customer support database.
+Each migration upgrades the schema created by DatabaseSetup one version;
+the applied version is tracked in SQLite's PRAGMA user_version.
+"""
+
+import sqlite3
+
+# ==========================================
+# 1. Phone Normalization
+# ==========================================
+
+# Separators stripped from phone numbers before they are compared, so that
+# "+1-555-0101", "1 555 0101" and "(1) 555.0101" all match the same customer.
+PHONE_SEPARATORS = "+-(). "
+
+
+def _normalized_phone_expr(column: str = "phone") -> str:
+    """Build the SQL expression that strips PHONE_SEPARATORS from a column."""
+    expr = column
+    for separator in PHONE_SEPARATORS:
+        expr = f"replace({expr}, '{separator}', '')"
+    return expr
+
+
+# Lookups must use this exact expression for SQLite to pick the expression index.
+PHONE_NORMALIZED_SQL = _normalized_phone_expr()
+
+
+def normalize_phone(phone: str) -> str:
+    """Python twin of PHONE_NORMALIZED_SQL, applied to lookup arguments."""
+    return "".join(ch for ch in phone if ch not in PHONE_SEPARATORS)
+
+
+# ==========================================
+# 2. Ticket Statistics
+# ==========================================
+
+# Counters kept in ticket_stats, with the predicate each ticket row adds to them.
+# The row with customer_id = 0 holds the global totals.
+TICKET_STATS_COUNTERS = [
+    ("total", "1"),
+    ("open", "{row}.status = 'open'"),
+    ("in_progress", "{row}.status = 'in_progress'"),
+    ("resolved", "{row}.status = 'resolved'"),
+    ("low", "{row}.priority = 'low'"),
+    ("medium", "{row}.priority = 'medium'"),
+    ("high", "{row}.priority = 'high'"),
+]
+GLOBAL_STATS_ID = 0
+
+
+def _ticket_stats_delta(row: str, sign: str) -> str:
+    """Build the SET clause that adds (or removes) one ticket row's counts."""
+    return ", ".join(
+        f"{name} = {name} {sign} ({predicate.format(row=row)})"
+        for name, predicate in TICKET_STATS_COUNTERS
+    )
+
+
+def rebuild_ticket_stats(conn: sqlite3.Connection):
+    """Recompute ticket_stats from scratch (after bulk loads or upgrades).
+
+    The caller owns the transaction and must commit.
+    """
+    columns = ", ".join(name for name, _ in TICKET_STATS_COUNTERS)
+    sums = ", ".join(
+        f"COALESCE(SUM({predicate.format(row='tickets')}), 0)"
+        for _, predicate in TICKET_STATS_COUNTERS
+    )
+    conn.execute("DELETE FROM ticket_stats")
+    conn.execute(f"""
+        INSERT INTO ticket_stats (customer_id, {columns})
+        SELECT customer_id, {sums} FROM tickets GROUP BY customer_id
+    """)
+    conn.execute(f"""
+        INSERT INTO ticket_stats (customer_id, {columns})
+        SELECT {GLOBAL_STATS_ID}, {sums} FROM tickets
+    """)
+
+
+# ==========================================
+# 3. Migrations
+# ==========================================
+# Every statement is idempotent (IF NOT EXISTS / column checks) so databases
+# that picked up part of a migration by other means still upgrade cleanly.
+
+def _customer_lookup_indexes(conn: sqlite3.Connection):
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_customers_phone_normalized
+        ON customers({PHONE_NORMALIZED_SQL})
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_name_nocase ON customers(name COLLATE NOCASE)
+    """)
+
+
+def _ticket_stats(conn: sqlite3.Connection):
+    counters = ",\n".join(
+        f"            {name} INTEGER NOT NULL DEFAULT 0" for name, _ in TICKET_STATS_COUNTERS
+    )
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS ticket_stats (
+            customer_id INTEGER PRIMARY KEY,
+{counters}
+        )
+    """)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_ticket_stats_total
+        ON ticket_stats(total DESC) WHERE customer_id != {GLOBAL_STATS_ID}
+    """)
+
+    # Keep ticket_stats current for the ticket's customer and globally
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS ticket_stats_insert
+        AFTER INSERT ON tickets
+        FOR EACH ROW
+        BEGIN
+            INSERT OR IGNORE INTO ticket_stats (customer_id)
+            VALUES (NEW.customer_id), ({GLOBAL_STATS_ID});
+            UPDATE ticket_stats SET {_ticket_stats_delta("NEW", "+")}
+            WHERE customer_id IN (NEW.customer_id, {GLOBAL_STATS_ID});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS ticket_stats_delete
+        AFTER DELETE ON tickets
+        FOR EACH ROW
+        BEGIN
+            UPDATE ticket_stats SET {_ticket_stats_delta("OLD", "-")}
+            WHERE customer_id IN (OLD.customer_id, {GLOBAL_STATS_ID});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS ticket_stats_update
+        AFTER UPDATE OF customer_id, status, priority ON tickets
+        FOR EACH ROW
+        BEGIN
+            UPDATE ticket_stats SET {_ticket_stats_delta("OLD", "-")}
+            WHERE customer_id IN (OLD.customer_id, {GLOBAL_STATS_ID});
+            INSERT OR IGNORE INTO ticket_stats (customer_id) VALUES (NEW.customer_id);
+            UPDATE ticket_stats SET {_ticket_stats_delta("NEW", "+")}
+            WHERE customer_id IN (NEW.customer_id, {GLOBAL_STATS_ID});
+        END
+    """)
+
+    # Backfill statistics for tickets that existed before the triggers
+    rebuild_ticket_stats(conn)
+
+
+def _ticket_resolved_at(conn: sqlite3.Connection):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(tickets)")]
+    if "resolved_at" not in columns:
+        conn.execute("ALTER TABLE tickets ADD COLUMN resolved_at DATETIME")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_resolved_at ON tickets(resolved_at)
+    """)
+
+    # Record when a ticket was resolved (cleared again if it is reopened)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS set_ticket_resolved_at_on_insert
+        AFTER INSERT ON tickets
+        FOR EACH ROW
+        WHEN NEW.status = 'resolved' AND NEW.resolved_at IS NULL
+        BEGIN
+            UPDATE tickets SET resolved_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS set_ticket_resolved_at
+        AFTER UPDATE OF status ON tickets
+        FOR EACH ROW
+        WHEN NEW.status != OLD.status
+        BEGIN
+            UPDATE tickets
+            SET resolved_at = CASE WHEN NEW.status = 'resolved' THEN CURRENT_TIMESTAMP END
+            WHERE id = NEW.id;
+        END
+    """)
+
+
+def _hot_query_indexes(conn: sqlite3.Connection):
+    # get_customer_history: WHERE customer_id = ? ORDER BY created_at DESC
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_customer_created
+        ON tickets(customer_id, created_at DESC)
+    """)
+    # list_tickets / support views: WHERE status = ? [AND priority = ?] ORDER BY created_at.
+    # Also covers COUNT(*) by status and priority without touching the table.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_status_priority_created
+        ON tickets(status, priority, created_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tickets_status_created
+        ON tickets(status, created_at)
+    """)
+    # list_customers: WHERE status = ? ORDER BY id
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_status ON customers(status)
+    """)
+    # Superseded by the composite indexes above (they share the leading column)
+    conn.execute("DROP INDEX IF EXISTS idx_tickets_customer_id")
+    conn.execute("DROP INDEX IF EXISTS idx_tickets_status")
+
+
+def _shard_meta(conn: sqlite3.Connection):
+    # Per-file sharding metadata written by sharding.reshard() (see sharding.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS shard_meta (key TEXT PRIMARY KEY, value TEXT)
+    """)
+
+
+def _customer_updated_at_index(conn: sqlite3.Connection):
+    # Catch-up reads of the in-memory customer replica (customer_cache.py)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_updated_at ON customers(updated_at)
+    """)
+
+
+def _change_log(conn: sqlite3.Connection):
+    # Change-data-capture feed read by get_changes and resource subscriptions
+    # (see change_feed.py). The update triggers list the data columns, so the
+    # timestamp-maintenance triggers (updated_at, resolved_at) add no entries.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete')),
+            row_id INTEGER NOT NULL,
+            customer_id INTEGER,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    log = "INSERT INTO change_log (table_name, op, row_id, customer_id) VALUES"
+    for table, customer, columns in (
+        ("customers", "id", "name, email, phone, status"),
+        ("tickets", "customer_id", "customer_id, issue, status, priority"),
+    ):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_insert
+            AFTER INSERT ON {table}
+            FOR EACH ROW
+            BEGIN
+                {log} ('{table}', 'insert', NEW.id, NEW.{customer});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_update
+            AFTER UPDATE OF {columns} ON {table}
+            FOR EACH ROW
+            BEGIN
+                {log} ('{table}', 'update', NEW.id, NEW.{customer});
+                -- A ticket moved between customers changes both histories
+                INSERT INTO change_log (table_name, op, row_id, customer_id)
+                SELECT '{table}', 'update', OLD.id, OLD.{customer}
+                WHERE OLD.{customer} != NEW.{customer};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_delete
+            AFTER DELETE ON {table}
+            FOR EACH ROW
+            BEGIN
+                {log} ('{table}', 'delete', OLD.id, OLD.{customer});
+            END
+        """)
+
+
+def _change_log_customer_index(conn: sqlite3.Connection):
+    # ETags of the customer resources: latest change per customer and table
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_change_log_customer
+        ON change_log(customer_id, table_name)
+    """)
+
+
+def _backfill_resolved_at(conn: sqlite3.Connection):
+    # Tickets resolved before migration 3 kept resolved_at NULL, so the archiver
+    # never moved them and time-to-resolution skipped them. tickets has no
+    # updated_at, so created_at is the only known bound on when they were resolved.
+    conn.execute("""
+        UPDATE tickets SET resolved_at = created_at
+        WHERE status = 'resolved' AND resolved_at IS NULL
+    """)
+
+
+# (version, description, upgrade function) -- append only, never renumber.
+MIGRATIONS = [
+    (1, "Customer lookup indexes (normalized phone, name prefix)", _customer_lookup_indexes),
+    (2, "Trigger-maintained ticket_stats table", _ticket_stats),
+    (3, "tickets.resolved_at with maintenance triggers", _ticket_resolved_at),
+    (4, "Composite indexes for history, support views and customer listing", _hot_query_indexes),
+    (5, "shard_meta table for horizontal sharding", _shard_meta),
+    (6, "customers.updated_at index for replica catch-up", _customer_updated_at_index),
+    (7, "Trigger-fed change_log for change data capture", _change_log),
+    (8, "change_log index for customer resource ETags", _change_log_customer_index),
+    (9, "Backfill resolved_at of tickets resolved before it was recorded", _backfill_resolved_at),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Read the schema version stored in PRAGMA user_version."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, target: int = SCHEMA_VERSION) -> list:
+    """Apply every migration above the database's version, up to target.
+
+    Each migration runs in its own transaction together with the
+    user_version bump, so a failed migration leaves the previous version.
+
+    Args:
+        conn: Open connection to a database created by DatabaseSetup
+        target: Version to stop at. Defaults to the latest.
+
+    Returns:
+        List of (version, description) tuples that were applied
+    """
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+
+        conn.commit()  # Close any implicit transaction before our own
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            upgrade(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+
+    return applied
+
+
+def migrate_database(db_path: str) -> list:
+    """Open a database file, migrate it to the latest version and close it."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+On-demand Profiling and Slow-query Capture
+Admin endpoints, gated by the ADMIN_TOKEN environment variable, that
+profile the next N agent /execute requests or MCP tool calls with cProfile
+and keep the results for download. The MCP server also keeps every SQL
+statement slower than SLOW_QUERY_MS, with its parameters and
+EXPLAIN QUERY PLAN output, in a ring buffer served at /admin/slow-queries.
+
+cProfile is deterministic and per thread: while a request is profiled it
+also records whatever else runs on the event loop thread (concurrent
+requests included), but not work handed to other threads. Only one request
+per process is profiled at a time, even in a monolith with several profilers.
+
+Usage (the token comes from ADMIN_TOKEN):
+    python profiling.py profile --url http://localhost:5003 --count 5
+    python profiling.py profile --url http://localhost:8000 --target get_customer_history
+    python profiling.py list --url http://localhost:8000
+    python profiling.py download 1 --url http://localhost:8000 -o tool.prof
+    python profiling.py slow-queries --url http://localhost:8000
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import marshal
+import os
+import pstats
+import sqlite3
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+
+log = logging.getLogger("profiling")
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Profiles kept per process (oldest dropped first)
+PROFILES_KEPT = 20
+# Statements at least this slow are captured (milliseconds)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+# Functions listed in a profile's text summary
+SUMMARY_LINES = 40
+
+# cProfile can only run one profiler per thread; shared by every RequestProfiler
+_profiling = False
+
+
+# ==========================================
+# Request Profiler
+# ==========================================
+
+class RequestProfiler:
+    """Profiles the next requests it is armed for and keeps the results."""
+
+    def __init__(self, keep: int = PROFILES_KEPT):
+        self.remaining = 0
+        self.target = None  # Only profile requests with this label (None = any)
+        self.profiles = deque(maxlen=keep)
+        self._next_id = 1
+
+    def arm(self, count: int, target: str = None):
+        """Profile the next `count` requests (labelled `target`, if given)."""
+        self.remaining = max(0, int(count))
+        self.target = target or None
+
+    def status(self) -> dict:
+        return {"remaining": self.remaining, "target": self.target}
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the enclosed request if the profiler is armed for it."""
+        global _profiling
+        if not self.remaining or _profiling or (self.target and label != self.target):
+            yield
+            return
+        self.remaining -= 1
+        _profiling = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _profiling = False
+            self.profiles.append({
+                "id": self._next_id,
+                "label": label,
+                "captured_at": datetime.now().isoformat(timespec="seconds"),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "stats": pstats.Stats(profiler),
+            })
+            self._next_id += 1
+
+    def get(self, profile_id: int) -> dict:
+        return next((p for p in self.profiles if p["id"] == profile_id), None)
+
+    def summaries(self) -> list:
+        return [{k: v for k, v in p.items() if k != "stats"} for p in self.profiles]
+
+
+def profile_text(stats: pstats.Stats, lines: int = SUMMARY_LINES) -> str:
+    """The top functions of a profile by cumulative time."""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(lines)
+    return stream.getvalue()
+
+
+def profile_bytes(stats: pstats.Stats) -> bytes:
+    """A profile in the .prof format of pstats.Stats.dump_stats (snakeviz etc. read it)."""
+    return marshal.dumps(stats.stats)
+
+
+# ==========================================
+# Slow Queries
+# ==========================================
+
+class SlowQueryLog:
+    """Ring buffer of SQL statements slower than a threshold."""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, size: int = SLOW_QUERY_LOG_SIZE):
+        self.threshold_seconds = threshold_ms / 1000
+        self.entries = deque(maxlen=size)
+
+    def record(self, conn: sqlite3.Connection, sql: str, parameters, seconds: float):
+        """Capture a slow statement with its query plan (None if it cannot be explained)."""
+        sql = " ".join(sql.split())
+        entry = {
+            "captured_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(seconds * 1000, 2),
+            "statement": sql,
+            "parameters": repr(parameters)[:500] if parameters is not None else None,
+            "plan": explain(conn, sql, parameters),
+        }
+        self.entries.append(entry)
+        log.warning("Slow query", extra={"duration_ms": entry["duration_ms"], "statement": sql[:200]})
+
+    def snapshot(self) -> dict:
+        return {"threshold_ms": self.threshold_seconds * 1000, "queries": list(self.entries)}
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters) -> list:
+    """EXPLAIN QUERY PLAN details of a statement, or None."""
+    if parameters is None:
+        return None
+    try:
+        # A plain cursor: the plan query itself is neither traced nor timed
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[3] for row in rows]
+
+
+slow_queries = SlowQueryLog()
+
+
+# ==========================================
+# Admin Endpoints
+# ==========================================
+
+def _forbidden(request):
+    """Error response unless the request carries the admin token, else None."""
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "Admin endpoints are disabled; set ADMIN_TOKEN"}, status_code=403)
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        return JSONResponse({"error": "Invalid admin token"}, status_code=403)
+    return None
+
+
+def admin_endpoints(profiler: RequestProfiler, slow_query_log: SlowQueryLog = None) -> list:
+    """(path, methods, endpoint) of the admin routes, for FastAPI add_route or
+    FastMCP custom_route."""
+
+    async def arm_profiler(request):
+        if (error := _forbidden(request)) is not None:
+            return error
+        body = await request.json() if await request.body() else {}
+        try:
+            profiler.arm(body.get("count", 1), body.get("target"))
+        except (TypeError, ValueError):
+            return JSONResponse({"error": "count must be an integer"}, status_code=400)
+        return JSONResponse(profiler.status())
+
+    async def list_profiles(request):
+        if (error := _forbidden(request)) is not None:
+            return error
+        return JSONResponse({**profiler.status(), "profiles": profiler.summaries()})
+
+    async def download_profile(request):
+        if (error := _forbidden(request)) is not None:
+            return error
+        profile = profiler.get(request.path_params["profile_id"])
+        if profile is None:
+            return JSONResponse({"error": "Profile not found"}, status_code=404)
+        if request.query_params.get("format") == "text":
+            return PlainTextResponse(profile_text(profile["stats"]))
+        return Response(profile_bytes(profile["stats"]), media_type="application/octet-stream", headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile["id"]}.prof"',
+        })
+
+    async def get_slow_queries(request):
+        if (error := _forbidden(request)) is not None:
+            return error
+        return JSONResponse(slow_query_log.snapshot())
+
+    endpoints = [
+        ("/admin/profile", ["POST"], arm_profiler),
+        ("/admin/profiles", ["GET"], list_profiles),
+        ("/admin/profiles/{profile_id:int}", ["GET"], download_profile),
+    ]
+    if slow_query_log is not None:
+        endpoints.append(("/admin/slow-queries", ["GET"], get_slow_queries))
+    return endpoints
+
+
+# ==========================================
+# Admin CLI
+# ==========================================
+
+def main():
+    """Command line entry point."""
+    import argparse
+    import json
+
+    import httpx
+
+    parser = argparse.ArgumentParser(description="Profile requests and read slow queries of a running service.")
+    parser.add_argument("command", choices=["profile", "list", "download", "slow-queries"])
+    parser.add_argument("profile_id", nargs="?", type=int, help="Profile to download")
+    parser.add_argument("--url", default="http://localhost:8000", help="Agent or MCP server base URL")
+    parser.add_argument("--count", type=int, default=1, help="Requests to profile")
+    parser.add_argument("--target", help="Only profile this MCP tool")
+    parser.add_argument("--text", action="store_true", help="Download the text summary instead")
+    parser.add_argument("-o", "--output", help="File to write the downloaded profile to")
+    args = parser.parse_args()
+
+    client = httpx.Client(base_url=args.url.rstrip("/"), timeout=10.0,
+                          headers={"Authorization": f"Bearer {ADMIN_TOKEN or ''}"})
+    if args.command == "profile":
+        response = client.post("/admin/profile", json={"count": args.count, "target": args.target})
+    elif args.command == "list":
+        response = client.get("/admin/profiles")
+    elif args.command == "slow-queries":
+        response = client.get("/admin/slow-queries")
+    else:
+        if args.profile_id is None:
+            parser.error("download needs a profile id")
+        response = client.get(f"/admin/profiles/{args.profile_id}",
+                              params={"format": "text"} if args.text else None)
+        if response.status_code == 200:
+            output = args.output or f"profile-{args.profile_id}.{'txt' if args.text else 'prof'}"
+            with open(output, "wb") as f:
+                f.write(response.content)
+            print(f"Wrote {output}")
+            return
+
+    try:
+        print(json.dumps(response.json(), indent=2))
+    except ValueError:
+        print(response.text)
+    if response.status_code != 200:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
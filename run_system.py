@@ -2,20 +2,40 @@
 """
 Main System Launcher for Multi-Agent Customer Service System
 Starts all components: MCP Server + A2A Agents (using official SDKs)
+
+Usage:
+    python run_system.py              # one process per service
+    python run_system.py --monolith   # everything in one process (AGENT_DEPLOYMENT=monolith)
+    python run_system.py --replicas 3 # 3 data + 3 support agents behind the router (AGENT_REPLICAS)
+    python run_system.py --supervise --workers data=2,support=3,mcp=2 --pin-cpus
+                                      # restart crashed services instead of stopping everything;
+                                      # status at http://localhost:5090/status
 """
 
+import argparse
+import asyncio
+import logging
 import subprocess
 import sys
 import time
 import os
 import signal
+import json
 import httpx
 
+import structured_logging
+
+log = logging.getLogger("run_system")
+
 processes = []
 
+# Replica i of a specialist listens on its base port + REPLICA_PORT_STEP * i
+REPLICA_PORT_STEP = 10
+REGISTRY_CONFIG_PATH = "agents.json"
+
 def cleanup(signum=None, frame=None):
     """Cleanup all processes on exit."""
-    print("\n\nShutting down all services...")
+    log.info("Shutting down all services")
     for p in processes:
         try:
             p.terminate()
@@ -25,110 +45,252 @@ def cleanup(signum=None, frame=None):
                 p.kill()
             except:
                 pass
-    print("All services stopped.")
+    log.info("All services stopped")
     sys.exit(0)
 
-def check_service(url, name, process=None, max_retries=15):
-    """Check if a service is ready, failing fast if the process dies."""
-    import time
-    
-    print(f"Checking {name}...", end="", flush=True)
-    
-    for i in range(max_retries):
+async def wait_ready(client, service, timeout=60.0):
+    """Poll a service's /health with exponential backoff until it answers 200.
 
-        if process and process.poll() is not None:
-            print(f"\n\n❌ {name} Failed to start! (Process exited with code {process.returncode})")
+    Fails fast if the process exits. Returns the service's timing breakdown
+    (launch-to-ready as seen from here plus what /health reports), or None.
+    """
+    name, process, url, launched = service["name"], service["process"], service["health_url"], service["launched"]
+    delay = 0.05
+    while time.perf_counter() - launched < timeout:
+        if process.poll() is not None:
+            log.error("Service failed to start", extra={"service": name, "exit_code": process.returncode})
+            return None
+        try:
+            response = await client.get(url, timeout=2.0)
+            if response.status_code == 200:
+                return {**response.json().get("startup", {}),
+                        "launch_to_ready_seconds": round(time.perf_counter() - launched, 2)}
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+    log.error("Service timed out", extra={"service": name, "timeout_seconds": timeout})
+    return None
 
-            stdout, stderr = process.communicate()
-            if stdout: print(f"--- STDOUT ---\n{stdout}")
-            if stderr: print(f"--- STDERR ---\n{stderr}")
-            return False
+async def wait_all_ready(services):
+    """Probe every service concurrently. Returns timings by name, or None if any failed."""
+    async with httpx.AsyncClient() as client:
+        results = await asyncio.gather(*(wait_ready(client, service) for service in services))
+    if any(result is None for result in results):
+        return None
+    return {service["name"]: result for service, result in zip(services, results)}
 
+def print_timings(timings):
+    """Cold-start breakdown: launch-to-ready as seen here, then the service's own steps.
 
-        try:
-            response = httpx.get(url, timeout=2.0, follow_redirects=True)
-            if response.status_code in [200, 404, 405]:
-                print(f" ✓ Ready!")
-                return True
-        except:
-            pass
-        
-        print(".", end="", flush=True)
-        time.sleep(1.5)
-    
-    print(f"\n❌ {name} timed out (Not responding after {max_retries*1.5}s)")
-    return False
+    A service's steps are timed from the start of its module import, so
+    launch-to-ready minus its ready time is interpreter start plus probe delay.
+    """
+    print("\n  Cold start (seconds):")
+    for name, timing in timings.items():
+        steps = ", ".join(f"{key.replace('_seconds', '')} {value}"
+                          for key, value in timing.items() if key != "launch_to_ready_seconds")
+        print(f"    {name:<16} {timing['launch_to_ready_seconds']:>5}  ({steps})")
+    print()
 
-def start_process(command, name):
+def start_process(command, name, env=None):
     """Start a process and return the Popen object."""
-    print(f"Starting {name}...", end=" ")
     try:
-        # bufsize=0 (Unbuffered) to see errors immediately
+        # Children inherit the console and log through structured_logging, which
+        # writes whole lines from a background thread (nothing passes through here)
         p = subprocess.Popen(
             command,
-            stdout=sys.stdout,  # Print directly to console so user can see errors
-            stderr=sys.stderr,
-            bufsize=0,
-            universal_newlines=True
+            env=dict(os.environ, **env) if env else None
         )
         processes.append(p)
-        print(f"(PID: {p.pid})")
+        log.info("Started service", extra={"service": name, "pid": p.pid})
         return p
     except Exception as e:
-        print(f"\nFailed to launch {name}: {e}")
+        log.error("Failed to launch service", extra={"service": name, "error": str(e)})
         return None
 
+def start_service(name, command, health_url, env=None):
+    """Launch one service without waiting for it."""
+    launched = time.perf_counter()
+    process = start_process(command, name, env)
+    if process is None:
+        cleanup()
+    return {"name": name, "process": process, "health_url": health_url, "launched": launched}
+
+def parse_workers(value, replicas=1):
+    """Worker counts per service type from 'data=2,support=3,mcp=2'.
+
+    Data and support workers are agent replicas behind the router; MCP
+    workers are Streamable-HTTP worker processes of one server. The router
+    is always a single process.
+    """
+    workers = {"data": replicas, "support": replicas, "mcp": 1}
+    for item in filter(None, (value or "").split(",")):
+        kind, _, count = item.partition("=")
+        if kind not in workers or not count.isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"invalid worker count '{item}' (use data=N,support=N,mcp=N)")
+        workers[kind] = int(count)
+    return workers
+
+def plan_specialists(agent_type, base_port, replicas, env):
+    """Service specs for `replicas` instances of a specialist agent."""
+    specs = []
+    for i in range(replicas):
+        port = base_port + REPLICA_PORT_STEP * i
+        specs.append({
+            "name": f"{agent_type.capitalize()} Agent" + (f" #{i + 1}" if replicas > 1 else ""),
+            "command": [sys.executable, 'a2a_agents.py', agent_type],
+            "health_url": f"http://localhost:{port}/health",
+            "env": dict(env, AGENT_PORT=str(port)),
+        })
+    return specs
+
+def plan_services(workers):
+    """Specs of the MCP server and every agent; none depends on another at startup."""
+    mcp_command = [sys.executable, 'mcp_server.py']
+    agent_env = {}
+    if workers["mcp"] > 1:
+        # Several MCP processes need the stateless transport (see mcp_server.py)
+        mcp_command += ["--transport", "streamable-http", "--workers", str(workers["mcp"])]
+        agent_env["MCP_SERVER_URL"] = "http://localhost:8000/mcp"
+
+    data = plan_specialists("data", 5001, workers["data"], agent_env)
+    support = plan_specialists("support", 5002, workers["support"], agent_env)
+    with open(REGISTRY_CONFIG_PATH, "w") as f:
+        json.dump({
+            "data": [spec["health_url"].rsplit("/", 1)[0] for spec in data],
+            "support": [spec["health_url"].rsplit("/", 1)[0] for spec in support],
+        }, f, indent=2)
+
+    return [
+        {"name": "MCP Server", "command": mcp_command, "health_url": "http://localhost:8000/health",
+         "cpu_count": workers["mcp"]},
+        *data,
+        *support,
+        # The router balances over the instances in the registry config and
+        # health-checks them itself, so it need not wait for them
+        {"name": "Router Agent", "command": [sys.executable, 'a2a_agents.py', 'router'],
+         "health_url": "http://localhost:5003/health",
+         "env": dict(agent_env, AGENT_REGISTRY_PATH=REGISTRY_CONFIG_PATH)},
+    ]
+
+def assign_cpus(specs):
+    """Pin services round-robin over the CPUs this launcher may use.
+
+    Each service gets one CPU, except a multi-worker MCP server, which gets
+    one per worker (its workers inherit the set).
+    """
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if not available:
+        log.warning("CPU pinning is not supported on this platform; ignoring --pin-cpus")
+        return {}
+    assignment, next_cpu = {}, 0
+    for spec in specs:
+        count = spec.get("cpu_count", 1)
+        assignment[spec["name"]] = {available[(next_cpu + i) % len(available)] for i in range(count)}
+        next_cpu += count
+    return assignment
+
+async def supervise(specs, args, started):
+    """Run the services under the supervisor until Ctrl+C (see supervisor.py)."""
+    from supervisor import Service, Supervisor
+
+    cpus = assign_cpus(specs) if args.pin_cpus else {}
+    supervisor = Supervisor([
+        Service(spec["name"], spec["command"], env=spec.get("env"), restart=args.restart,
+                cpus=cpus.get(spec["name"]))
+        for spec in specs
+    ])
+    await supervisor.start()
+    log.info("Waiting for services")
+    timings = await wait_all_ready([
+        {"name": service.name, "process": service, "health_url": spec["health_url"],
+         "launched": service.launched}
+        for service, spec in zip(supervisor.services.values(), specs)
+    ])
+    if timings:
+        print_ready_banner(timings, started)
+    else:
+        log.warning("Not every service became ready; the supervisor keeps restarting them")
+    print(f"Supervisor status: http://localhost:{args.status_port}/status (Ctrl+C drains and stops all)")
+    await supervisor.serve(args.status_port)
+    log.info("All services stopped")
+
+def print_ready_banner(timings, started):
+    print("\n" + "="*80)
+    print(f"  ✅ ALL SYSTEMS GO! ({time.perf_counter() - started:.1f}s)")
+    print("="*80)
+    print_timings(timings)
+    print("  MCP Server:    http://localhost:8000")
+    print("  Data Agent:    http://localhost:5001")
+    print("  Support Agent: http://localhost:5002")
+    print("  Router Agent:  http://localhost:5003 (instances: /registry)")
+    print("\nRun tests in a new terminal: python test_system.py")
+
 def main():
     global processes
+
+    parser = argparse.ArgumentParser(description="Start the MCP server and the A2A agents.")
+    parser.add_argument("--monolith", action="store_true",
+                        default=os.getenv("AGENT_DEPLOYMENT") == "monolith",
+                        help="Run everything in one process")
+    parser.add_argument("--replicas", type=int, default=int(os.getenv("AGENT_REPLICAS", "1")),
+                        help="Data and support agent replicas")
+    parser.add_argument("--workers", default=os.getenv("SERVICE_WORKERS"),
+                        help="Worker counts per type, e.g. data=2,support=3,mcp=2 (overrides --replicas)")
+    parser.add_argument("--supervise", action="store_true",
+                        help="Restart crashed services instead of shutting everything down")
+    parser.add_argument("--restart", choices=["always", "on-failure", "never"], default="on-failure",
+                        help="Restart policy in --supervise mode")
+    parser.add_argument("--pin-cpus", action="store_true",
+                        help="Pin each supervised service to its own CPU(s)")
+    parser.add_argument("--status-port", type=int, default=int(os.getenv("SUPERVISOR_STATUS_PORT", "5090")))
+    args = parser.parse_args()
+    try:
+        workers = parse_workers(args.workers, args.replicas)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
     
-    # Register cleanup handler
-    signal.signal(signal.SIGINT, cleanup)
-    signal.signal(signal.SIGTERM, cleanup)
+    structured_logging.configure("launcher")
+    if not args.supervise:
+        # Register cleanup handler
+        signal.signal(signal.SIGINT, cleanup)
+        signal.signal(signal.SIGTERM, cleanup)
     
     print("="*80)
     print("  MULTI-AGENT SYSTEM LAUNCHER (SMART MODE)")
     print("="*80)
     
     # Check environment
-    if not os.getenv("ANTHROPIC_API_KEY"):
-        print("\n⚠️  CRITICAL WARNING: ANTHROPIC_API_KEY is missing!")
-        print("   Agents will crash immediately without it.")
-        print("   Run: export ANTHROPIC_API_KEY=your_key_here\n")
-        time.sleep(2)
+    if os.getenv("LLM_PROVIDER") != "fake" and not os.getenv("ANTHROPIC_API_KEY"):
+        log.warning("ANTHROPIC_API_KEY is missing; agents will fail on their first task "
+                    "(export ANTHROPIC_API_KEY=your_key_here)")
     
     # Check database
     if not os.path.exists('support.db'):
-        print("Creating database...")
+        log.info("Creating database")
         subprocess.run([sys.executable, 'database_setup.py'], check=True)
     
-    # 1. Start MCP Server
-    mcp_process = start_process([sys.executable, 'mcp_server.py'], "MCP Server")
-    if not check_service("http://localhost:8000/health", "MCP Server", mcp_process):
-        cleanup()
-    
-    # 2. Start Customer Data Agent
-    data_process = start_process([sys.executable, 'a2a_agents.py', 'data'], "Data Agent")
-    if not check_service("http://localhost:5001/a2a/data", "Data Agent", data_process):
-        cleanup()
+    started = time.perf_counter()
+    if args.monolith:
+        # All agents + MCP server in one process, talking in-memory
+        specs = [{"name": "Monolith", "command": [sys.executable, 'a2a_agents.py', 'monolith'],
+                  "health_url": "http://localhost:5003/health"}]
+    else:
+        specs = plan_services(workers)
 
-    # 3. Start Support Agent
-    support_process = start_process([sys.executable, 'a2a_agents.py', 'support'], "Support Agent")
-    if not check_service("http://localhost:5002/a2a/support", "Support Agent", support_process):
-        cleanup()
+    if args.supervise:
+        asyncio.run(supervise(specs, args, started))
+        return
 
-    # 4. Start Router Agent
-    router_process = start_process([sys.executable, 'a2a_agents.py', 'router'], "Router Agent")
-    if not check_service("http://localhost:5003/a2a/router", "Router Agent", router_process):
+    services = [start_service(spec["name"], spec["command"], spec["health_url"], spec.get("env"))
+                for spec in specs]
+    log.info("Waiting for services")
+    timings = asyncio.run(wait_all_ready(services))
+    if timings is None:
         cleanup()
-    
-    print("\n" + "="*80)
-    print("  ✅ ALL SYSTEMS GO!")
-    print("="*80)
-    print("  MCP Server:    http://localhost:8000")
-    print("  Data Agent:    http://localhost:5001")
-    print("  Support Agent: http://localhost:5002")
-    print("  Router Agent:  http://localhost:5003")
-    print("\nRun tests in a new terminal: python test_system.py")
+
+    print_ready_banner(timings, started)
     
     try:
         while True:
@@ -136,7 +298,8 @@ def main():
             # Monitor for sudden crashes
             for p in processes:
                 if p.poll() is not None:
-                    print(f"\n❌ A service process died unexpectedly! Shutting down...")
+                    log.error("A service process died unexpectedly; shutting down",
+                              extra={"pid": p.pid, "exit_code": p.returncode})
                     cleanup()
     except KeyboardInterrupt:
         cleanup()
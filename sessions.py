@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Conversation Sessions
+Multi-turn memory for the agents. An /execute call with a session_id
+continues that session's conversation: the agent graph keeps its messages
+in a LangGraph checkpointer (SQLite, thread "<agent type>:<session id>"),
+so a follow-up question sees the customer data earlier turns looked up
+instead of fetching it again. The graph writes a checkpoint per step; once a
+run finishes, only each thread's latest one is kept (see prune_thread).
+
+Prompts are kept within a token budget by compaction, which runs before
+every model call and rewrites the stored history when it is over budget:
+  1. Tool results of earlier turns are re-serialized as compact JSON
+     (lossless).
+  2. If still over budget, those results are cut to a short prefix.
+  3. If still over budget, the oldest turns are dropped; each leaves a
+     one-line note (question and answer) in the system prompt. Notes count
+     against the budget too: the oldest are folded into a count of omitted
+     turns when they no longer fit.
+The current turn is never compacted, and a tool call always keeps its
+result, as the chat model API requires.
+
+Environment:
+    AGENT_SESSIONS_DB        Checkpoint database (default sessions.db; ":memory:"
+                             keeps sessions in process memory only)
+    SESSION_TOKEN_BUDGET     Approximate prompt tokens before compaction (default 6000)
+"""
+
+import json
+import logging
+import os
+import re
+
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from metrics import REGISTRY
+
+log = logging.getLogger("sessions")
+
+SESSIONS_DB_PATH = os.getenv("AGENT_SESSIONS_DB", "sessions.db")
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "6000"))
+
+# Characters kept of an earlier turn's tool result in compaction step 2
+TOOL_RESULT_SUMMARY_CHARS = 300
+# Characters of the question and answer kept in a dropped turn's note
+NOTE_CHARS = 200
+
+EARLIER_TURNS_HEADER = "\n\nEarlier in this conversation (compacted):"
+OMITTED_NOTE = re.compile(r"^- \((\d+) earlier turns omitted\)$")
+
+SESSION_COMPACTIONS = REGISTRY.counter(
+    "session_compactions_total", "Session histories compacted to fit the token budget, by step.", ("step",),
+)
+
+_checkpointer = None
+_connection = None
+
+
+# ==========================================
+# Checkpointer
+# ==========================================
+
+async def get_checkpointer():
+    """The process's checkpointer, opened (and its package imported) on first use."""
+    global _checkpointer, _connection
+    if _checkpointer is None:
+        if SESSIONS_DB_PATH == ":memory:":
+            from langgraph.checkpoint.memory import InMemorySaver
+            _checkpointer = InMemorySaver()
+        else:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+            _connection = await aiosqlite.connect(SESSIONS_DB_PATH)
+            _checkpointer = AsyncSqliteSaver(_connection)
+        log.info("Session store opened", extra={"path": SESSIONS_DB_PATH})
+    return _checkpointer
+
+
+async def close_checkpointer():
+    """Close the checkpoint database, if one was opened."""
+    global _checkpointer, _connection
+    if _connection is not None:
+        await _connection.close()
+    _checkpointer = _connection = None
+
+
+def thread_config(agent_type: str, session_id: str) -> dict:
+    """Graph config selecting one agent's thread of a session."""
+    return {"configurable": {"thread_id": f"{agent_type}:{session_id}"}}
+
+
+# Checkpoints (and their pending writes) older than the newest of their namespace
+_SUPERSEDED = """
+    thread_id = ? AND checkpoint_id < (
+        SELECT MAX(latest.checkpoint_id) FROM checkpoints AS latest
+        WHERE latest.thread_id = {table}.thread_id AND latest.checkpoint_ns = {table}.checkpoint_ns)
+"""
+
+
+async def prune_thread(config: dict) -> int:
+    """Delete a thread's superseded checkpoints from the SQLite store.
+
+    A session continues from its latest checkpoint only, so the ones every
+    earlier graph step wrote are dead weight; without pruning, sessions.db
+    grows with every model call. Checkpoint ids are time-ordered, so the
+    latest is the greatest. The in-memory store is left alone: it goes
+    away with the process.
+
+    Args:
+        config: The thread's graph config (see thread_config)
+
+    Returns:
+        Checkpoints deleted
+    """
+    if _connection is None:
+        return 0
+    thread_id = config["configurable"]["thread_id"]
+    async with _checkpointer.lock:
+        await _connection.execute(f"DELETE FROM writes WHERE {_SUPERSEDED.format(table='writes')}", (thread_id,))
+        cursor = await _connection.execute(
+            f"DELETE FROM checkpoints WHERE {_SUPERSEDED.format(table='checkpoints')}", (thread_id,)
+        )
+        await _connection.commit()
+    return cursor.rowcount
+
+
+# ==========================================
+# Compaction
+# ==========================================
+
+def _turns(messages: list) -> tuple:
+    """(system message or None, turns), a turn being a human message and what followed it."""
+    system = messages[0] if messages and isinstance(messages[0], SystemMessage) else None
+    turns = []
+    for message in messages[1 if system else 0:]:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return system, turns
+
+
+def _flatten(system, turns: list) -> list:
+    return ([system] if system else []) + [message for turn in turns for message in turn]
+
+
+def _with_content(message, content: str):
+    return message if content == message.content else message.model_copy(update={"content": content})
+
+
+def _minified(content):
+    try:
+        return json.dumps(json.loads(content), separators=(",", ":"))
+    except (TypeError, ValueError):
+        return content
+
+
+def _shortened(content):
+    text = content if isinstance(content, str) else str(content)
+    if len(text) <= TOOL_RESULT_SUMMARY_CHARS:
+        return text
+    return f"{text[:TOOL_RESULT_SUMMARY_CHARS]}... [compacted, {len(text) - TOOL_RESULT_SUMMARY_CHARS} chars dropped]"
+
+
+def _one_line(content) -> str:
+    return " ".join(str(content).split())[:NOTE_CHARS]
+
+
+def _note(turn: list) -> str:
+    question = _one_line(turn[0].content)
+    answers = [m for m in turn if isinstance(m, AIMessage) and not m.tool_calls and m.content]
+    answer = _one_line(answers[-1].content) if answers else "(no answer)"
+    return f"- Q: {question} A: {answer}"
+
+
+def _split_notes(system) -> tuple:
+    """(prompt, notes, omitted turns) of a system message carrying notes of dropped turns."""
+    prompt, _, earlier = str(system.content).partition(EARLIER_TURNS_HEADER)
+    notes, omitted = [], 0
+    for line in earlier.split("\n")[1:]:
+        match = OMITTED_NOTE.match(line)
+        if match:
+            omitted = int(match.group(1))
+        elif line:
+            notes.append(line)
+    return prompt, notes, omitted
+
+
+def _with_notes(system, prompt: str, notes: list, omitted: int):
+    lines = ([f"- ({omitted} earlier turns omitted)"] if omitted else []) + notes
+    return _with_content(system, prompt + EARLIER_TURNS_HEADER + "".join(f"\n{line}" for line in lines)
+                         if lines else prompt)
+
+
+def compact(messages: list, budget: int = None) -> tuple:
+    """Compact a conversation to fit a token budget.
+
+    Args:
+        messages: The session's messages, oldest first
+        budget: Approximate token budget (default SESSION_TOKEN_BUDGET)
+
+    Returns:
+        (messages, step): the compacted messages and the last step applied
+        ('minify', 'shorten' or 'drop'), or (messages, None) if unchanged
+    """
+    budget = budget or SESSION_TOKEN_BUDGET
+    if count_tokens_approximately(messages) <= budget:
+        return messages, None
+
+    system, turns = _turns(messages)
+    step = None
+    for rewrite_step, rewrite in (("minify", _minified), ("shorten", _shortened)):
+        for turn in turns[:-1]:
+            rewritten = [_with_content(m, rewrite(m.content)) if isinstance(m, ToolMessage) else m for m in turn]
+            if any(new is not old for new, old in zip(rewritten, turn)):
+                turn[:], step = rewritten, rewrite_step
+        if count_tokens_approximately(_flatten(system, turns)) <= budget:
+            return _flatten(system, turns), step
+
+    if system is None:
+        while len(turns) > 1 and count_tokens_approximately(_flatten(system, turns)) > budget:
+            turns.pop(0)
+            step = "drop"
+        return _flatten(system, turns), step
+
+    prompt, notes, omitted = _split_notes(system)
+
+    def over_budget():
+        return count_tokens_approximately(_flatten(_with_notes(system, prompt, notes, omitted), turns)) > budget
+
+    while len(turns) > 1 and over_budget():
+        notes.append(_note(turns.pop(0)))
+        step = "drop"
+    # The notes of the oldest dropped turns go next, leaving only their count
+    while notes and over_budget():
+        notes.pop(0)
+        omitted += 1
+        step = "drop"
+    return _flatten(_with_notes(system, prompt, notes, omitted), turns), step
+
+
+def compaction_hook(state: dict) -> dict:
+    """pre_model_hook of session graphs: replaces the stored history when it is over budget."""
+    messages = state["messages"]
+    compacted, step = compact(list(messages))
+    if step is None:
+        return {"messages": []}
+    SESSION_COMPACTIONS.labels(step).inc()
+    log.debug("Compacted session history", extra={
+        "step": step, "messages_before": len(messages), "messages_after": len(compacted),
+        "tokens_after": count_tokens_approximately(compacted),
+    })
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *compacted]}
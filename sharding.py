@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Horizontal Sharding of customer data across multiple SQLite files.
+A customer and all of their tickets live in shard customer_id % N, so every
+single-customer operation touches exactly one file (and one write lock).
+
+Usage:
+    python sharding.py reshard --db support.db --shards 4
+"""
+
+import argparse
+import contextlib
+import contextvars
+import io
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from archival import ARCHIVE_SCHEMA, ARCHIVED_COLUMNS, archive_path_for, attach_archive
+from database_setup import DatabaseSetup
+from migrations import rebuild_ticket_stats
+
+# Columns copied when shards are (re)built
+CUSTOMER_COLUMNS = "id, name, email, phone, status, created_at, updated_at"
+TICKET_COLUMNS = "id, customer_id, issue, status, priority, created_at, resolved_at"
+
+
+def shard_paths(db_path: str, shard_count: int) -> list:
+    """Shard files for a database: support.db -> support_shard0.db, support_shard1.db, ..."""
+    if shard_count <= 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}_shard{i}{ext or '.db'}" for i in range(shard_count)]
+
+
+class ShardMap:
+    """Maps customer ids to shard files and runs scatter-gather queries."""
+
+    def __init__(self, db_path: str, shard_count: int = 1):
+        """Describe the shard layout.
+
+        Args:
+            db_path: Logical database path; with one shard this is the file itself
+            shard_count: Number of shard files
+        """
+        self.db_path = db_path
+        self.count = max(1, shard_count)
+        self.paths = shard_paths(db_path, self.count)
+        self._executor = None
+
+    def index_for(self, customer_id: int) -> int:
+        """Shard number holding a customer and their tickets."""
+        return customer_id % self.count
+
+    def path_for(self, customer_id: int) -> str:
+        return self.paths[self.index_for(customer_id)]
+
+    def map(self, fn, shards: list = None) -> list:
+        """Run fn(shard_index) for every shard, concurrently when sharded."""
+        shards = list(range(self.count)) if shards is None else shards
+        if len(shards) == 1:
+            return [fn(shards[0])]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.count, thread_name_prefix="shard")
+        # Carry the caller's context (e.g. the current trace span) into the pool threads
+        context = contextvars.copy_context()
+        return list(self._executor.map(lambda shard: context.copy().run(fn, shard), shards))
+
+
+def next_ticket_id(conn: sqlite3.Connection, shard_index: int, shard_count: int) -> int:
+    """Allocate a globally unique ticket id in a shard.
+
+    Ids in shard k are congruent to k modulo the shard count, and always above
+    both the shard's AUTOINCREMENT high-water mark and the ticket_id_floor
+    recorded at the last reshard, so no two shards can hand out the same id.
+    Must be called inside the write transaction that inserts the ticket.
+    """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tickets'").fetchone()
+    floor = conn.execute(
+        "SELECT value FROM shard_meta WHERE key = 'ticket_id_floor'"
+    ).fetchone()
+    base = max(row[0] if row else 0, int(floor[0]) if floor else 0)
+    candidate = base + 1
+    return candidate + (shard_index - candidate) % shard_count
+
+
+# Files of a database besides the main file
+DATABASE_SIDECARS = ("-wal", "-shm", "-journal")
+
+
+def _remove_database(path: str):
+    for suffix in ("",) + DATABASE_SIDECARS:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _move_database(path: str, new_path: str):
+    """Rename a database together with its WAL and shared-memory files."""
+    for suffix in ("",) + DATABASE_SIDECARS:
+        if os.path.exists(path + suffix):
+            os.replace(path + suffix, new_path + suffix)
+
+
+def _checkpoint(path: str):
+    """Write every commit still in the database's WAL into the main file.
+
+    Raises:
+        RuntimeError: Another connection kept the checkpoint from completing
+    """
+    conn = sqlite3.connect(path)
+    try:
+        busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
+    if busy:
+        raise RuntimeError(f"{path} is in use; stop the MCP server before resharding")
+
+
+def _create_shard(path: str):
+    """Create an empty, fully migrated shard database."""
+    _remove_database(path)
+    setup = DatabaseSetup(path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup.connect()
+        setup.create_tables()
+        setup.create_triggers()
+        setup.migrate()
+        setup.close()
+
+
+def _drop_triggers(conn: sqlite3.Connection) -> list:
+    """Drop the triggers on customers and tickets, returning their SQL.
+
+    The copied rows already carry their timestamps; the resolved_at, stats
+    and change_log triggers would restamp, double count and log every one.
+    """
+    triggers = conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name IN ('customers', 'tickets')
+    """).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in triggers]
+
+
+def reshard(source_paths: list, db_path: str, shard_count: int, batch_size: int = 50_000) -> dict:
+    """Redistribute customers and tickets from source files into shard_count shards.
+
+    Run it while the MCP server is stopped. Source files are read, never
+    modified; when a target path is also a source, the data is staged in a
+    temporary file first (after a WAL checkpoint, so no commit stays behind
+    in the write-ahead log). If the copy fails, staged sources are moved back.
+
+    Archived tickets move with their customers: when any source has an
+    archive file (archival.archive_path_for), every new shard gets one, filled
+    by the same customer_id % N rule. A single ARCHIVE_DB_PATH shared by all
+    shards needs no resharding and is left alone.
+
+    Args:
+        source_paths: Current database file(s) (one unsharded file or all shards)
+        db_path: Logical database path of the new layout
+        shard_count: Number of shards in the new layout
+        batch_size: Rows copied per executemany() batch
+
+    Returns:
+        Dictionary with row counts per shard (archived: None without archives)
+        and elapsed time
+    """
+    started = time.perf_counter()
+    targets = shard_paths(db_path, shard_count)
+    source_archives = [archive_path_for(path) for path in source_paths
+                       if os.path.exists(archive_path_for(path))]
+    target_archives = [archive_path_for(path) for path in targets] if source_archives else []
+
+    staged = []
+    building = False
+    try:
+        # Never build a shard over a file we are still reading from
+        sources = [_stage(path, targets, staged) for path in source_paths]
+        archives = [_stage(path, target_archives, staged) for path in source_archives]
+        building = True
+        result = _copy_into_shards(sources, archives, targets, target_archives, batch_size)
+    except BaseException:
+        if building:
+            for path in targets + target_archives:
+                _remove_database(path)
+        for path, staging in staged:
+            _move_database(staging, path)
+        raise
+
+    for _, staging in staged:
+        _remove_database(staging)
+
+    return {"shards": targets, **result, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def _stage(path: str, targets: list, staged: list) -> str:
+    """Path to read a source from: moved aside (and added to staged) if it is also a target."""
+    if path not in targets:
+        return path
+    _checkpoint(path)
+    staging = f"{path}.resharding"
+    _move_database(path, staging)
+    staged.append((path, staging))
+    return staging
+
+
+def _copy_into_shards(sources: list, archives: list, targets: list, target_archives: list,
+                      batch_size: int) -> dict:
+    """Build the target shards (and their archives) from the source files (see reshard)."""
+    shard_count = len(targets)
+    for path in targets:
+        _create_shard(path)
+    shards = [sqlite3.connect(path) for path in targets]
+    triggers = []
+    for conn in shards:
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA foreign_keys = OFF")
+        triggers.append(_drop_triggers(conn))
+    for conn, path in zip(shards, target_archives):
+        _remove_database(path)
+        attach_archive(conn, path)
+
+    customers = [0] * shard_count
+    tickets = [0] * shard_count
+    archived = [0] * shard_count
+    max_ticket_id = 0
+
+    try:
+        for source in sources:
+            _copy_source(source, shards, customers, tickets, batch_size)
+            max_ticket_id = max(max_ticket_id, _max_ticket_id(source))
+        for archive in archives:
+            _copy_archive(archive, shards, archived, batch_size)
+            max_ticket_id = max(max_ticket_id, _max_archived_id(archive))
+
+        for i, conn in enumerate(shards):
+            for sql in triggers[i]:
+                conn.execute(sql)
+            # Stats are built in one pass instead of per copied row
+            rebuild_ticket_stats(conn)
+            conn.executemany("INSERT OR REPLACE INTO shard_meta (key, value) VALUES (?, ?)", [
+                ("shard_index", str(i)),
+                ("shard_count", str(shard_count)),
+                ("ticket_id_floor", str(max_ticket_id)),
+            ])
+            conn.commit()
+    finally:
+        for conn in shards:
+            conn.close()
+
+    return {"customers": customers, "tickets": tickets, "archived": archived if archives else None,
+            "ticket_id_floor": max_ticket_id}
+
+
+def _max_ticket_id(source: str) -> int:
+    """Highest ticket id a source has handed out (rows or AUTOINCREMENT sequence)."""
+    src = sqlite3.connect(source)
+    try:
+        return src.execute(
+            "SELECT MAX(COALESCE((SELECT MAX(id) FROM tickets), 0),"
+            " COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'tickets'), 0))"
+        ).fetchone()[0]
+    finally:
+        src.close()
+
+
+def _max_archived_id(archive: str) -> int:
+    src = sqlite3.connect(archive)
+    try:
+        return src.execute("SELECT COALESCE(MAX(id), 0) FROM tickets_archive").fetchone()[0]
+    finally:
+        src.close()
+
+
+def _copy_rows(cursor, shards: list, table: str, columns: str, key: int, counts: list, batch_size: int):
+    """Insert a cursor's rows into table of the shard of row[key], counting rows per shard."""
+    shard_count = len(shards)
+    placeholders = ", ".join("?" * len(columns.split(",")))
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        buckets = [[] for _ in range(shard_count)]
+        for row in rows:
+            buckets[row[key] % shard_count].append(row)
+        for i, bucket in enumerate(buckets):
+            if bucket:
+                shards[i].executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", bucket)
+                counts[i] += len(bucket)
+
+
+def _copy_source(source: str, shards: list, customers: list, tickets: list, batch_size: int):
+    """Copy one source file's customers and tickets into their shards, counting rows per shard."""
+    src = sqlite3.connect(source)
+    try:
+        for table, columns, key, counts in (
+            ("customers", CUSTOMER_COLUMNS, 0, customers),
+            ("tickets", TICKET_COLUMNS, 1, tickets),
+        ):
+            _copy_rows(src.execute(f"SELECT {columns} FROM {table}"), shards, table, columns, key,
+                       counts, batch_size)
+    finally:
+        src.close()
+
+
+def _copy_archive(archive: str, shards: list, archived: list, batch_size: int):
+    """Copy one archive file's tickets into the archives attached to their shards."""
+    columns = f"{ARCHIVED_COLUMNS}, archived_at"
+    src = sqlite3.connect(archive)
+    try:
+        _copy_rows(src.execute(f"SELECT {columns} FROM tickets_archive"), shards,
+                   f"{ARCHIVE_SCHEMA}.tickets_archive", columns, 1, archived, batch_size)
+    finally:
+        src.close()
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Shard management for the support database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cmd = sub.add_parser("reshard", help="Redistribute data into a new number of shards")
+    cmd.add_argument("--db", default="support.db", help="Logical database path")
+    cmd.add_argument("--from-shards", type=int, default=1, help="Current number of shards")
+    cmd.add_argument("--shards", type=int, required=True, help="New number of shards")
+    args = parser.parse_args()
+
+    sources = shard_paths(args.db, args.from_shards)
+    result = reshard(sources, args.db, args.shards)
+    archived = result["archived"] or [None] * len(result["shards"])
+    for path, customers, tickets, moved in zip(result["shards"], result["customers"], result["tickets"], archived):
+        print(f" {path:<30} | {customers:>9} customers | {tickets:>10} tickets"
+              + (f" | {moved:>10} archived" if moved is not None else ""))
+    print(f"Resharded into {args.shards} shards in {result['seconds']}s. "
+          f"Start the MCP server with MCP_SHARDS={args.shards}.")
+
+
+if __name__ == "__main__":
+    main()
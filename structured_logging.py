@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Structured Logging
+JSON-lines logging shared by the agents, the MCP server and the launcher.
+
+A log call only enqueues the record; a listener thread formats it and
+writes it to stderr, one write per line. A slow console therefore never
+blocks a request, and lines from different processes sharing the console
+never interleave mid-line. When the queue is full, records are dropped and
+counted in log_records_dropped_total instead of blocking. Each line carries
+the service name and, when known, the request ID and the trace and span IDs
+of the request that logged it.
+
+Environment:
+    LOG_LEVEL              Root level (default INFO)
+    LOG_LEVELS             Per-logger levels, e.g. "a2a_agents=DEBUG,uvicorn.access=WARNING"
+    LOG_FORMAT             json (default) or text
+    LOG_DEBUG_SAMPLE_RATE  Fraction of DEBUG records kept (default 1.0)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import tracing
+from metrics import REGISTRY
+
+# Records waiting for the listener thread before new ones are dropped
+QUEUE_SIZE = 10000
+
+# Loggers that log every request at INFO; LOG_LEVELS overrides these
+DEFAULT_LEVELS = {
+    "httpx": "WARNING",
+    "mcp.server.lowlevel.server": "WARNING",
+}
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# ID of the request being handled: from the caller's X-Request-ID header or
+# MCP _meta, else generated at the entry point
+request_id = ContextVar("request_id", default=None)
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full.",
+)
+
+# Attributes of every LogRecord; anything else on a record came from extra={...}
+# (except uvicorn's ANSI-colored copy of the message)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "service", "request_id", "trace_id", "span_id", "color_message",
+}
+
+_listener = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def inject(headers: dict = None) -> dict:
+    """Headers (new dict if None) with the current request ID added."""
+    headers = dict(headers or {})
+    current = request_id.get()
+    if current:
+        headers[REQUEST_ID_HEADER] = current
+    return headers
+
+
+# ==========================================
+# Filters, Handler and Formatters
+# ==========================================
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the service and the current request and trace IDs.
+
+    Runs in the thread that logs, where the request's contextvars are visible.
+    """
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def filter(self, record):
+        record.service = self.service
+        record.request_id = request_id.get()
+        span = tracing.current_span()
+        record.trace_id = span.trace_id if span else None
+        record.span_id = span.span_id if span else None
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keeps only a random fraction of DEBUG records (high-volume events)."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking on a full queue."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record):
+        # Only merge the message arguments here; formatting happens on the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+def _extra_fields(record) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: fixed fields first, then the record's extra fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": getattr(record, "service", None),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("request_id", "trace_id", "span_id"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the extra fields as key=value pairs."""
+
+    def format(self, record):
+        time = datetime.fromtimestamp(record.created).strftime("%H:%M:%S.%f")[:-3]
+        fields = " ".join(f"{key}={value}" for key, value in _extra_fields(record).items())
+        line = f"{time} {record.levelname:<7} [{getattr(record, 'service', '-')}] {record.getMessage()}"
+        if fields:
+            line += f"  {fields}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+# ==========================================
+# Setup
+# ==========================================
+
+def parse_levels(value: str) -> dict:
+    """{"logger": "LEVEL"} from "logger=LEVEL,other=LEVEL"."""
+    levels = {}
+    for item in (value or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure(service: str, level: str = None, levels: str = None, fmt: str = None,
+              sample_rate: float = None, stream=None):
+    """Route all logging of this process through the queue to the console.
+
+    Replaces any handlers on the root logger (e.g. the one FastMCP installs),
+    and can be called again to reconfigure. Arguments default to the LOG_*
+    environment variables.
+
+    Args:
+        service: Service name stamped on every line (e.g. 'router-agent')
+        level: Root log level
+        levels: Per-logger levels, "logger=LEVEL,..."
+        fmt: 'json' or 'text'
+        sample_rate: Fraction of DEBUG records kept
+        stream: Where lines are written (default stderr)
+    """
+    global _listener
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+    shutdown()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    records = queue.Queue(QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(records)
+    # Sample first: a dropped DEBUG record costs nothing more
+    handler.addFilter(DebugSampler(sample_rate))
+    handler.addFilter(ContextFilter(service))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, logger_level in {**DEFAULT_LEVELS, **parse_levels(levels or os.getenv("LOG_LEVELS"))}.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+
+
+def shutdown():
+    """Write every queued record and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Process Supervisor
+Keeps a set of service processes running: restarts a process that exits
+according to its restart policy with exponential backoff, drains a process
+(SIGTERM, then SIGKILL after a grace period) before restarting or stopping
+it, optionally pins processes to CPUs, and serves GET /status with uptime,
+restarts and resident memory per process. Used by run_system.py --supervise.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+log = logging.getLogger("supervisor")
+
+RESTART_POLICIES = ("always", "on-failure", "never")
+BACKOFF_INITIAL_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# A process that stayed up this long is healthy again: its backoff starts over
+STABLE_AFTER_SECONDS = 60.0
+# How long a process may take to finish in-flight requests after SIGTERM
+DRAIN_TIMEOUT_SECONDS = 30.0
+# Exit code reported for a process that could not be started (as a shell
+# reports a command it cannot run)
+SPAWN_FAILED_EXIT_CODE = 127
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident memory of a process and all its descendants (Linux /proc), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, StopIteration, ValueError):
+        return None
+    # Multi-worker servers (e.g. uvicorn --workers) keep their workers as children
+    return rss + sum(rss_bytes(child) or 0 for child in children)
+
+
+class Service:
+    """One supervised process: how to run it and what happened to it so far."""
+
+    def __init__(self, name: str, command: list, env: dict = None, restart: str = "on-failure",
+                 cpus: set = None, drain_timeout: float = DRAIN_TIMEOUT_SECONDS):
+        """
+        Args:
+            name: Unique service name (used in /status and POST /restart/{name})
+            command: argv of the process
+            env: Extra environment variables
+            restart: 'always', 'on-failure' (non-zero exit) or 'never'
+            cpus: CPU numbers to pin the process (and its children) to
+            drain_timeout: Seconds between SIGTERM and SIGKILL when stopping
+        """
+        if restart not in RESTART_POLICIES:
+            raise ValueError(f"restart must be one of {RESTART_POLICIES}")
+        self.name = name
+        self.command = command
+        self.env = env
+        self.restart = restart
+        self.cpus = cpus
+        self.drain_timeout = drain_timeout
+
+        self.process = None
+        self.state = "pending"
+        self.launched = None  # perf_counter of the first start
+        self.started_at = None  # monotonic time of the current start
+        self.restarts = 0
+        self.last_exit_code = None
+        self.backoff = BACKOFF_INITIAL_SECONDS
+        self._restart_requested = False
+        self._stopping = False
+
+    def poll(self):
+        """Exit code once the supervisor has given up on the service, else None.
+
+        Mirrors Popen.poll() so readiness probes can fail fast on a service
+        that is not coming back, while a crash that will be restarted keeps
+        them waiting.
+        """
+        return self.last_exit_code if self.state in ("exited", "failed", "stopped") else None
+
+    @property
+    def returncode(self):
+        return self.poll()
+
+    def status(self) -> dict:
+        running = self.state in ("running", "draining")
+        return {
+            "state": self.state,
+            "pid": self.process.pid if running else None,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1) if running else 0,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "rss_bytes": rss_bytes(self.process.pid) if running else None,
+            "cpus": sorted(self.cpus) if self.cpus else None,
+        }
+
+
+class Supervisor:
+    """Runs services, restarts them per policy and reports their status."""
+
+    def __init__(self, services: list):
+        self.services = {service.name: service for service in services}
+        self._watchers = []
+        self.started_at = time.monotonic()
+
+    # ==========================================
+    # Process Lifecycle
+    # ==========================================
+
+    async def _spawn(self, service: Service):
+        service.process = await asyncio.create_subprocess_exec(
+            *service.command,
+            env=dict(os.environ, **service.env) if service.env else None,
+            # Own session: a Ctrl+C in the terminal reaches only the supervisor,
+            # which then drains the services instead of racing their restarts
+            start_new_session=True,
+        )
+        if service.cpus and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(service.process.pid, service.cpus)
+            except OSError:
+                # e.g. EINVAL for CPUs this machine does not have
+                service.process.kill()
+                await service.process.wait()
+                raise
+        service.started_at = time.monotonic()
+        service.launched = service.launched or time.perf_counter()
+        service.state = "running"
+        log.info("Started service", extra={"service": service.name, "pid": service.process.pid})
+
+    async def _watch(self, service: Service):
+        """Run a service until it is stopped or its restart policy gives up."""
+        while True:
+            try:
+                await self._spawn(service)
+            except OSError:
+                # Missing executable, bad CPU set, ...: a failure like a crash
+                service.last_exit_code = SPAWN_FAILED_EXIT_CODE
+                if service.restart == "never":
+                    service.state = "failed"
+                    log.error("Service failed to start; not restarting", exc_info=True,
+                              extra={"service": service.name})
+                    return
+                log.error("Service failed to start; retrying after backoff", exc_info=True,
+                          extra={"service": service.name, "backoff_seconds": service.backoff})
+                if not await self._back_off(service):
+                    return
+                continue
+            code = await service.process.wait()
+            service.last_exit_code = code
+            uptime = time.monotonic() - service.started_at
+
+            if service._stopping:
+                service.state = "stopped"
+                return
+            if service._restart_requested:
+                # Drained on request: come straight back, not a failure
+                service._restart_requested = False
+                service.restarts += 1
+                continue
+            if service.restart == "never" or (service.restart == "on-failure" and code == 0):
+                service.state = "exited"
+                log.info("Service exited; not restarting", extra={"service": service.name, "exit_code": code})
+                return
+
+            if uptime >= STABLE_AFTER_SECONDS:
+                service.backoff = BACKOFF_INITIAL_SECONDS
+            log.warning("Service exited; restarting after backoff", extra={
+                "service": service.name, "exit_code": code, "uptime_seconds": round(uptime, 1),
+                "backoff_seconds": service.backoff,
+            })
+            if not await self._back_off(service):
+                return
+
+    async def _back_off(self, service: Service) -> bool:
+        """Wait out a service's backoff before restarting it; False if it was stopped meanwhile."""
+        service.state = "backoff"
+        await asyncio.sleep(service.backoff)
+        service.backoff = min(service.backoff * 2, BACKOFF_MAX_SECONDS)
+        if service._stopping:
+            service.state = "stopped"
+            return False
+        service.restarts += 1
+        return True
+
+    async def drain(self, service: Service):
+        """SIGTERM the process (servers stop accepting and finish in-flight
+        requests), then SIGKILL it if it is still running after drain_timeout."""
+        process = service.process
+        if process is None or process.returncode is not None:
+            return
+        service.state = "draining"
+        process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), service.drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("Service did not drain in time; killing", extra={
+                "service": service.name, "drain_timeout_seconds": service.drain_timeout,
+            })
+            process.kill()
+            await process.wait()
+
+    async def restart(self, name: str):
+        """Drain a service and start it again right away."""
+        service = self.services[name]
+        if service.state not in ("running", "draining"):
+            raise ValueError(f"{name} is not running")
+        service._restart_requested = True
+        await self.drain(service)
+
+    async def start(self):
+        """Start every service (all at once) and keep them supervised."""
+        self._watchers = [
+            asyncio.create_task(self._watch(service)) for service in self.services.values()
+        ]
+        # Let every watcher spawn its process (or give up) before returning
+        while any(service.state == "pending" and not watcher.done()
+                  for service, watcher in zip(self.services.values(), self._watchers)):
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        """Drain every service and stop supervising."""
+        for service in self.services.values():
+            service._stopping = True
+        await asyncio.gather(*(self.drain(service) for service in self.services.values()))
+        for watcher in self._watchers:
+            watcher.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        for service in self.services.values():
+            service.state = "stopped"
+
+    # ==========================================
+    # Status Endpoint
+    # ==========================================
+
+    def status(self) -> dict:
+        return {
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "services": {name: service.status() for name, service in self.services.items()},
+        }
+
+    def create_status_app(self) -> FastAPI:
+        app = FastAPI(title="Supervisor")
+
+        @app.get("/status")
+        async def get_status():
+            """Uptime, restarts and resident memory of every supervised process."""
+            return self.status()
+
+        @app.post("/restart/{name}")
+        async def restart_service(name: str):
+            """Drain a service and start it again (e.g. after a deploy)."""
+            if name not in self.services:
+                raise HTTPException(status_code=404, detail=f"Unknown service: {name}")
+            try:
+                await self.restart(name)
+            except ValueError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            return self.services[name].status()
+
+        return app
+
+    async def serve(self, status_port: int, host: str = "127.0.0.1"):
+        """Serve the status endpoint until SIGINT/SIGTERM, then stop every service."""
+        server = _StatusServer(uvicorn.Config(
+            self.create_status_app(), host=host, port=status_port, log_level="warning", log_config=None,
+        ))
+        stop_requested = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_requested.set)
+
+        serving = asyncio.create_task(server.serve())
+        await stop_requested.wait()
+        log.info("Draining all services")
+        server.should_exit = True
+        await self.stop()
+        await serving
+
+
+class _StatusServer(uvicorn.Server):
+    """uvicorn server that leaves signal handling to Supervisor.serve."""
+
+    @contextmanager
+    def capture_signals(self):
+        yield
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Agent Registry Tests
+Checks least-outstanding-requests selection, ejection and re-admission of
+failing instances, and discovery through agent cards.
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from agent_registry import AgentRegistry
+
+
+def card_server(up: set):
+    """Mock transport: instances whose host:port is in `up` serve their card."""
+    def handler(request):
+        if request.url.netloc.decode() not in up:
+            raise httpx.ConnectError("connection refused", request=request)
+        agent_type = {"5001": "data", "5011": "data", "5002": "support"}[str(request.url.port)]
+        return httpx.Response(200, json={"name": f"{agent_type.capitalize()} Agent",
+                                         "agent_type": agent_type})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_least_outstanding_requests():
+    registry = AgentRegistry()
+    a = registry.add("data", "http://localhost:5001")
+    b = registry.add("data", "http://localhost:5011/")
+    assert registry.add("data", "http://localhost:5011") is b
+
+    async def scenario():
+        first = registry.pick("data")
+        async with registry.track(first):
+            # The busy instance is skipped while its request is in flight
+            second = registry.pick("data")
+            assert second is not first
+            async with registry.track(second):
+                assert {a.outstanding, b.outstanding} == {1}
+        assert a.outstanding == b.outstanding == 0
+        # Idle instances are used in turn
+        assert registry.pick("data") is first
+        assert registry.pick("data") is second
+
+    asyncio.run(scenario())
+    assert registry.pick("billing") is None
+
+
+def test_failing_instance_is_ejected_and_readmitted():
+    registry = AgentRegistry(failure_threshold=2)
+    a = registry.add("data", "http://localhost:5001")
+    b = registry.add("data", "http://localhost:5011")
+    up = {"localhost:5001"}
+
+    async def scenario():
+        async with card_server(up) as client:
+            await registry.check_health(client)
+            assert not b.ejected  # One failure is tolerated
+            await registry.check_health(client)
+            assert b.ejected and not a.ejected
+            assert all(registry.pick("data") is a for _ in range(3))
+
+            up.add("localhost:5011")
+            await registry.check_health(client)
+            assert not b.ejected and b.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_all_ejected_still_picks():
+    registry = AgentRegistry(failure_threshold=1)
+    a = registry.add("support", "http://localhost:5002")
+    registry.record_failure(a)
+    assert a.ejected
+    assert registry.pick("support") is a
+    assert registry.pick("support", exclude=(a,)) is None
+
+
+def test_discover_and_config(tmp_path):
+    registry = AgentRegistry()
+
+    async def scenario():
+        async with card_server({"localhost:5001", "localhost:5002"}) as client:
+            return await registry.discover(
+                ["http://localhost:5001", "http://localhost:5002", "http://localhost:5011"], client
+            )
+
+    found = asyncio.run(scenario())
+    assert [(i.agent_type, i.url) for i in found] == [
+        ("data", "http://localhost:5001"), ("support", "http://localhost:5002")
+    ]
+
+    config = tmp_path / "agents.json"
+    config.write_text(json.dumps({"data": ["http://localhost:5001", "http://localhost:5011"]}))
+    registry.load_config(str(config))
+    assert [i.url for i in registry.instances["data"]] == [
+        "http://localhost:5001", "http://localhost:5011"
+    ]
+    assert registry.snapshot()["support"][0]["outstanding"] == 0
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Ticket Archival Tests
+Moves old resolved tickets to the archive file and checks what each view of
+the tickets reports afterwards: statistics, the change log, analytics and
+customer history with and without the archive. Tickets resolved before
+resolved_at was recorded are backfilled by a migration and archived too.
+"""
+
+import json
+import os
+import sqlite3
+
+import mcp_server
+from archival import TicketArchiver, archive_path_for
+from database_setup import DatabaseSetup
+from change_feed import read_changes
+from migrations import migrate, rebuild_ticket_stats
+from ticket_analytics import TicketAnalytics
+
+
+def call(tool_name, **arguments):
+    return json.loads(getattr(mcp_server, tool_name)(**arguments))
+
+
+def test_archived_tickets_leave_the_hot_views(sample_db, tmp_path, monkeypatch):
+    archive_path = str(tmp_path / "archive.db")
+    monkeypatch.setattr(mcp_server, "ARCHIVE_DB_PATH", archive_path)
+    with sqlite3.connect(sample_db) as conn:
+        old_ids = [row[0] for row in conn.execute("SELECT id FROM tickets WHERE customer_id = 1")]
+        placeholders = ",".join("?" * len(old_ids))
+        conn.execute(f"UPDATE tickets SET status = 'resolved' WHERE id IN ({placeholders})", old_ids)
+        # Backdated after the status change, whose trigger stamps resolved_at with now
+        conn.execute(f"UPDATE tickets SET resolved_at = datetime('now', '-120 days') WHERE id IN ({placeholders})",
+                     old_ids)
+        last_seq = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()[0]
+    total = call("get_ticket_stats")["total"]
+    analytics = TicketAnalytics(sample_db)
+    analytics.refresh()
+    full_history = call("get_customer_history", customer_id=1)
+
+    result = TicketArchiver(sample_db, archive_path, older_than_days=90, batch_size=1, pause_seconds=0).run()
+    assert result["archived"] == len(old_ids) and result["batches"] == len(old_ids)
+
+    # Statistics count hot tickets only, and agree with a recount
+    assert call("get_ticket_stats")["total"] == total - len(old_ids)
+    assert call("get_ticket_stats", customer_id=1).get("total", 0) == 0
+    with sqlite3.connect(sample_db) as conn:
+        before_rebuild = conn.execute("SELECT * FROM ticket_stats WHERE total > 0 ORDER BY customer_id").fetchall()
+        rebuild_ticket_stats(conn)
+        assert conn.execute("SELECT * FROM ticket_stats WHERE total > 0 ORDER BY customer_id").fetchall() == before_rebuild
+        changes = read_changes(conn, last_seq, 100)
+    # Each move is a 'delete' of the hot row
+    assert sorted(c["row_id"] for c in changes if c["op"] == "delete") == sorted(old_ids)
+    assert all(c["customer_id"] == 1 for c in changes)
+
+    assert call("get_customer_history", customer_id=1) == []
+    archived = call("get_customer_history", customer_id=1, include_archive=True)
+    assert [t["id"] for t in archived] == [t["id"] for t in full_history]
+
+    assert analytics.refresh()["full_reload"]
+    assert len(analytics.data) == total - len(old_ids)
+
+
+def test_tickets_resolved_before_migrations_are_archived(tmp_path):
+    db_path = str(tmp_path / "legacy.db")
+    setup = DatabaseSetup(db_path)
+    setup.connect()
+    setup.create_tables()
+    setup.create_triggers()
+    conn = setup.conn
+    conn.execute("INSERT INTO customers (id, name) VALUES (1, 'Legacy Customer')")
+    conn.executemany("INSERT INTO tickets (customer_id, issue, status, created_at) VALUES (?, ?, ?, ?)", [
+        (1, "Resolved long ago", "resolved", "2020-01-02 03:04:05"),
+        (1, "Still open", "open", "2020-01-02 03:04:05"),
+    ])
+    conn.commit()
+
+    # Schema 8 added resolved_at without filling it in
+    migrate(conn, target=8)
+    assert conn.execute("SELECT COUNT(*) FROM tickets WHERE resolved_at IS NOT NULL").fetchone()[0] == 0
+    migrate(conn)
+    assert conn.execute("SELECT status, resolved_at FROM tickets ORDER BY id").fetchall() == [
+        ("resolved", "2020-01-02 03:04:05"), ("open", None),
+    ]
+    assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 0
+    setup.close()
+
+    result = TicketArchiver(db_path, str(tmp_path / "legacy_archive.db"), pause_seconds=0).run()
+    assert result["archived"] == 1
+
+
+def test_reading_the_archive_writes_nothing(sample_db, monkeypatch):
+    monkeypatch.setattr(mcp_server, "ARCHIVE_DB_PATH", None)
+    archive_path = archive_path_for(sample_db)
+    hot = call("get_customer_history", customer_id=1)
+    assert call("get_customer_history", customer_id=1, include_archive=True) == hot
+    assert not os.path.exists(archive_path)
+
+    with sqlite3.connect(sample_db) as conn:
+        conn.execute("UPDATE tickets SET status = 'resolved' WHERE customer_id = 1")
+        conn.execute("UPDATE tickets SET resolved_at = datetime('now', '-120 days') WHERE customer_id = 1")
+    TicketArchiver(sample_db, older_than_days=90, pause_seconds=0).run()
+    with open(archive_path, "rb") as f:
+        archived = f.read()
+    assert [t["id"] for t in call("get_customer_history", customer_id=1, include_archive=True)] == [
+        t["id"] for t in hot
+    ]
+    with open(archive_path, "rb") as f:
+        assert f.read() == archived
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Batch Runner Tests
+Checks resuming from the output file (skipped IDs, a torn last line,
+--retry-failed) and an offline in-process run with usage and cost totals.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+import a2a_agents
+import batch_runner
+import fake_llm
+import mcp_server
+
+
+def write_lines(path, lines):
+    with open(path, "w") as f:
+        f.writelines(line + "\n" for line in lines)
+
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_skips_completed_and_retries_failed(tmp_path):
+    requests_path, output_path = tmp_path / "requests.jsonl", str(tmp_path / "results.jsonl")
+    write_lines(requests_path, [
+        json.dumps({"id": "a", "query": "first"}),
+        json.dumps({"request_id": "b", "body": "second"}),
+        json.dumps({"query": "third"}),
+        json.dumps({"id": "d"}),
+    ])
+    # An earlier run finished "a" and crashed while writing the next line
+    with open(output_path, "w") as f:
+        f.write(json.dumps({"id": "a", "success": True, "result": "done"}) + "\n" + '{"id": "b", "succ')
+
+    executed = []
+
+    async def execute(request):
+        executed.append(request["id"])
+        if request["query"] == "third":
+            raise RuntimeError("agent down")
+        return {"success": True, "result": request["query"].upper(), "usage": {"input_tokens": 10}}
+
+    def run(**kwargs):
+        requests = batch_runner.read_requests(str(requests_path))
+        return asyncio.run(batch_runner.run_batch(requests, execute, output_path, concurrency=2,
+                                                  progress_seconds=0, **kwargs))
+
+    summary = run(prices={"input_tokens": 1.0})
+    assert sorted(executed) == ["b", "line-3"]
+    assert summary["skipped"] == 1
+    assert (summary["succeeded"], summary["failed"]) == (1, 2)
+    assert summary["cost_usd"] == pytest.approx(10 / 1e6)
+    results = {r["id"]: r for r in read_results(output_path)}
+    assert results["b"]["result"] == "SECOND"
+    assert results["line-3"]["error"] == "RuntimeError: agent down"
+    assert results["d"]["error"] == "No query in the input line"
+
+    executed.clear()
+    run()
+    assert executed == []
+    run(retry_failed=True)
+    assert executed == ["line-3"]
+
+
+def test_malformed_lines_fail_without_stopping_the_batch(tmp_path):
+    requests_path, output_path = tmp_path / "requests.jsonl", str(tmp_path / "results.jsonl")
+    write_lines(requests_path, [
+        json.dumps({"id": "a", "query": "first"}),
+        '{"id": "b", "query": ',
+        "[1, 2]",
+        json.dumps({"id": "d", "query": "fourth"}),
+    ])
+
+    async def execute(request):
+        return {"success": True, "result": request["query"]}
+
+    def run(**kwargs):
+        requests = batch_runner.read_requests(str(requests_path))
+        return asyncio.run(batch_runner.run_batch(requests, execute, output_path, progress_seconds=0, **kwargs))
+
+    summary = run()
+    assert (summary["succeeded"], summary["failed"]) == (2, 2)
+    results = {r["id"]: r for r in read_results(output_path)}
+    assert results["line-2"]["error"] == results["line-3"]["error"] == "invalid JSON"
+    assert results["d"]["result"] == "fourth"
+
+    # A rerun completes (the bad lines stay failed instead of aborting it)
+    assert run(retry_failed=True)["failed"] == 2
+
+
+def test_in_process_run_reports_usage(sample_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(a2a_agents, "_llm", fake_llm.FakeChatModel())
+    monkeypatch.setattr(mcp_server, "CUSTOMER_REPLICA", False)
+    requests_path, output_path = tmp_path / "requests.jsonl", str(tmp_path / "results.jsonl")
+    write_lines(requests_path, [json.dumps({"id": i, "query": f"Get customer information for ID {i}"})
+                                for i in (1, 2)])
+
+    async def scenario():
+        async with a2a_agents.in_process_mcp():
+            return await batch_runner.run_batch(
+                batch_runner.read_requests(str(requests_path)), batch_runner.in_process_executor("router"),
+                output_path, progress_seconds=0, prices={"input_tokens": 1.0, "output_tokens": 1.0},
+            )
+
+    summary = asyncio.run(scenario())
+    assert summary["succeeded"] == 2
+    [first, _] = sorted(read_results(output_path), key=lambda r: r["id"])
+    assert '"id": 1' in first["result"]
+    # Router: delegate + answer; data specialist: get_customer + answer
+    assert first["usage"]["llm_calls"] == 4
+    assert summary["usage"]["llm_calls"] == 8
+    assert summary["cost_usd"] > 0
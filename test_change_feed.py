@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Change Feed Tests
+Checks the trigger-fed change_log, the get_changes long-poll tool and
+resource-updated notifications to subscribed MCP sessions.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+from mcp import types
+from mcp.server.lowlevel import NotificationOptions, Server
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import mcp_server
+from change_feed import ChangeFeed, ChangeLogPruner, advertise_resource_subscriptions, change_bounds, prune_changes
+
+
+@pytest.fixture(autouse=True)
+def change_feed(monkeypatch):
+    """A fresh, fast-polling change feed for every test."""
+    feed = ChangeFeed(mcp_server.scatter, interval_seconds=0.05)
+    monkeypatch.setattr(mcp_server, "_change_feed", feed)
+    return feed
+
+
+def get_changes(**arguments) -> dict:
+    return json.loads(asyncio.run(mcp_server.get_changes(**arguments)))
+
+
+def test_writes_are_logged_once(sample_db):
+    head = get_changes(limit=1000)
+    assert len(head["changes"]) == 40  # 15 customers + 25 tickets from the sample data
+
+    mcp_server.update_customer(3, email="bob.j@example.com")
+    mcp_server.create_ticket(3, "Need help upgrading")
+    conn = sqlite3.connect(sample_db)
+    conn.execute("UPDATE tickets SET status = 'resolved' WHERE id = 1")
+    conn.execute("DELETE FROM tickets WHERE id = 2")
+    conn.commit()
+    conn.close()
+
+    changes = get_changes(since_seq=head["next_seq"])["changes"]
+    assert [(c["table"], c["op"], c["customer_id"]) for c in changes] == [
+        ("customers", "update", 3),
+        ("tickets", "insert", 3),
+        ("tickets", "update", 1),
+        ("tickets", "delete", 4),
+    ]
+    assert [c["seq"] for c in changes] == sorted(c["seq"] for c in changes)
+
+
+def test_long_poll_wakes_on_change(sample_db):
+    head = get_changes(limit=1000)["next_seq"]
+    writer = threading.Timer(0.2, mcp_server.create_ticket, args=(5, "Late ticket"))
+    writer.start()
+
+    result = get_changes(since_seq=head, timeout_seconds=5)
+    writer.join()
+    assert [c["op"] for c in result["changes"]] == ["insert"]
+    assert result["next_seq"] == head + 1
+
+    empty = get_changes(since_seq=result["next_seq"], timeout_seconds=0.2)
+    assert empty["changes"] == [] and empty["next_seq"] == result["next_seq"]
+
+
+def test_pruned_position_requires_reset(sample_db):
+    conn = sqlite3.connect(sample_db)
+    prune_changes(conn, keep=10)
+    conn.close()
+
+    result = get_changes(since_seq=5)
+    assert result["reset"] and result["cursor"] == "40"
+    assert not get_changes(since_seq=35)["reset"]
+
+
+def test_pruner_runs_without_feed_readers(sample_db):
+    pruner = ChangeLogPruner(sample_db, keep=10)
+    pruner.start_background(interval_seconds=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with sqlite3.connect(sample_db) as conn:
+                if change_bounds(conn) == (31, 40):
+                    break
+            time.sleep(0.01)
+    finally:
+        pruner.stop()
+    with sqlite3.connect(sample_db) as conn:
+        assert change_bounds(conn) == (31, 40)
+
+
+def test_subscribed_session_is_notified(sample_db):
+    async def scenario():
+        updated = asyncio.Queue()
+
+        async def on_message(message):
+            if isinstance(message, types.ServerNotification):
+                if isinstance(message.root, types.ResourceUpdatedNotification):
+                    await updated.put(str(message.root.params.uri))
+
+        async with create_connected_server_and_client_session(
+            mcp_server.mcp, message_handler=on_message
+        ) as client:
+            assert client.get_server_capabilities().resources.subscribe
+            await client.subscribe_resource("customer://3/tickets")
+            await asyncio.sleep(0.1)  # Let the poller take its baseline
+
+            await asyncio.to_thread(mcp_server.create_ticket, 3, "Subscribed ticket")
+            await asyncio.to_thread(mcp_server.create_ticket, 4, "Not subscribed")
+            assert await asyncio.wait_for(updated.get(), 5) == "customer://3/tickets"
+            await asyncio.sleep(0.2)
+            assert updated.empty()
+
+    asyncio.run(scenario())
+
+
+def test_subscribe_is_advertised_only_with_a_handler():
+    def subscribe_capability(server):
+        return server.get_capabilities(NotificationOptions(), {}).resources.subscribe
+
+    server = Server("feed")
+    server.list_resources()(lambda: [])
+    advertise_resource_subscriptions(server)
+    assert not subscribe_capability(server)
+
+    async def on_subscribe(uri):
+        pass
+
+    server.subscribe_resource()(on_subscribe)
+    assert subscribe_capability(server)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Customer Replica Tests
+Checks that customer reads served from the in-memory replica match the
+SQLite queries, and that the replica follows writes from the MCP tools and
+from other processes.
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+import mcp_server
+from customer_cache import CustomerReplica
+
+
+@pytest.fixture
+def replica(sample_db, monkeypatch):
+    """Load a replica of the sample database and serve the MCP tools from it."""
+    replica = CustomerReplica([sample_db])
+    replica.load()
+    monkeypatch.setattr(mcp_server, "_customer_replica", replica)
+    return replica
+
+
+READ_CALLS = [
+    ("get_customer", {"customer_id": 5}),
+    ("get_customer", {"customer_id": 999}),
+    ("list_customers", {}),
+    ("list_customers", {"status": "disabled", "limit": 3}),
+    ("find_customer_by_email", {"email": " jane.smith@example.com "}),
+    ("find_customer_by_email", {"email": "nobody@example.com"}),
+    ("find_customer_by_phone", {"phone": "(1) 555.0104"}),
+]
+
+
+def call(tool_name, **arguments):
+    return json.loads(getattr(mcp_server, tool_name)(**arguments))
+
+
+def test_replica_reads_match_sqlite(sample_db, monkeypatch):
+    expected = [call(name, **args) for name, args in READ_CALLS]
+
+    replica = CustomerReplica([sample_db])
+    assert replica.load() == 15
+    monkeypatch.setattr(mcp_server, "_customer_replica", replica)
+
+    for (name, args), before in zip(READ_CALLS, expected):
+        assert call(name, **args) == before, (name, args)
+
+
+def test_update_customer_refreshes_replica(replica):
+    call("update_customer", customer_id=4, email="alice.w@example.com", status="disabled")
+
+    assert call("get_customer", customer_id=4)["email"] == "alice.w@example.com"
+    assert call("find_customer_by_email", email="alice.w@example.com")["id"] == 4
+    assert "error" in call("find_customer_by_email", email="alice.w@techcorp.com")
+    assert 4 in [c["id"] for c in call("list_customers", status="disabled", limit=100)]
+    assert 4 not in [c["id"] for c in call("list_customers", status="active", limit=100)]
+
+
+def test_catch_up_applies_external_writes(sample_db, replica):
+    conn = sqlite3.connect(sample_db)
+    conn.execute("UPDATE customers SET name = 'Robert Johnson' WHERE id = 3")
+    conn.execute("INSERT INTO customers (name, email) VALUES ('New Customer', 'new@example.com')")
+    conn.commit()
+
+    result = replica.catch_up()
+    assert not result["reloaded"]
+    assert call("get_customer", customer_id=3)["name"] == "Robert Johnson"
+    assert call("find_customer_by_email", email="new@example.com")["name"] == "New Customer"
+
+    conn.execute("DELETE FROM customers WHERE id = 7")
+    conn.commit()
+    conn.close()
+
+    assert replica.catch_up()["reloaded"]
+    assert "error" in call("get_customer", customer_id=7)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Fake Chat Model Tests
+Runs the router -> specialist -> MCP pipeline offline on scripted tool calls,
+and checks transcript record/replay and the latency specs.
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import a2a_agents
+import fake_llm
+import mcp_server
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = fake_llm.FakeChatModel()
+    monkeypatch.setattr(a2a_agents, "_llm", model)
+    return model
+
+
+def run(agent_type, query):
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            a2a_agents.mcp_session = session
+            try:
+                return await a2a_agents.run_agent(agent_type, query)
+            finally:
+                a2a_agents.mcp_session = None
+    return asyncio.run(scenario())
+
+
+def test_router_pipeline_runs_offline(sample_db, fake_model):
+    result = run("router", "Get customer information for ID 5")
+    assert result["success"]
+    assert "Result from data" in result["result"]
+    assert '"id": 5' in result["result"]
+
+    escalation = run("router", "Customer ID 7 - I've been charged twice, need refund immediately!")
+    assert "Ticket created successfully" in escalation["result"]
+    with sqlite3.connect(sample_db) as conn:
+        priority, = conn.execute("SELECT priority FROM tickets ORDER BY id DESC LIMIT 1").fetchone()
+    assert priority == "high"
+
+
+def test_scripted_plans_follow_the_scenarios():
+    router = {"delegate_to_specialist"}
+    support = {"create_ticket", "get_customer_history", "list_tickets", "get_ticket_stats"}
+    coordinated = fake_llm.scripted_plan("I'm customer ID 3 and need help upgrading my account", router)
+    assert [args["agent_name"] for _, args in coordinated] == ["data", "support"]
+    assert fake_llm.scripted_plan("I'm customer ID 3 and need help upgrading my account", support) == [
+        ("create_ticket", {"customer_id": 3, "issue": "I'm customer ID 3 and need help upgrading my account",
+                           "priority": "medium"})
+    ]
+    assert fake_llm.scripted_plan("Get ticket history for customer ID 1", support) == [
+        ("get_customer_history", {"customer_id": 1})
+    ]
+    assert fake_llm.scripted_plan("List all active customers", {"list_customers", "get_customer"}) == [
+        ("list_customers", {"status": "active"})
+    ]
+
+
+def test_recorded_transcripts_replay(tmp_path):
+    path = str(tmp_path / "transcripts.jsonl")
+    messages = [SystemMessage(content="You are the Support Agent."),
+                HumanMessage(content="Open a ticket for customer 2")]
+    tools = a2a_agents.get_agent_tools("support")
+
+    # Record the scripted model's answer, then replay it with different content
+    recorder = fake_llm.TranscriptRecorder(path)
+    fake_llm.FakeChatModel(callbacks=[recorder]).bind_tools(tools).invoke(messages)
+    with open(path) as f:
+        [entry] = [json.loads(line) for line in f]
+    assert entry["turn"] == 0
+    assert entry["tool_calls"][0]["name"] == "create_ticket"
+
+    entry["tool_calls"] = [{"name": "get_customer_history", "args": {"customer_id": 2}}]
+    with open(path, "w") as f:
+        f.write(json.dumps(entry) + "\n")
+    replayed = fake_llm.FakeChatModel(transcripts=fake_llm.load_transcripts([path])).bind_tools(tools)
+    assert replayed.invoke(messages).tool_calls[0]["name"] == "get_customer_history"
+    other_prompt = [SystemMessage(content="Another agent"), messages[1]]
+    assert replayed.invoke(other_prompt).tool_calls[0]["name"] == "create_ticket"
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert fake_llm.parse_latency("")(rng) == 0.0
+    assert fake_llm.parse_latency("0.25")(rng) == 0.25
+    assert 0.2 <= fake_llm.parse_latency("uniform:0.2,0.8")(rng) <= 0.8
+    assert fake_llm.parse_latency("lognormal:0.4,0.5")(rng) > 0
+    with pytest.raises(ValueError):
+        fake_llm.parse_latency("gamma:1,2")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Metrics Tests
+Checks the Prometheus text rendering, that per-thread cells add up, and that
+the agents and the MCP server expose tool, SQL, HTTP and LLM metrics at
+/metrics.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+from starlette.testclient import TestClient
+
+import a2a_agents
+import mcp_server
+from metrics import CONTENT_TYPE, REGISTRY, Registry
+
+
+def sample(text: str, series: str) -> float:
+    """Value of one series (name plus labels exactly as rendered), 0 if absent."""
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_render_counter_gauge_histogram():
+    registry = Registry()
+    tokens = registry.counter("tokens_total", "Tokens.", ("agent",))
+    in_flight = registry.gauge("in_flight", "Requests in flight.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    registry.gauge_func("cache_rows", "Rows.", lambda: 3)
+    registry.gauge_func("absent_cache_rows", "Rows of a cache that is off.", lambda: None)
+
+    tokens.labels("data").inc(5)
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    for value in (0.05, 0.5, 2.0):
+        latency.observe(value)
+    text = registry.render()
+
+    assert "# TYPE tokens_total counter" in text
+    assert sample(text, 'tokens_total{agent="data"}') == 5
+    assert sample(text, "in_flight") == 1
+    assert sample(text, 'latency_seconds_bucket{le="0.1"}') == 1
+    assert sample(text, 'latency_seconds_bucket{le="1"}') == 2
+    assert sample(text, 'latency_seconds_bucket{le="+Inf"}') == 3
+    assert sample(text, "latency_seconds_sum") == pytest.approx(2.55)
+    assert sample(text, "latency_seconds_count") == 3
+    assert sample(text, "cache_rows") == 3
+    assert "absent_cache_rows" not in text
+
+    with pytest.raises(ValueError):
+        tokens.labels("data", "extra")
+
+
+def test_threads_sum_their_own_cells():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.").labels()
+
+    def work():
+        for _ in range(1000):
+            requests.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert requests.value() == 4000
+
+
+def test_mcp_tool_and_sql_metrics(sample_db):
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            await session.call_tool("get_customer_history", {"customer_id": 1})
+            await session.call_tool("get_customer", {"customer_id": 999})
+
+    before = REGISTRY.render()
+    asyncio.run(scenario())
+    client = TestClient(mcp_server.mcp.sse_app())
+    response = client.get("/metrics")
+    after = response.text
+
+    def delta(series):
+        return sample(after, series) - sample(before, series)
+
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert delta('mcp_request_duration_seconds_count{method="tool",name="get_customer_history"}') == 1
+    assert delta('sqlite_query_duration_seconds_count{tool="get_customer_history"}') >= 1
+    assert delta('mcp_request_errors_total{method="tool",name="get_customer"}') == 1
+    assert delta('mcp_request_errors_total{method="tool",name="get_customer_history"}') == 0
+    assert sample(after, 'mcp_requests_in_flight{method="tool"}') == 0
+
+
+def test_agent_http_and_llm_metrics(monkeypatch):
+    monkeypatch.setattr(a2a_agents, "MONOLITH", True)  # No registry health checks
+    client = TestClient(a2a_agents.create_app("data"))
+    before = client.get("/metrics").text
+
+    handler = a2a_agents.LLMCallHandler("data")
+    usage = {"input_tokens": 120, "output_tokens": 30, "cache_read_input_tokens": 100}
+    asyncio.run(handler.on_chat_model_start({}, [[]], run_id="run-1"))
+    asyncio.run(handler.on_llm_end(SimpleNamespace(llm_output={"usage": usage}), run_id="run-1"))
+    client.get("/a2a/data")
+    after = client.get("/metrics").text
+
+    def delta(series):
+        return sample(after, series) - sample(before, series)
+
+    assert delta('llm_tokens_total{agent="data",kind="input"}') == 120
+    assert delta('llm_tokens_total{agent="data",kind="output"}') == 30
+    assert delta('llm_tokens_total{agent="data",kind="cached"}') == 100
+    assert delta('llm_request_duration_seconds_count{agent="data"}') == 1
+    # Labelled by route template, not by the requested path
+    assert delta('http_request_duration_seconds_count{service="data-agent",method="GET",'
+                 'endpoint="/a2a/{assistant_id}",status="200"}') == 1
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Monolith Mode Tests
+Checks the in-process paths of a co-located deployment: MCP tool calls over
+the in-memory transport and router delegation as a direct coroutine call.
+"""
+
+import asyncio
+import json
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import a2a_agents
+import mcp_server
+from conftest import EchoAgent
+
+
+def test_mcp_tools_use_in_memory_session(sample_db, monkeypatch):
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            monkeypatch.setattr(a2a_agents, "mcp_session", session)
+            customer = await a2a_agents.get_customer.ainvoke({"customer_id": 1})
+            missing = await a2a_agents.call_mcp_tool("get_customer", {"customer_id": 999})
+        return json.loads(customer), missing
+
+    customer, missing = asyncio.run(scenario())
+    assert customer["id"] == 1
+    assert missing.startswith("Tool Error:")
+
+
+def test_delegation_is_a_direct_call(sample_db):
+    support = EchoAgent()
+    a2a_agents.agents["support"] = support
+
+    result = asyncio.run(a2a_agents.delegate_to_specialist.ainvoke(
+        {"agent_name": "support", "task_description": "Open a ticket for customer 2"}
+    ))
+    assert result == "Result from support: handled: Open a ticket for customer 2"
+    assert support.queries == ["Open a ticket for customer 2"]
+
+    missing = asyncio.run(a2a_agents.delegate_to_specialist.ainvoke(
+        {"agent_name": "billing", "task_description": "Refund"}
+    ))
+    assert missing.startswith("Error:")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Profiling Tests
+Checks the admin-gated profiling of MCP tool calls and agent /execute
+requests, and slow-query capture with query plans.
+"""
+
+import asyncio
+import marshal
+from collections import deque
+
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+from starlette.testclient import TestClient
+
+import a2a_agents
+import mcp_server
+import profiling
+from conftest import EchoAgent
+
+ADMIN = {"Authorization": "Bearer secret"}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+
+
+def call_tools(*calls):
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            for name, arguments in calls:
+                await session.call_tool(name, arguments)
+    asyncio.run(scenario())
+
+
+def test_admin_endpoints_need_the_token(monkeypatch):
+    client = TestClient(mcp_server.mcp.sse_app())
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", None)
+    assert client.get("/admin/slow-queries", headers=ADMIN).status_code == 403
+
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/slow-queries").status_code == 403
+    assert client.get("/admin/slow-queries", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/admin/slow-queries", headers=ADMIN).status_code == 200
+
+
+def test_profile_next_tool_call(sample_db, admin_token, monkeypatch):
+    monkeypatch.setattr(mcp_server.profiler, "profiles", deque(maxlen=5))
+    client = TestClient(mcp_server.mcp.sse_app())
+    armed = client.post("/admin/profile", json={"count": 1, "target": "get_customer_history"}, headers=ADMIN)
+    assert armed.json() == {"remaining": 1, "target": "get_customer_history"}
+
+    call_tools(("get_customer", {"customer_id": 1}),
+               ("get_customer_history", {"customer_id": 1}),
+               ("get_customer_history", {"customer_id": 2}))
+
+    listing = client.get("/admin/profiles", headers=ADMIN).json()
+    assert listing["remaining"] == 0
+    [profile] = listing["profiles"]
+    assert profile["label"] == "get_customer_history"
+
+    download = client.get(f"/admin/profiles/{profile['id']}", headers=ADMIN)
+    stats = marshal.loads(download.content)
+    assert any(function == "get_customer_history" for _, _, function in stats)
+    text = client.get(f"/admin/profiles/{profile['id']}?format=text", headers=ADMIN).text
+    assert "function calls" in text
+    assert client.get("/admin/profiles/999", headers=ADMIN).status_code == 404
+
+
+def test_slow_queries_keep_parameters_and_plan(sample_db, admin_token, monkeypatch):
+    # Capture every statement, newest three only
+    monkeypatch.setattr(profiling.slow_queries, "threshold_seconds", 0)
+    monkeypatch.setattr(profiling.slow_queries, "entries", deque(maxlen=3))
+
+    call_tools(("get_customer_history", {"customer_id": 1}))
+    queries = TestClient(mcp_server.mcp.sse_app()).get("/admin/slow-queries", headers=ADMIN).json()["queries"]
+    assert 0 < len(queries) <= 3
+    ticket_query = next(q for q in queries if "FROM tickets" in q["statement"])
+    assert ticket_query["parameters"] == "(1,)"
+    assert any("tickets" in step for step in ticket_query["plan"])
+
+
+def test_profile_next_execute_request(admin_token, monkeypatch):
+    monkeypatch.setattr(a2a_agents, "MONOLITH", True)
+    monkeypatch.setattr(a2a_agents, "agents", {"data": EchoAgent()})
+    client = TestClient(a2a_agents.create_app("data"))
+    client.post("/admin/profile", json={"count": 1}, headers=ADMIN)
+
+    client.post("/execute", json={"query": "Look up customer 1"})
+    client.post("/execute", json={"query": "Look up customer 2"})
+
+    [profile] = client.get("/admin/profiles", headers=ADMIN).json()["profiles"]
+    assert profile["label"] == "POST /execute"
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Query Plan Tests for the MCP Server
+Runs the MCP tools against a fresh sample database and checks, via
+EXPLAIN QUERY PLAN, that their SQL is answered from indexes.
+"""
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import mcp_server
+from archival import archive_path_for, attach_archive
+from conftest import query_plan
+
+
+@pytest.fixture
+def traced_sql(sample_db, monkeypatch):
+    """Record every data statement the MCP tools send to SQLite."""
+    statements = []
+
+    def traced_connection(customer_id=None, shard=None):
+        conn = sqlite3.connect(sample_db, uri=True)
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(mcp_server, "get_db_connection", traced_connection)
+    return statements
+
+
+def assert_indexed(db_path: str, statements: list):
+    """Fail if any recorded SELECT falls back to a full table scan."""
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert selects, "no SELECT statements were recorded"
+    for sql in selects:
+        plan = query_plan(db_path, sql)
+        scans = [step for step in plan if step.startswith("SCAN")]
+        assert not scans, f"full scan in {sql!r}: {plan}"
+
+
+def test_find_customer_by_email(sample_db, traced_sql):
+    customer = json.loads(mcp_server.find_customer_by_email("jane.smith@example.com"))
+    assert customer["name"] == "Jane Smith"
+
+    missing = json.loads(mcp_server.find_customer_by_email("nobody@example.com"))
+    assert "error" in missing
+
+    assert_indexed(sample_db, traced_sql)
+
+
+@pytest.mark.parametrize("phone", ["+1-555-0104", "1 555 0104", "(1) 555.0104", "15550104"])
+def test_find_customer_by_phone_ignores_formatting(sample_db, traced_sql, phone):
+    customer = json.loads(mcp_server.find_customer_by_phone(phone))
+    assert customer["name"] == "Alice Williams"
+
+    assert_indexed(sample_db, traced_sql)
+
+
+def test_find_customers_by_name_is_case_insensitive_prefix(sample_db, traced_sql):
+    customers = json.loads(mcp_server.find_customers_by_name("JO"))
+    assert [c["name"] for c in customers] == ["John Doe"]
+
+    customers = json.loads(mcp_server.find_customers_by_name("j", limit=2))
+    assert [c["name"] for c in customers] == ["Jane Smith", "John Doe"]
+
+    assert_indexed(sample_db, traced_sql)
+
+
+def test_find_customers_by_name_sorts_from_index(sample_db, traced_sql):
+    mcp_server.find_customers_by_name("m")
+
+    for sql in traced_sql:
+        plan = query_plan(sample_db, sql)
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+# ==========================================
+# EXPLAIN QUERY PLAN regression suite
+# ==========================================
+
+# Calls exercising each MCP tool's query shapes. A tool registered in
+# mcp_server.py without an entry here fails test_every_tool_is_covered.
+TOOL_CALLS = {
+    "get_customer": [{"customer_id": 5}],
+    "list_customers": [{"status": "active"}, {}],
+    "find_customer_by_email": [{"email": "jane.smith@example.com"}],
+    "find_customer_by_phone": [{"phone": "+1-555-0104"}],
+    "find_customers_by_name": [{"name_prefix": "jo"}],
+    "update_customer": [{"customer_id": 3, "email": "bob.j@example.com"}],
+    "create_ticket": [{"customer_id": 3, "issue": "Need help upgrading"}],
+    "get_customer_history": [{"customer_id": 1}, {"customer_id": 1, "include_archive": True}],
+    "list_tickets": [{"status": "open"}, {"status": "in_progress", "priority": "high"}],
+    "get_ticket_stats": [{}, {"customer_id": 2}],
+    "get_changes": [{"since_seq": 0}, {"since_seq": 3, "limit": 5}],
+    # Bulk-loads tickets into NumPy arrays by design, on its own connection
+    "get_ticket_analytics": [],
+}
+
+# Scans that only read LIMIT rows in index order, per tool
+BOUNDED_SCANS = {
+    ("list_customers", "SCAN customers"),
+    ("get_ticket_stats", "SCAN ticket_stats USING COVERING INDEX idx_ticket_stats_total"),
+}
+
+DATA_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+
+def test_every_tool_is_covered():
+    registered = {tool.name for tool in asyncio.run(mcp_server.mcp.list_tools())}
+    assert registered == set(TOOL_CALLS)
+
+
+@pytest.mark.parametrize(
+    "tool_name, arguments",
+    [(name, args) for name, calls in TOOL_CALLS.items() for args in calls],
+)
+def test_tool_queries_use_indexes(sample_db, traced_sql, tool_name, arguments):
+    if arguments.get("include_archive"):
+        with sqlite3.connect(sample_db) as conn:
+            attach_archive(conn, archive_path_for(sample_db))
+    result = getattr(mcp_server, tool_name)(**arguments)
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+
+    statements = [sql for sql in traced_sql if sql.lstrip().upper().startswith(DATA_STATEMENTS)]
+    assert statements, f"{tool_name} ran no queries"
+
+    for sql in statements:
+        plan = query_plan(sample_db, sql)
+        scans = [
+            step for step in plan
+            if step.startswith("SCAN") and (tool_name, step) not in BOUNDED_SCANS
+        ]
+        sorts = [step for step in plan if "TEMP B-TREE" in step]
+        assert not scans, f"{tool_name} scans in {sql!r}: {plan}"
+        assert not sorts, f"{tool_name} sorts in {sql!r}: {plan}"
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Resource Tests
+Reads the customer resources over an in-memory MCP session and checks that
+conditional reads return "not modified" until the data actually changes.
+"""
+
+import asyncio
+import json
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import mcp_server
+from conftest import query_plan
+
+
+def read_all(*steps):
+    """Run steps in one client session and return the parsed reads.
+
+    A step is a URI, or a callable given the reads so far that returns a URI
+    to read or performs a write.
+    """
+    async def scenario():
+        results = []
+        async with create_connected_server_and_client_session(mcp_server.mcp) as client:
+            for step in steps:
+                if callable(step):
+                    step = step(results)
+                if isinstance(step, str) and step.startswith("customer://"):
+                    result = await client.read_resource(step)
+                    results.append(json.loads(result.contents[0].text))
+        return results
+    return asyncio.run(scenario())
+
+
+def test_customer_resource_conditional_read(sample_db):
+    first, unchanged, changed = read_all(
+        "customer://3",
+        lambda r: f"customer://3/if-none-match/{r[0]['etag']}",
+        lambda r: mcp_server.update_customer(3, email="bob.j@example.com"),
+        lambda r: f"customer://3/if-none-match/{r[0]['etag']}",
+    )
+    assert first["customer"]["name"] == "Bob Johnson"
+    assert unchanged == {"not_modified": True, "etag": first["etag"]}
+    assert changed["customer"]["email"] == "bob.j@example.com"
+    assert changed["etag"] != first["etag"]
+
+
+def test_tickets_resource_conditional_read(sample_db):
+    first, unchanged, changed = read_all(
+        "customer://1/tickets",
+        lambda r: f"customer://1/tickets/if-none-match/{r[0]['etag']}",
+        lambda r: mcp_server.create_ticket(1, "Another issue"),
+        lambda r: f"customer://1/tickets/if-none-match/{r[0]['etag']}",
+    )
+    assert {t["customer_id"] for t in first["tickets"]} == {1}
+    assert unchanged["not_modified"]
+    assert len(changed["tickets"]) == len(first["tickets"]) + 1
+    assert changed["etag"] != first["etag"]
+
+
+def test_missing_customer_resource(sample_db):
+    [missing] = read_all("customer://999")
+    assert "error" in missing
+
+
+def test_etag_queries_use_indexes(sample_db):
+    conn = mcp_server.get_db_connection(3)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    mcp_server._customer_etag(conn, 3)
+    mcp_server._tickets_etag(conn, 3)
+    conn.close()
+
+    for sql in statements:
+        plan = query_plan(sample_db, sql)
+        assert not [step for step in plan if step.startswith("SCAN")], (sql, plan)
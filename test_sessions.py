@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Session Tests
+Checks that a session_id continues the conversation of the router and of the
+specialists it delegates to, and the compaction steps that keep a session's
+prompt within the token budget.
+"""
+
+import asyncio
+import json
+import sqlite3
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import a2a_agents
+import fake_llm
+import mcp_server
+import sessions
+
+
+@pytest.fixture
+def session_store(sample_db, monkeypatch):
+    """Offline monolith agents keeping sessions in memory."""
+    monkeypatch.setattr(a2a_agents, "_llm", fake_llm.FakeChatModel())
+    monkeypatch.setattr(a2a_agents, "session_agents", {})
+    monkeypatch.setattr(a2a_agents, "_agent_builds", {})
+    monkeypatch.setattr(mcp_server, "CUSTOMER_REPLICA", False)
+    monkeypatch.setattr(sessions, "SESSIONS_DB_PATH", ":memory:")
+    monkeypatch.setattr(sessions, "_checkpointer", None)
+
+
+def run_session(queries, session_id="s1"):
+    """Run queries through the router in one session; returns the results and the threads' messages."""
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            a2a_agents.mcp_session = session
+            try:
+                results = [await a2a_agents.run_agent("router", query, session_id) for query in queries]
+                threads = {}
+                for agent_type in ("router", "data"):
+                    graph = await a2a_agents.get_agent(agent_type, with_sessions=True)
+                    state = await graph.aget_state(sessions.thread_config(agent_type, session_id))
+                    threads[agent_type] = state.values.get("messages", [])
+                return results, threads
+            finally:
+                a2a_agents.mcp_session = None
+    return asyncio.run(scenario())
+
+
+def tool_turn(question, result, answer):
+    call = {"name": "get_customer", "args": {"customer_id": 1}, "id": f"call_{len(question)}"}
+    return [HumanMessage(content=question), AIMessage(content="", tool_calls=[call]),
+            ToolMessage(content=result, tool_call_id=call["id"]), AIMessage(content=answer)]
+
+
+def test_session_continues_conversation(session_store):
+    results, threads = run_session(["Get customer information for ID 5",
+                                    "Get customer information for ID 6"])
+    assert all(r["success"] and r["session_id"] == "s1" for r in results)
+    assert '"id": 6' in results[1]["result"]
+
+    router = threads["router"]
+    assert isinstance(router[0], SystemMessage)
+    assert sum(isinstance(m, SystemMessage) for m in router) == 1
+    assert [m.content for m in router if isinstance(m, HumanMessage)] == [
+        "Get customer information for ID 5", "Get customer information for ID 6"]
+    # The specialist keeps its own thread of the session, not the router's messages
+    data_tools = [m.name for m in threads["data"] if isinstance(m, ToolMessage)]
+    assert data_tools == ["get_customer", "get_customer"]
+
+    _, other = run_session(["Get customer information for ID 7"], session_id="s2")
+    assert len([m for m in other["router"] if isinstance(m, HumanMessage)]) == 1
+
+
+def test_session_history_is_compacted_to_budget(session_store, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_TOKEN_BUDGET", 400)
+    before = sessions.SESSION_COMPACTIONS.labels("drop").value()
+    _, threads = run_session([f"Get customer information for ID {i}" for i in range(1, 6)])
+
+    router = threads["router"]
+    assert sessions.SESSION_COMPACTIONS.labels("drop").value() > before
+    assert sessions.EARLIER_TURNS_HEADER in router[0].content
+    # The oldest turns live on as notes (or a count) in the system prompt
+    assert "Q: Get customer information for ID" in router[0].content
+    assert '"id": 5' in router[-1].content
+
+
+def test_compaction_steps():
+    big = json.dumps({"customer": {"id": 1, "notes": "x" * 2000}}, indent=4)
+    messages = [SystemMessage(content="You are the Data Agent."),
+                *tool_turn("first question", big, "first answer"),
+                *tool_turn("second question", big, "second answer")]
+
+    assert sessions.compact(messages, budget=10_000) == (messages, None)
+
+    # Whitespace of earlier tool results only; the current turn is untouched
+    minified, step = sessions.compact(messages, budget=count_tokens_approximately(messages) - 5)
+    assert step == "minify"
+    assert json.loads(minified[3].content) == json.loads(big)
+    assert minified[7].content == big
+
+    shortened, step = sessions.compact(messages, budget=1000)
+    assert step == "shorten"
+    assert "[compacted," in shortened[3].content
+    assert len(shortened) == len(messages)
+
+    dropped, step = sessions.compact(messages, budget=700)
+    assert step == "drop"
+    assert [type(m) for m in dropped] == [SystemMessage, HumanMessage, AIMessage, ToolMessage, AIMessage]
+    assert "Q: first question A: first answer" in dropped[0].content
+    assert dropped[1:] == messages[5:]
+
+
+def test_sqlite_checkpointer_persists_sessions(session_store, monkeypatch, tmp_path):
+    monkeypatch.setattr(sessions, "SESSIONS_DB_PATH", str(tmp_path / "sessions.db"))
+
+    async def scenario():
+        try:
+            for customer_id in (2, 3):
+                await a2a_agents.run_agent("data", f"Get customer information for ID {customer_id}", "persisted")
+        finally:
+            await sessions.close_checkpointer()
+        reopened = a2a_agents.build_agent_graph("data", await sessions.get_checkpointer())
+        try:
+            return (await reopened.aget_state(sessions.thread_config("data", "persisted"))).values
+        finally:
+            await sessions.close_checkpointer()
+
+    async def with_mcp():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            a2a_agents.mcp_session = session
+            try:
+                return await scenario()
+            finally:
+                a2a_agents.mcp_session = None
+
+    values = asyncio.run(with_mcp())
+    assert [m.content for m in values["messages"] if isinstance(m, HumanMessage)] == [
+        "Get customer information for ID 2", "Get customer information for ID 3"]
+
+    # Only the latest checkpoint of the thread survives its runs' steps
+    with sqlite3.connect(tmp_path / "sessions.db") as conn:
+        kept = conn.execute("SELECT thread_id, checkpoint_ns, COUNT(*) FROM checkpoints "
+                            "GROUP BY thread_id, checkpoint_ns").fetchall()
+        orphaned = conn.execute("SELECT COUNT(*) FROM writes WHERE checkpoint_id NOT IN "
+                                "(SELECT checkpoint_id FROM checkpoints)").fetchone()[0]
+    assert kept == [("data:persisted", "", 1)]
+    assert orphaned == 0
+
+
+def test_long_session_stays_within_budget():
+    result = json.dumps({"customer": {"id": 1, "notes": "y" * 400}})
+    messages = [SystemMessage(content="You are the Data Agent.")]
+    for turn in range(200):
+        messages, _ = sessions.compact(messages + tool_turn(f"question {turn} " * 20, result, "answer " * 40),
+                                       budget=1000)
+        assert count_tokens_approximately(messages) <= 1000
+
+    system = messages[0].content
+    assert system.startswith("You are the Data Agent.")
+    assert system.count(sessions.EARLIER_TURNS_HEADER) == 1
+    _, notes, omitted = sessions._split_notes(messages[0])
+    kept = sum(isinstance(m, HumanMessage) for m in messages[1:])
+    # Every earlier turn is either kept, noted, or counted as omitted
+    assert omitted > 0 and notes
+    assert omitted + len(notes) + kept == 200
+    assert messages[-4].content.startswith("question 199")
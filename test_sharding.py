@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Sharding Tests
+Reshards the sample database and checks that the MCP tools return the same
+answers from N shard files as from the single database.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import mcp_server
+import sharding
+from archival import TicketArchiver, archive_path_for
+from sharding import reshard, shard_paths
+
+SHARDS = 3
+
+
+def call(tool_name, **arguments):
+    return json.loads(getattr(mcp_server, tool_name)(**arguments))
+
+
+READ_CALLS = [
+    ("get_customer", {"customer_id": 7}),
+    ("list_customers", {"limit": 20}),
+    ("list_customers", {"status": "disabled"}),
+    ("find_customer_by_email", {"email": "jane.smith@example.com"}),
+    ("find_customer_by_phone", {"phone": "+1-555-0104"}),
+    ("find_customers_by_name", {"name_prefix": "j"}),
+    ("get_customer_history", {"customer_id": 1}),
+    ("list_tickets", {"status": "open", "limit": 50}),
+    ("get_ticket_stats", {}),
+    ("get_ticket_stats", {"customer_id": 2}),
+]
+
+
+def test_sharded_reads_match_single_database(sample_db, monkeypatch):
+    expected = [call(name, **args) for name, args in READ_CALLS]
+
+    result = reshard([sample_db], sample_db, SHARDS)
+    assert all(result["customers"]) and sum(result["tickets"]) == expected[8]["total"]
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", SHARDS)
+
+    for (name, args), before in zip(READ_CALLS, expected):
+        assert call(name, **args) == before, name
+
+
+def test_sharded_ticket_ids_stay_unique(sample_db, monkeypatch):
+    reshard([sample_db], sample_db, SHARDS)
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", SHARDS)
+
+    created = [
+        call("create_ticket", customer_id=customer_id, issue="Sharded ticket")["ticket_id"]
+        for customer_id in (1, 2, 3, 4, 5, 6, 1, 2)
+    ]
+    assert len(set(created)) == len(created)
+    assert all(ticket_id > 25 for ticket_id in created)
+
+    history = call("get_customer_history", customer_id=4)
+    assert created[3] in [ticket["id"] for ticket in history]
+
+    # Resharding back into one file keeps every ticket and the id sequence
+    total = call("get_ticket_stats")["total"]
+    reshard(shard_paths(sample_db, SHARDS), sample_db, 1)
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", 1)
+    assert call("get_ticket_stats")["total"] == total
+    assert call("create_ticket", customer_id=1, issue="Back to one")["ticket_id"] > max(created)
+
+
+def test_reshard_keeps_commits_still_in_the_wal(sample_db, tmp_path):
+    conn = sqlite3.connect(sample_db)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    conn.execute("INSERT INTO tickets (customer_id, issue) VALUES (1, 'Only in the WAL')")
+    conn.commit()
+    # The files as a crash would leave them: the commit is in -wal only
+    crashed = str(tmp_path / "crashed.db")
+    for suffix in ("", "-wal"):
+        shutil.copy(sample_db + suffix, crashed + suffix)
+    conn.close()
+
+    result = reshard([crashed], crashed, 1)
+    assert sum(result["tickets"]) == 26
+    assert not os.path.exists(crashed + ".resharding")
+
+
+def test_failed_reshard_restores_the_source(sample_db, monkeypatch):
+    def fail(conn):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(sharding, "rebuild_ticket_stats", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        reshard([sample_db], sample_db, SHARDS)
+
+    assert call("get_ticket_stats")["total"] == 25
+    assert not any(os.path.exists(path) for path in shard_paths(sample_db, SHARDS))
+    assert not os.path.exists(sample_db + ".resharding")
+
+
+def test_reshard_copies_rows_as_they_are(sample_db, monkeypatch):
+    with sqlite3.connect(sample_db) as conn:
+        # A resolved ticket from before resolved_at was recorded
+        legacy_id = conn.execute("SELECT MIN(id) FROM tickets WHERE status = 'resolved'").fetchone()[0]
+        conn.execute("UPDATE tickets SET resolved_at = NULL WHERE id = ?", (legacy_id,))
+        before = conn.execute("SELECT id, resolved_at FROM tickets ORDER BY id").fetchall()
+
+    reshard([sample_db], sample_db, SHARDS)
+    after = []
+    for path in shard_paths(sample_db, SHARDS):
+        with sqlite3.connect(path) as conn:
+            after += conn.execute("SELECT id, resolved_at FROM tickets").fetchall()
+            assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 0
+    assert sorted(after) == before
+
+    # The triggers are back for new writes
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", SHARDS)
+    assert call("get_ticket_stats")["total"] == 25
+    ticket_id = call("create_ticket", customer_id=2, issue="After the reshard")["ticket_id"]
+    with sqlite3.connect(shard_paths(sample_db, SHARDS)[2 % SHARDS]) as conn:
+        conn.execute("UPDATE tickets SET status = 'resolved' WHERE id = ?", (ticket_id,))
+        assert conn.execute("SELECT resolved_at FROM tickets WHERE id = ?", (ticket_id,)).fetchone()[0]
+    assert call("get_ticket_stats")["total"] == 26
+
+
+def test_archived_history_moves_with_its_customer(sample_db, monkeypatch):
+    monkeypatch.setattr(mcp_server, "ARCHIVE_DB_PATH", None)
+    with sqlite3.connect(sample_db) as conn:
+        conn.execute("UPDATE tickets SET status = 'resolved' WHERE customer_id IN (1, 2)")
+        conn.execute("UPDATE tickets SET resolved_at = datetime('now', '-120 days') WHERE customer_id IN (1, 2)")
+    archived = TicketArchiver(sample_db, older_than_days=90, pause_seconds=0).run()["archived"]
+    expected = [call("get_customer_history", customer_id=c, include_archive=True) for c in (1, 2)]
+    assert archived and all(expected)
+
+    result = reshard([sample_db], sample_db, SHARDS)
+    assert sum(result["archived"]) == archived
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", SHARDS)
+    assert [call("get_customer_history", customer_id=c, include_archive=True) for c in (1, 2)] == expected
+    # New ids stay clear of archived ones
+    assert call("create_ticket", customer_id=1, issue="After archiving")["ticket_id"] > 25
+
+    reshard(shard_paths(sample_db, SHARDS), sample_db, 1)
+    monkeypatch.setattr(mcp_server, "SHARD_COUNT", 1)
+    history = [call("get_customer_history", customer_id=c, include_archive=True) for c in (1, 2)]
+    assert history[1] == expected[1] and history[0][1:] == expected[0]
+    with sqlite3.connect(archive_path_for(sample_db)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM tickets_archive").fetchone()[0] == archived
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Startup Tests
+Checks the /health readiness endpoints used by run_system.py and that the
+agents defer their heavy imports until first use.
+"""
+
+import subprocess
+import sys
+
+from starlette.testclient import TestClient
+
+import a2a_agents
+import mcp_server
+
+
+def test_mcp_health_reports_startup_timings():
+    with TestClient(mcp_server.mcp.sse_app()) as client:
+        response = client.get("/health")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok"
+    assert body["startup"]["imports_seconds"] >= 0
+
+
+def test_agent_health_before_first_task(monkeypatch):
+    monkeypatch.setattr(a2a_agents, "agents", {})
+    monkeypatch.setattr(a2a_agents, "AGENT_WARMUP", False)
+    with TestClient(a2a_agents.create_app("support")) as client:
+        health = client.get("/health").json()
+        card = client.get("/a2a/support").json()
+    assert health["status"] == "ok" and health["agent_ready"] is False
+    assert "ready_seconds" in health["startup"]
+    assert card["agent_type"] == "support" and "create_ticket" in card["capabilities"]
+
+
+def test_agent_import_defers_heavy_modules():
+    heavy = ["langchain_anthropic", "langgraph.prebuilt", "mcp.client.sse", "mcp.client.streamable_http"]
+    code = (
+        "import sys, a2a_agents; "
+        f"print([m for m in {heavy!r} if m in sys.modules])"
+    )
+    result = subprocess.run([sys.executable, "-c", code, "data"], capture_output=True, text=True,
+                            check=True, env={"ANTHROPIC_API_KEY": "test", "PATH": ""})
+    assert result.stdout.strip().splitlines()[-1] == "[]"
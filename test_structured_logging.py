@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Structured Logging Tests
+Checks the JSON lines (request and trace IDs, extra fields, exceptions),
+per-logger levels, DEBUG sampling, dropping on a full queue, and that the
+request ID reaches the MCP server through request _meta.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import queue
+
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import a2a_agents
+import mcp_server
+import structured_logging
+import tracing
+from conftest import CollectingExporter
+
+
+@pytest.fixture
+def log_lines(monkeypatch):
+    """Configure logging into a buffer; returns a function giving the JSON lines so far."""
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    stream = io.StringIO()
+
+    def configure(**kwargs):
+        structured_logging.configure("test-service", stream=stream, **kwargs)
+
+    def lines():
+        structured_logging.shutdown()  # Flush the queue
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    lines.configure = configure
+    yield lines
+    structured_logging.shutdown()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in saved_handlers:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+    for name in ("noisy", "mcp_server"):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+
+
+def test_json_lines_carry_context_and_extra_fields(log_lines, monkeypatch):
+    monkeypatch.setattr(tracing, "_exporter", CollectingExporter())
+    monkeypatch.setattr(tracing, "TRACING", True)
+    log_lines.configure(level="INFO")
+    log = logging.getLogger("orders")
+
+    token = structured_logging.request_id.set("req-1")
+    try:
+        with tracing.start_trace("test") as span:
+            log.info("Created %s", "ticket", extra={"ticket_id": 7})
+    finally:
+        structured_logging.request_id.reset(token)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("Failed")
+
+    created, failed = log_lines()
+    assert created["msg"] == "Created ticket"
+    assert created["service"] == "test-service"
+    assert created["logger"] == "orders"
+    assert created["request_id"] == "req-1"
+    assert created["trace_id"] == span.trace_id
+    assert created["ticket_id"] == 7
+    assert failed["level"] == "ERROR"
+    assert "request_id" not in failed
+    assert "ValueError: boom" in failed["exc"]
+
+
+def test_levels_and_debug_sampling(log_lines):
+    log_lines.configure(level="DEBUG", levels="noisy=WARNING", sample_rate=0.0)
+    logging.getLogger("noisy").info("hidden by its logger level")
+    logging.getLogger("noisy").warning("shown")
+    logging.getLogger("busy").debug("sampled out")
+    logging.getLogger("busy").info("kept")
+
+    assert [line["msg"] for line in log_lines()] == ["shown", "kept"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = structured_logging.NonBlockingQueueHandler(queue.Queue(1))
+    record = logging.LogRecord("busy", logging.INFO, __file__, 1, "message", None, None)
+    dropped = structured_logging.LOG_RECORDS_DROPPED._default.value()
+
+    handler.emit(record)
+    handler.emit(record)
+    assert structured_logging.LOG_RECORDS_DROPPED._default.value() == dropped + 1
+
+
+def test_request_id_reaches_mcp_server(sample_db, log_lines, monkeypatch):
+    log_lines.configure(level="INFO", levels="mcp_server=DEBUG")
+
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            monkeypatch.setattr(a2a_agents, "mcp_session", session)
+            token = structured_logging.request_id.set("req-42")
+            try:
+                await a2a_agents.call_mcp_tool("get_customer", {"customer_id": 1})
+            finally:
+                structured_logging.request_id.reset(token)
+
+    asyncio.run(scenario())
+    [handled] = [line for line in log_lines() if line["msg"] == "Handled MCP request"]
+    assert handled["request_id"] == "req-42"
+    assert handled["target"] == "get_customer"
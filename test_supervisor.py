@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Supervisor Tests
+Runs small Python processes under the supervisor and checks restart
+policies, backoff, draining and the status report.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+import supervisor
+from supervisor import Service, Supervisor, rss_bytes
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(supervisor, "BACKOFF_INITIAL_SECONDS", 0.05)
+    monkeypatch.setattr(supervisor, "BACKOFF_MAX_SECONDS", 0.2)
+
+
+def python(code: str) -> list:
+    return [sys.executable, "-c", code]
+
+
+async def wait_until(predicate, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.02)
+
+
+def test_crashing_service_is_restarted_with_backoff():
+    async def scenario():
+        crashing = Service("crash", python("import sys; sys.exit(3)"), restart="on-failure")
+        done = Service("done", python("pass"), restart="on-failure")
+        sup = Supervisor([crashing, done])
+        await sup.start()
+        await wait_until(lambda: crashing.restarts >= 3 and done.state == "exited")
+        assert crashing.last_exit_code == 3
+        await sup.stop()
+        return crashing, done
+
+    crashing, done = asyncio.run(scenario())
+    assert crashing.backoff == 0.2  # Doubled up to the cap
+    assert done.restarts == 0 and done.poll() == 0
+
+
+def test_never_policy_gives_up():
+    async def scenario():
+        service = Service("once", python("import sys; sys.exit(1)"), restart="never")
+        sup = Supervisor([service])
+        await sup.start()
+        await wait_until(lambda: service.poll() is not None)
+        await sup.stop()
+        return service
+
+    service = asyncio.run(scenario())
+    assert service.restarts == 0 and service.last_exit_code == 1
+
+
+def test_restart_drains_and_status_reports_processes():
+    sleeper = python("import signal, sys, time; "
+                     "signal.signal(signal.SIGTERM, lambda *a: sys.exit(0)); time.sleep(60)")
+
+    async def scenario():
+        service = Service("sleeper", sleeper, restart="on-failure", drain_timeout=5)
+        sup = Supervisor([service])
+        await sup.start()
+        first_pid = service.process.pid
+        await asyncio.sleep(0.3)  # Let it install its handler
+        await sup.restart("sleeper")
+        await wait_until(lambda: service.state == "running" and service.process.pid != first_pid)
+        status = sup.status()["services"]["sleeper"]
+        await sup.stop()
+        return service, status
+
+    service, status = asyncio.run(scenario())
+    assert status["restarts"] == 1 and status["last_exit_code"] == 0
+    assert status["pid"] and status["uptime_seconds"] >= 0
+    assert service.state == "stopped"
+
+
+def test_stuck_process_is_killed_after_drain_timeout():
+    stubborn = python("import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(60)")
+
+    async def scenario():
+        service = Service("stubborn", stubborn, drain_timeout=0.3)
+        sup = Supervisor([service])
+        await sup.start()
+        await asyncio.sleep(0.3)  # Let it install its handler
+        await sup.stop()
+        return service
+
+    assert asyncio.run(scenario()).last_exit_code == -9
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc")
+def test_rss_bytes():
+    assert rss_bytes(os.getpid()) > 1_000_000
+    assert rss_bytes(2 ** 22 + 12345) is None
+
+
+def test_service_that_cannot_start_fails_instead_of_hanging():
+    missing = ["/nonexistent/agent-binary"]
+
+    async def scenario():
+        once = Service("once", missing, restart="never")
+        retried = Service("retried", missing, restart="on-failure")
+        sup = Supervisor([once, retried])
+        await asyncio.wait_for(sup.start(), timeout=5)
+        await wait_until(lambda: retried.restarts >= 2)
+        states = once.state, retried.state
+        await sup.stop()
+        return once, retried, states
+
+    once, retried, (once_state, retried_state) = asyncio.run(scenario())
+    assert once_state == "failed" and once.poll() == supervisor.SPAWN_FAILED_EXIT_CODE
+    assert retried_state in ("backoff", "pending")
+    assert retried.last_exit_code == supervisor.SPAWN_FAILED_EXIT_CODE
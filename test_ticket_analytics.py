@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Ticket Analytics Tests
+Checks the NumPy engine against the tickets table through a full load,
+incremental refreshes after inserts and resolutions, and a delete (which
+forces a full reload), plus the get_ticket_analytics tool.
+"""
+
+import json
+import sqlite3
+
+import mcp_server
+from ticket_analytics import ID, STATUS, RESOLVED, TicketAnalytics
+
+
+def table_rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT id, status FROM tickets ORDER BY id").fetchall()
+
+
+def engine_rows(engine):
+    return [(int(row[ID]), ("open", "in_progress", "resolved")[row[STATUS]]) for row in engine.data]
+
+
+def test_full_and_incremental_refresh(sample_db):
+    engine = TicketAnalytics(sample_db, chunk_size=7)
+    assert engine.refresh() == {"new_rows": 25, "changed_rows": 0, "full_reload": False}
+    assert engine_rows(engine) == table_rows(sample_db)
+
+    with sqlite3.connect(sample_db) as conn:
+        conn.execute("INSERT INTO tickets (customer_id, issue, priority) VALUES (3, 'New one', 'high')")
+        open_id = conn.execute("SELECT MIN(id) FROM tickets WHERE status = 'open'").fetchone()[0]
+        conn.execute("UPDATE tickets SET status = 'resolved' WHERE id = ?", (open_id,))
+
+    refreshed = engine.refresh()
+    assert refreshed["new_rows"] == 1 and refreshed["changed_rows"] >= 1
+    assert not refreshed["full_reload"]
+    assert engine_rows(engine) == table_rows(sample_db)
+    assert engine.data[engine.data[:, ID] == open_id][0, STATUS] == RESOLVED
+
+    assert engine.refresh(full=True)["full_reload"]
+    assert engine_rows(engine) == table_rows(sample_db)
+
+
+def test_delete_forces_a_full_reload(sample_db):
+    engine = TicketAnalytics(sample_db)
+    engine.refresh()
+    with sqlite3.connect(sample_db) as conn:
+        conn.execute("DELETE FROM tickets WHERE id IN (2, 3)")
+        # A new ticket in the same refresh must not hide the deletes
+        conn.execute("INSERT INTO tickets (customer_id, issue) VALUES (1, 'After the delete')")
+
+    assert engine.refresh()["full_reload"]
+    assert engine_rows(engine) == table_rows(sample_db)
+    refreshed = engine.refresh()
+    assert refreshed["new_rows"] == 0 and not refreshed["full_reload"]
+
+
+def test_incremental_refresh_does_not_scan_the_table(sample_db, monkeypatch):
+    engine = TicketAnalytics(sample_db)
+    engine.refresh()
+    statements = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", traced_connect)
+    assert not engine.refresh()["full_reload"]
+    monkeypatch.setattr(sqlite3, "connect", connect)
+
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    with connect(sample_db) as conn:
+        for sql in selects:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+            assert not [step for step in plan if step.startswith("SCAN")], (sql, plan)
+
+
+def test_get_ticket_analytics_tool(sample_db, monkeypatch):
+    monkeypatch.setattr(mcp_server, "_analytics", [])
+    report = json.loads(mcp_server.get_ticket_analytics(window_hours=24, rolling_hours=3))
+    rows = table_rows(sample_db)
+    assert report["tickets_loaded"] == len(rows)
+    assert report["backlog_aging"]["open_tickets"] == sum(status != "resolved" for _, status in rows)
+    assert len(report["arrival_rate"]["per_hour"]) == 24
+    assert set(report["time_to_resolution_hours"]) == {"low", "medium", "high"}
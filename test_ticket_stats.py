@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Ticket Statistics Tests
+Checks that the trigger-maintained ticket_stats table always agrees with a
+full GROUP BY over tickets, and that get_ticket_stats reports it.
+"""
+
+import json
+import random
+
+import pytest
+
+import mcp_server
+from database_setup import DatabaseSetup
+from migrations import rebuild_ticket_stats
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Create a sample database and point the MCP server at it."""
+    db_path = str(tmp_path / "support.db")
+    setup = DatabaseSetup(db_path)
+    setup.connect()
+    setup.create_tables()
+    setup.create_triggers()
+    setup.migrate()
+    setup.insert_sample_data()
+
+    monkeypatch.setattr(mcp_server, "DB_PATH", db_path)
+    yield setup
+    setup.close()
+
+
+def snapshot(conn):
+    return conn.execute("SELECT * FROM ticket_stats ORDER BY customer_id").fetchall()
+
+
+def test_triggers_match_full_recompute(db):
+    conn = db.conn
+    rng = random.Random(7)
+
+    for _ in range(200):
+        action = rng.choice(["insert", "update", "move", "delete"])
+        ticket = conn.execute("SELECT id FROM tickets ORDER BY random() LIMIT 1").fetchone()
+        if action == "insert" or ticket is None:
+            conn.execute(
+                "INSERT INTO tickets (customer_id, issue, status, priority) VALUES (?, 'x', ?, ?)",
+                (rng.randint(1, 15), rng.choice(["open", "in_progress", "resolved"]),
+                 rng.choice(["low", "medium", "high"])),
+            )
+        elif action == "update":
+            conn.execute(
+                "UPDATE tickets SET status = ?, priority = ? WHERE id = ?",
+                (rng.choice(["open", "in_progress", "resolved"]),
+                 rng.choice(["low", "medium", "high"]), ticket[0]),
+            )
+        elif action == "move":
+            conn.execute("UPDATE tickets SET customer_id = ? WHERE id = ?", (rng.randint(1, 15), ticket[0]))
+        else:
+            conn.execute("DELETE FROM tickets WHERE id = ?", (ticket[0],))
+    conn.commit()
+
+    incremental = [row for row in snapshot(conn) if row[1] > 0 or row[0] == 0]
+    rebuild_ticket_stats(conn)
+    assert incremental == snapshot(conn)
+
+
+def test_get_ticket_stats_tool(db):
+    mcp_server.create_ticket(2, "Another billing question", "high")
+
+    overall = json.loads(mcp_server.get_ticket_stats())
+    assert overall["total"] == 26
+    assert overall["by_priority"]["high"] == 6
+    assert overall["top_customers"][0] == {"customer_id": 2, "total": 4}
+
+    customer = json.loads(mcp_server.get_ticket_stats(customer_id=2))
+    assert customer["total"] == 4
+    assert customer["by_status"] == {"open": 2, "in_progress": 0, "resolved": 2}
+
+    unknown = json.loads(mcp_server.get_ticket_stats(customer_id=999))
+    assert unknown["total"] == 0
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tracing Tests
+Checks that one request yields a connected span tree across the agent, the
+MCP server (via request _meta) and SQLite, and that A2A headers carry the
+trace context.
+"""
+
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+from mcp.shared.memory import create_connected_server_and_client_session
+from starlette.testclient import TestClient
+
+import a2a_agents
+import mcp_server
+import tracing
+from conftest import CollectingExporter, EchoAgent
+from sharding import ShardMap
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    exporter = CollectingExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    monkeypatch.setattr(tracing, "TRACING", True)
+    return exporter.spans
+
+
+def test_tool_call_spans_reach_sqlite(sample_db, spans, monkeypatch):
+    async def scenario():
+        async with create_connected_server_and_client_session(mcp_server.mcp) as session:
+            monkeypatch.setattr(a2a_agents, "mcp_session", session)
+            with tracing.start_trace("POST /execute") as root:
+                await a2a_agents.call_mcp_tool("get_customer_history", {"customer_id": 1})
+            return root
+
+    root = asyncio.run(scenario())
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span.name, []).append(span)
+    assert {span.trace_id for span in spans} == {root.trace_id}
+
+    [call] = by_name["mcp.call_tool"]
+    [tool] = by_name["mcp.tool get_customer_history"]
+    assert call.parent_id == root.span_id
+    assert tool.parent_id == call.span_id  # Continued from the request _meta
+    assert by_name["sqlite.execute"]
+    assert all(s.parent_id == tool.span_id for s in by_name["sqlite.execute"])
+    assert all(s.end_ns >= s.start_ns for s in spans)
+
+
+def test_untraced_requests_record_nothing(sample_db, spans):
+    mcp_server.get_customer(1)
+    assert spans == []
+
+
+def test_execute_continues_caller_trace(spans, monkeypatch):
+    monkeypatch.setattr(a2a_agents, "agents", {"support": EchoAgent()})
+    monkeypatch.setattr(a2a_agents, "MONOLITH", False)
+    caller = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+    with TestClient(a2a_agents.create_app("support")) as client:
+        response = client.post("/execute", json={"query": "hello"}, headers={"traceparent": caller})
+    assert response.json()["success"]
+
+    [execute] = [s for s in spans if s.name == "POST /execute"]
+    assert (execute.trace_id, execute.parent_id) == ("a" * 32, "b" * 16)
+    [run] = [s for s in spans if s.name == "agent.run"]
+    assert run.parent_id == execute.span_id
+
+
+def test_context_follows_shard_threads(spans, tmp_path):
+    shards = ShardMap(str(tmp_path / "support.db"), 3)
+    with tracing.start_trace("scatter") as root:
+        seen = shards.map(lambda shard: tracing.current_span())
+    assert seen == [root, root, root]
+
+
+def test_jsonl_export_and_waterfall(trace_file, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING", True)
+    with tracing.start_trace("POST /execute"):
+        assert tracing.inject()["traceparent"].startswith("00-")
+        with tracing.span("sqlite.execute", statement="SELECT 1"):
+            pass
+    tracing._exporter.flush()
+
+    lines = [json.loads(line) for line in open(trace_file)]
+    assert [line["name"] for line in lines] == ["sqlite.execute", "POST /execute"]
+    waterfall = tracing.format_waterfall(tracing.load_trace(trace_file))
+    assert "POST /execute" in waterfall and "  sqlite.execute" in waterfall and "SELECT 1" in waterfall
+    assert tracing.to_otlp([])["resourceSpans"] == []
+
+
+def test_rejected_otlp_export_is_logged(trace_file, monkeypatch, caplog):
+    posted = []
+
+    def post(url, json, timeout):
+        posted.append(url)
+        return httpx.Response(503, text="collector overloaded")
+
+    monkeypatch.setattr(tracing, "TRACING", True)
+    monkeypatch.setattr(tracing, "OTLP_ENDPOINT", "http://collector:4318/")
+    monkeypatch.setattr(httpx, "post", post)
+    with caplog.at_level("WARNING", logger="tracing"):
+        with tracing.start_trace("POST /execute"):
+            pass
+        tracing._exporter.flush()
+
+    assert posted == ["http://collector:4318/v1/traces"]
+    assert not os.path.exists(trace_file)
+    record, = [r for r in caplog.records if r.getMessage() == "Collector rejected spans"]
+    assert record.status_code == 503 and record.spans == 1
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Wire Format Tests
+Checks content negotiation on /execute (MessagePack or JSON, gzip in both
+directions) and that delegation calls learn what a peer accepts, falling
+back to JSON for older agents.
+"""
+
+import asyncio
+import gzip
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import a2a_agents
+import wire
+from conftest import EchoAgent
+
+
+@pytest.fixture
+def data_app(monkeypatch):
+    monkeypatch.setattr(a2a_agents, "MONOLITH", True)
+    monkeypatch.setattr(a2a_agents, "agents", {"data": EchoAgent()})
+    monkeypatch.setattr(wire, "_peers", {})
+    return a2a_agents.create_app("data")
+
+
+def test_negotiate():
+    assert wire.negotiate(None) == wire.JSON
+    assert wire.negotiate("*/*") == wire.JSON
+    assert wire.negotiate("application/msgpack, application/json;q=0.9") == wire.MSGPACK
+    assert wire.negotiate("application/json, application/msgpack") == wire.JSON
+    assert wire.negotiate("application/msgpack;q=0.5, application/json") == wire.JSON
+    assert wire.negotiate("application/msgpack;q=0, */*") == wire.JSON
+
+
+def test_execute_negotiates_format_and_compression(data_app):
+    client = TestClient(data_app)
+    query = "Look up customer 1 " * 100
+
+    plain = client.post("/execute", json={"query": "Look up customer 1"})
+    assert plain.headers["content-type"] == wire.JSON
+    assert plain.json()["result"] == "handled: Look up customer 1"
+
+    packed = client.post("/execute", content=gzip.compress(wire.dumps({"query": query}, wire.MSGPACK)), headers={
+        "Content-Type": wire.MSGPACK, "Content-Encoding": "gzip", "Accept": wire.MSGPACK,
+        "Accept-Encoding": "gzip",
+    })
+    assert packed.headers["content-type"] == wire.MSGPACK
+    assert packed.headers["content-encoding"] == "gzip"
+    assert "gzip" in packed.headers["accept-encoding"]
+    assert wire.decode_response(packed)["result"] == f"handled: {query}"
+
+    unsupported = client.post("/execute", content=b"<query/>", headers={"Content-Type": "application/xml"})
+    assert unsupported.status_code == 415
+    assert wire.MSGPACK in unsupported.headers["accept"]
+    malformed = client.post("/execute", content=b"not gzip", headers={"Content-Encoding": "gzip"})
+    assert malformed.status_code == 400
+    assert "Malformed" in malformed.json()["error"]
+    for body, content_type in ((b"[]", wire.JSON), (b'"query"', wire.JSON), (wire.dumps([1, 2], wire.MSGPACK), wire.MSGPACK)):
+        not_an_object = client.post("/execute", content=body, headers={"Content-Type": content_type})
+        assert not_an_object.status_code == 400
+        assert "expected an object" in not_an_object.json()["error"]
+
+
+def post_twice(app, url, query):
+    """Two wire.post calls to an app; returns the request headers sent and the decoded responses."""
+    sent = []
+
+    async def record(request):
+        sent.append(request.headers)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://peer",
+                                     event_hooks={"request": [record]}) as client:
+            return [wire.decode_response(await wire.post(client, url, {"query": query})) for _ in range(2)]
+
+    return sent, asyncio.run(scenario())
+
+
+def test_delegation_learns_peer_format(data_app):
+    query = "Look up customer 1 " * 100
+    sent, results = post_twice(data_app, "http://peer/execute", query)
+    assert all(r["result"] == f"handled: {query}" for r in results)
+    # First call: JSON accepting MessagePack; then what the peer answered in, compressed
+    assert (sent[0]["content-type"], sent[0].get("content-encoding")) == (wire.JSON, None)
+    assert (sent[1]["content-type"], sent[1].get("content-encoding")) == (wire.MSGPACK, "gzip")
+
+
+def test_delegation_to_older_agent_stays_json(monkeypatch):
+    monkeypatch.setattr(wire, "_peers", {})
+
+    async def execute(request):
+        data = await request.json()
+        return JSONResponse({"success": True, "result": f"handled: {data['query']}"})
+
+    old_agent = Starlette(routes=[Route("/execute", execute, methods=["POST"])])
+    sent, results = post_twice(old_agent, "http://peer/execute", "Look up customer 1 " * 100)
+    assert results[1]["result"].startswith("handled: Look up customer 1")
+    assert [(h["content-type"], h.get("content-encoding")) for h in sent] == [(wire.JSON, None)] * 2
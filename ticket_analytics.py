@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Ticket Analytics Engine
+Backlog aging, arrival rates and time-to-resolution computed with NumPy over
+column arrays loaded from the tickets table, refreshed incrementally.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+import numpy as np
+
+from migrations import GLOBAL_STATS_ID
+
+STATUSES = ("open", "in_progress", "resolved")
+PRIORITIES = ("low", "medium", "high")
+RESOLVED = STATUSES.index("resolved")
+
+# Age buckets (in hours) for the open-ticket aging histogram
+AGING_BUCKETS_HOURS = [0, 1, 4, 8, 24, 72, 168, 720, np.inf]
+
+# Column order of the arrays loaded from SQLite
+ID, CUSTOMER_ID, CREATED, RESOLVED_AT, STATUS, PRIORITY = range(6)
+
+_LOAD_COLUMNS = f"""
+    id,
+    customer_id,
+    CAST(strftime('%s', created_at) AS INTEGER),
+    COALESCE(CAST(strftime('%s', resolved_at) AS INTEGER), -1),
+    CASE status {" ".join(f"WHEN '{s}' THEN {i}" for i, s in enumerate(STATUSES))} END,
+    CASE priority {" ".join(f"WHEN '{p}' THEN {i}" for i, p in enumerate(PRIORITIES))} END
+"""
+
+
+def _iso_hour(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%d %H:00")
+
+
+class TicketAnalytics:
+    """Column-oriented, incrementally refreshed copy of the tickets table."""
+
+    def __init__(self, db_path: str, chunk_size: int = 100_000):
+        """Initialize an empty engine; call refresh() to load data.
+
+        Args:
+            db_path: Path to the SQLite database file
+            chunk_size: Number of rows fetched from SQLite per batch
+        """
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.data = np.empty((0, 6), dtype=np.int64)
+        self.last_id = 0
+        self.resolved_watermark = ""
+        self._lock = threading.Lock()
+
+    def _load_chunks(self, cursor: sqlite3.Cursor) -> np.ndarray:
+        """Drain a cursor in chunk_size batches into one int64 array."""
+        chunks = []
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+        if not chunks:
+            return np.empty((0, 6), dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def _load_new(self, conn: sqlite3.Connection) -> np.ndarray:
+        cursor = conn.execute(
+            f"SELECT {_LOAD_COLUMNS} FROM tickets WHERE id > ? ORDER BY id", (self.last_id,)
+        )
+        return self._load_chunks(cursor)
+
+    def refresh(self, full: bool = False) -> dict:
+        """Load tickets added or resolved since the last refresh.
+
+        New tickets are found by id > last seen id. Tickets already loaded are
+        re-read when their resolved_at is at or after the last seen resolution
+        time (re-reading a row is harmless). When the trigger-maintained total
+        in ticket_stats is below the rows loaded, tickets were deleted (or
+        archived) and the whole table is reloaded. Reopening a ticket is only
+        picked up by a full reload.
+
+        Args:
+            full: Discard the loaded arrays and reload the whole table
+
+        Returns:
+            Dictionary with the number of new and changed rows, and whether
+            the table was reloaded in full
+        """
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                # One read transaction, so the watermark matches the rows read
+                conn.execute("BEGIN")
+                # O(1): the global row of ticket_stats, kept by the insert/delete triggers
+                total = conn.execute(
+                    "SELECT total FROM ticket_stats WHERE customer_id = ?", (GLOBAL_STATS_ID,)
+                ).fetchone()
+                total = total[0] if total else 0
+                if not full:
+                    new_rows = self._load_new(conn)
+                    full = len(self.data) + len(new_rows) > total
+                if full:
+                    self.data = np.empty((0, 6), dtype=np.int64)
+                    self.last_id = 0
+                    self.resolved_watermark = ""
+                    new_rows = self._load_new(conn)
+
+                changed = np.empty((0, 6), dtype=np.int64)
+                if len(self.data):
+                    cursor = conn.execute(
+                        f"SELECT {_LOAD_COLUMNS} FROM tickets "
+                        f"WHERE resolved_at >= ? AND id <= ?",
+                        (self.resolved_watermark, self.last_id)
+                    )
+                    changed = self._load_chunks(cursor)
+
+                watermark = conn.execute("SELECT MAX(resolved_at) FROM tickets").fetchone()[0]
+            finally:
+                conn.close()
+
+            if len(changed):
+                # ids are loaded in ascending order, so rows can be located by bisection
+                positions = np.searchsorted(self.data[:, ID], changed[:, ID])
+                found = self.data[np.minimum(positions, len(self.data) - 1), ID] == changed[:, ID]
+                self.data[positions[found]] = changed[found]
+
+            if len(new_rows):
+                self.data = np.concatenate([self.data, new_rows])
+                self.last_id = int(new_rows[-1, ID])
+            self.resolved_watermark = watermark or self.resolved_watermark
+
+            return {"new_rows": int(len(new_rows)), "changed_rows": int(len(changed)), "full_reload": full}
+
+    def backlog_aging(self, now: float) -> dict:
+        """Histogram and percentiles of the age of unresolved tickets."""
+        backlog = self.data[self.data[:, STATUS] != RESOLVED]
+        ages_hours = (now - backlog[:, CREATED]) / 3600.0
+        counts, _ = np.histogram(ages_hours, bins=AGING_BUCKETS_HOURS)
+
+        buckets = []
+        for low, high, count in zip(AGING_BUCKETS_HOURS[:-1], AGING_BUCKETS_HOURS[1:], counts):
+            label = f"{low:g}h+" if np.isinf(high) else f"{low:g}-{high:g}h"
+            buckets.append({"age": label, "tickets": int(count)})
+
+        by_priority = np.bincount(backlog[:, PRIORITY], minlength=len(PRIORITIES))
+        top_customers = np.bincount(backlog[:, CUSTOMER_ID]) if len(backlog) else np.zeros(0, dtype=np.int64)
+        top_ids = np.argsort(top_customers)[::-1][:5]
+
+        return {
+            "open_tickets": int(len(backlog)),
+            "age_hours": self._percentiles(ages_hours),
+            "histogram": buckets,
+            "by_priority": {p: int(by_priority[i]) for i, p in enumerate(PRIORITIES)},
+            "top_customers": [
+                {"customer_id": int(cid), "open_tickets": int(top_customers[cid])}
+                for cid in top_ids if top_customers[cid] > 0
+            ],
+        }
+
+    def arrival_rate(self, now: float, window_hours: int, rolling_hours: int) -> dict:
+        """Tickets created per hour over the window, with a rolling average."""
+        end_hour = int(now // 3600) + 1
+        start_hour = end_hour - window_hours
+        hours = self.data[:, CREATED] // 3600
+        recent = hours[hours >= start_hour] - start_hour
+
+        per_hour = np.bincount(recent, minlength=window_hours)[:window_hours]
+        # Trailing mean over the last rolling_hours buckets, via a cumulative sum
+        padded = np.concatenate([np.zeros(rolling_hours), np.cumsum(per_hour)])
+        rolling = (padded[rolling_hours:] - padded[:-rolling_hours]) / rolling_hours
+
+        return {
+            "window_hours": window_hours,
+            "rolling_hours": rolling_hours,
+            "total": int(per_hour.sum()),
+            "per_hour": [
+                {"hour": _iso_hour((start_hour + i) * 3600), "tickets": int(n), "rolling_avg": round(float(r), 2)}
+                for i, (n, r) in enumerate(zip(per_hour, rolling))
+            ],
+        }
+
+    def time_to_resolution(self) -> dict:
+        """Percentiles of hours from creation to resolution, by priority."""
+        resolved = self.data[(self.data[:, STATUS] == RESOLVED) & (self.data[:, RESOLVED_AT] >= 0)]
+        durations = (resolved[:, RESOLVED_AT] - resolved[:, CREATED]) / 3600.0
+
+        return {
+            priority: self._percentiles(durations[resolved[:, PRIORITY] == i])
+            for i, priority in enumerate(PRIORITIES)
+        }
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> dict:
+        if not len(values):
+            return {"count": 0}
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        return {
+            "count": int(len(values)),
+            "mean": round(float(values.mean()), 2),
+            "p50": round(float(p50), 2),
+            "p90": round(float(p90), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(values.max()), 2),
+        }
+
+    def _report(self, refreshed: dict, window_hours: int, rolling_hours: int) -> dict:
+        now = time.time()
+        return {
+            "generated_at": datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+            "tickets_loaded": int(len(self.data)),
+            "refresh": refreshed,
+            "backlog_aging": self.backlog_aging(now),
+            "arrival_rate": self.arrival_rate(now, window_hours, max(1, rolling_hours)),
+            "time_to_resolution_hours": self.time_to_resolution(),
+        }
+
+    def report(self, window_hours: int = 24, rolling_hours: int = 3) -> dict:
+        """Refresh incrementally and compute all analytics in one pass."""
+        refreshed = self.refresh()
+        with self._lock:
+            return self._report(refreshed, window_hours, rolling_hours)
+
+
+def combined_report(engines: list, window_hours: int = 24, rolling_hours: int = 3) -> dict:
+    """Report over several engines (one per database shard) as one table.
+
+    Each engine refreshes its own shard incrementally; the arrays are only
+    concatenated for the duration of the report.
+    """
+    if len(engines) == 1:
+        return engines[0].report(window_hours=window_hours, rolling_hours=rolling_hours)
+
+    results = [engine.refresh() for engine in engines]
+    refreshed = {key: sum(result[key] for result in results) for key in results[0]}
+
+    combined = TicketAnalytics(db_path=None)
+    with ExitStack() as stack:
+        for engine in engines:
+            stack.enter_context(engine._lock)
+        combined.data = np.concatenate([engine.data for engine in engines])
+    return combined._report(refreshed, window_hours, rolling_hours)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Request Tracing
+Minimal span tracer shared by the agents and the MCP server. The current
+span lives in a contextvar, so it follows a request through awaits, tasks
+and asyncio.to_thread. Trace context crosses process boundaries as a W3C
+`traceparent` value: in A2A HTTP headers and in MCP request `_meta`.
+
+Finished spans are written by a background thread to a JSONL file
+(TRACE_FILE, default traces.jsonl), or sent as OTLP/HTTP JSON instead when
+OTEL_EXPORTER_OTLP_ENDPOINT is set. TRACING=0 turns tracing off.
+
+Usage:
+    python tracing.py show              # waterfall of the last trace in traces.jsonl
+    python tracing.py show <trace_id>
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import sql_timer
+from profiling import slow_queries
+
+log = logging.getLogger("tracing")
+
+TRACING = os.getenv("TRACING", "1") != "0"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+# Exporter batching
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 1.0
+
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_current_span = ContextVar("current_span", default=None)
+_service_name = "unknown"
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "service",
+                 "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None,
+                 kind: str = "internal", attributes: dict = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.service = _service_name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = str(error) if not isinstance(error, BaseException) else f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            _exporter.export(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def configure(service_name: str):
+    """Name the service whose spans this process emits."""
+    global _service_name
+    _service_name = service_name
+
+
+def parse_traceparent(value: str) -> tuple:
+    """(trace_id, parent span_id) from a traceparent value, or None if malformed."""
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def current_span() -> Span:
+    return _current_span.get()
+
+
+def current_traceparent() -> str:
+    """traceparent of the current span, or None outside a trace."""
+    span = _current_span.get()
+    return span.traceparent if span else None
+
+
+def inject(headers: dict = None) -> dict:
+    """Headers (new dict if None) with the current traceparent added."""
+    headers = dict(headers or {})
+    traceparent = current_traceparent()
+    if traceparent:
+        headers["traceparent"] = traceparent
+    return headers
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+@contextmanager
+def start_trace(name: str, traceparent: str = None, kind: str = "server", **attributes):
+    """Span for an incoming request: a child of traceparent, or a new trace.
+
+    Yields None (and records nothing) when tracing is off.
+    """
+    if not TRACING:
+        yield None
+        return
+    remote = parse_traceparent(traceparent)
+    trace_id, parent_id = remote if remote else (secrets.token_hex(16), None)
+    with _activate(Span(name, trace_id, parent_id, kind, attributes)) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Child span of the current span. A no-op (yields None) outside a trace."""
+    parent = _current_span.get() if TRACING else None
+    if parent is None:
+        yield None
+        return
+    with _activate(Span(name, parent.trace_id, parent.span_id, kind, attributes)) as child:
+        yield child
+
+
+@contextmanager
+def traced_from(traceparent: str, name: str, kind: str = "server", **attributes):
+    """Span continuing a remote trace, only when the caller sent one (else a no-op)."""
+    if traceparent and parse_traceparent(traceparent):
+        with start_trace(name, traceparent, kind, **attributes) as remote_span:
+            yield remote_span
+    else:
+        yield None
+
+
+def start_span(name: str, kind: str = "internal", **attributes) -> Span:
+    """Child span of the current span that the caller ends (e.g. from callbacks).
+
+    It does not become the current span. Returns None outside a trace.
+    """
+    parent = _current_span.get() if TRACING else None
+    if parent is None:
+        return None
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+# ==========================================
+# SQLite
+# ==========================================
+
+@contextmanager
+def _statement(name: str, cursor, sql: str, parameters, timer):
+    started = time.perf_counter()
+    try:
+        with span(name, kind="client", statement=" ".join(sql.split())[:500]):
+            yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if timer is not None:
+            timer.observe(elapsed)
+    if elapsed >= slow_queries.threshold_seconds:
+        slow_queries.record(cursor.connection, sql, parameters, elapsed)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that records a span per statement while a trace is active, and
+    times statements into metrics.sql_timer while one is set. Timed statements
+    slower than SLOW_QUERY_MS also go to the slow-query log (see profiling.py)."""
+
+    def execute(self, sql, parameters=()):
+        timer = sql_timer.get()
+        if timer is None and _current_span.get() is None:
+            return super().execute(sql, parameters)
+        with _statement("sqlite.execute", self, sql, parameters, timer):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        timer = sql_timer.get()
+        if timer is None and _current_span.get() is None:
+            return super().executemany(sql, seq_of_parameters)
+        # No parameters to explain the statement with (the sequence may be an iterator)
+        with _statement("sqlite.executemany", self, sql, None, timer):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class TracedConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=TracedConnection): statements become spans
+    and sqlite_query_duration_seconds observations.
+
+    Both cover execute() -- preparing the statement and stepping it to the
+    first row, which for sorted or aggregated queries is nearly all of the
+    work. Fetching the remaining rows shows up in the parent span.
+    """
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ==========================================
+# Export
+# ==========================================
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list) -> dict:
+    """OTLP/HTTP JSON request body for finished spans."""
+    by_service = {}
+    for s in spans:
+        by_service.setdefault(s.service, []).append({
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": SPAN_KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        })
+    return {"resourceSpans": [
+        {
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+            "scopeSpans": [{"scope": {"name": "customer-service"}, "spans": otlp_spans}],
+        }
+        for service, otlp_spans in by_service.items()
+    ]}
+
+
+class SpanExporter:
+    """Batches finished spans and writes them from a daemon thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+        self._queue.put(span)
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < EXPORT_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            time.sleep(EXPORT_INTERVAL_SECONDS)
+            self.flush()
+
+    def flush(self):
+        """Write every queued span now."""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            try:
+                self._write(batch)
+            except Exception as e:
+                log.warning("Dropped spans", extra={"spans": len(batch), "error": str(e)})
+
+    def _write(self, batch: list):
+        if OTLP_ENDPOINT:
+            import httpx
+            response = httpx.post(f"{OTLP_ENDPOINT.rstrip('/')}/v1/traces", json=to_otlp(batch), timeout=5.0)
+            if not response.is_success:
+                log.warning("Collector rejected spans", extra={
+                    "spans": len(batch), "status_code": response.status_code, "body": response.text[:500],
+                })
+            return
+        # One append per batch: whole lines from several processes never interleave
+        lines = "".join(json.dumps(s.as_dict()) + "\n" for s in batch)
+        with open(TRACE_FILE, "a") as f:
+            f.write(lines)
+
+
+_exporter = SpanExporter()
+
+
+# ==========================================
+# Waterfall Viewer
+# ==========================================
+
+def load_trace(path: str, trace_id: str = None) -> list:
+    """Spans of one trace from a JSONL file (the last trace if trace_id is None)."""
+    spans = []
+    with open(path) as f:
+        for line in f:
+            spans.append(json.loads(line))
+    if trace_id is None:
+        roots = [s for s in spans if s["parent_id"] is None]
+        if not roots:
+            return []
+        trace_id = max(roots, key=lambda s: s["start_ns"])["trace_id"]
+    return [s for s in spans if s["trace_id"] == trace_id]
+
+
+def format_waterfall(spans: list, width: int = 40) -> str:
+    """Indented span tree with start offsets and duration bars."""
+    if not spans:
+        return "(no spans)"
+    children = {}
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+    start = min(s["start_ns"] for s in spans)
+    end = max(s["start_ns"] + s["duration_ms"] * 1e6 for s in spans)
+    scale = width / max(end - start, 1)
+
+    lines = [f"trace {spans[0]['trace_id']}  ({(end - start) / 1e6:.1f} ms)"]
+
+    def walk(parent, depth):
+        for s in sorted(children.get(parent, ()), key=lambda s: s["start_ns"]):
+            offset = int((s["start_ns"] - start) * scale)
+            bar = max(1, int(s["duration_ms"] * 1e6 * scale))
+            label = f"{'  ' * depth}{s['name']} [{s['service']}]"
+            detail = s["attributes"].get("statement") or s["attributes"].get("tool") or ""
+            error = "  ERROR " + s["error"] if s["error"] else ""
+            lines.append(f"{label[:48]:<48} {' ' * offset}{'█' * bar:<{width - offset}} "
+                         f"{s['duration_ms']:>9.2f} ms  {detail[:60]}{error}")
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main():
+    """Command line entry point."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Show a trace from the span JSONL file.")
+    parser.add_argument("command", choices=["show"])
+    parser.add_argument("trace_id", nargs="?")
+    parser.add_argument("--file", default=TRACE_FILE)
+    args = parser.parse_args()
+    print(format_waterfall(load_trace(args.file, args.trace_id)))
+
+
+if __name__ == "__main__":
+    main()
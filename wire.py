@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+A2A Wire Format
+Encoding of /execute requests and responses between agents. JSON stays the
+default; a caller that lists MessagePack in its Accept header gets a
+MessagePack response, and responses of A2A_COMPRESS_MIN_BYTES or more are
+gzip-compressed for callers that accept it (GZipMiddleware in create_app).
+
+Delegation calls negotiate per peer URL. The first call to a peer is plain
+JSON that accepts MessagePack. If the peer answers in MessagePack, later
+requests are sent in MessagePack. If it also advertises request encodings
+(an Accept-Encoding response header, RFC 7694), large requests are
+compressed too. A peer that does neither (an older agent) keeps getting
+JSON. A 415 answer resets what was learned and the call is retried once as
+plain JSON.
+
+Environment:
+    A2A_WIRE_FORMAT          Format delegation calls prefer: msgpack (default) or json
+    A2A_COMPRESS_MIN_BYTES   Smallest body that is compressed (default 1024)
+    A2A_COMPRESS_LEVEL       gzip level, 1 (fastest) to 9 (smallest) (default 1)
+"""
+
+import gzip
+import json
+import logging
+import os
+import zlib
+
+import ormsgpack
+from starlette.responses import Response
+
+log = logging.getLogger("wire")
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Media types this process reads and writes, most preferred first
+MEDIA_TYPES = (MSGPACK, JSON)
+# Content codings accepted on request bodies
+REQUEST_ENCODINGS = ("gzip", "deflate")
+
+A2A_WIRE_FORMAT = MSGPACK if os.getenv("A2A_WIRE_FORMAT", "msgpack").lower() == "msgpack" else JSON
+A2A_COMPRESS_MIN_BYTES = int(os.getenv("A2A_COMPRESS_MIN_BYTES", "1024"))
+A2A_COMPRESS_LEVEL = int(os.getenv("A2A_COMPRESS_LEVEL", "1"))
+
+# Peer URL -> (media type, request content coding or None) learned from its responses
+_peers = {}
+
+
+class UnsupportedMediaType(ValueError):
+    """A request body in a media type or content coding this process cannot read."""
+
+
+# ==========================================
+# Encoding
+# ==========================================
+
+def dumps(data, media_type: str = JSON) -> bytes:
+    """Serialize a payload in a media type."""
+    if media_type == MSGPACK:
+        return ormsgpack.packb(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def loads(body: bytes, media_type: str = JSON):
+    """Deserialize a payload of a media type."""
+    if media_type == MSGPACK:
+        return ormsgpack.unpackb(body)
+    return json.loads(body)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=A2A_COMPRESS_LEVEL, mtime=0)
+    return zlib.compress(body, A2A_COMPRESS_LEVEL)
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    return zlib.decompress(body)
+
+
+def _media_type(content_type: str) -> str:
+    return (content_type or JSON).split(";")[0].strip().lower()
+
+
+def _preferences(header: str) -> list:
+    """(value, q) pairs of an Accept-style header, in header order."""
+    preferences = []
+    for item in (header or "").split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if value:
+            preferences.append((value.lower(), q))
+    return preferences
+
+
+def negotiate(accept: str) -> str:
+    """Response media type for an Accept header: the caller's best supported
+    type named explicitly, else JSON (also for */* and no header)."""
+    named = [(q, -index, value) for index, (value, q) in enumerate(_preferences(accept))
+             if value in MEDIA_TYPES and q > 0]
+    return max(named)[2] if named else JSON
+
+
+# ==========================================
+# Server side (/execute)
+# ==========================================
+
+def decode_request(body: bytes, headers) -> dict:
+    """Payload of a request body, per its Content-Type and Content-Encoding.
+
+    Raises:
+        UnsupportedMediaType: Unknown media type or content coding
+        ValueError: Malformed body
+    """
+    media_type = _media_type(headers.get("content-type"))
+    if media_type not in MEDIA_TYPES:
+        raise UnsupportedMediaType(f"Unsupported Content-Type: {media_type}")
+    encoding = (headers.get("content-encoding") or "identity").strip().lower()
+    if encoding not in REQUEST_ENCODINGS + ("identity",):
+        raise UnsupportedMediaType(f"Unsupported Content-Encoding: {encoding}")
+    if encoding != "identity":
+        try:
+            body = decompress(body, encoding)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"Malformed {encoding} body: {e}") from e
+    return loads(body, media_type)
+
+
+def response(data, headers, status_code: int = 200) -> Response:
+    """Response encoding `data` in the media type the caller's Accept header prefers."""
+    media_type = negotiate(headers.get("accept"))
+    return Response(dumps(data, media_type), status_code=status_code, media_type=media_type, headers={
+        "Vary": "Accept",
+        # RFC 7694: the codings this endpoint accepts on request bodies
+        "Accept-Encoding": ", ".join(REQUEST_ENCODINGS),
+    })
+
+
+def unsupported(error: UnsupportedMediaType) -> Response:
+    """415 answer (always JSON) naming what this process accepts."""
+    return Response(dumps({"success": False, "error": str(error)}), status_code=415, media_type=JSON,
+                    headers={"Accept": ", ".join(MEDIA_TYPES), "Accept-Encoding": ", ".join(REQUEST_ENCODINGS)})
+
+
+# ==========================================
+# Client side (delegation)
+# ==========================================
+
+def encode_request(url: str, data) -> tuple:
+    """(body, headers) of a request to a peer, in what it is known to accept."""
+    media_type, encoding = _peers.get(url, (JSON, None))
+    body = dumps(data, media_type)
+    headers = {"Content-Type": media_type,
+               "Accept": f"{MSGPACK}, {JSON};q=0.9" if A2A_WIRE_FORMAT == MSGPACK else JSON}
+    if encoding and len(body) >= A2A_COMPRESS_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def _learn(url: str, response):
+    media_type = _media_type(response.headers.get("content-type"))
+    accepted = {value for value, q in _preferences(response.headers.get("accept-encoding")) if q > 0}
+    encoding = next((e for e in REQUEST_ENCODINGS if e in accepted), None)
+    peer = (media_type if media_type in MEDIA_TYPES else JSON, encoding)
+    if _peers.get(url) != peer:
+        log.debug("Peer wire format", extra={"url": url, "media_type": peer[0], "encoding": peer[1]})
+        _peers[url] = peer
+
+
+async def post(client, url: str, data, headers: dict = None, **kwargs):
+    """POST `data` to a peer in the best format it is known to accept.
+
+    Args:
+        client: httpx.AsyncClient (it decompresses responses itself)
+        url: Endpoint URL; what the peer accepts is remembered per URL
+        data: Payload
+        headers: Extra headers (trace context, request ID)
+
+    Returns:
+        The httpx response; decode it with decode_response()
+    """
+    body, wire_headers = encode_request(url, data)
+    result = await client.post(url, content=body, headers={**(headers or {}), **wire_headers}, **kwargs)
+    if result.status_code == 415 and url in _peers:
+        # The peer changed (e.g. redeployed as an older version): start over with JSON
+        _peers.pop(url)
+        body, wire_headers = encode_request(url, data)
+        result = await client.post(url, content=body, headers={**(headers or {}), **wire_headers}, **kwargs)
+    if result.status_code == 200:
+        _learn(url, result)
+    return result
+
+
+def decode_response(response) -> dict:
+    """Payload of a peer's (already decompressed) httpx response."""
+    return loads(response.content, _media_type(response.headers.get("content-type")))